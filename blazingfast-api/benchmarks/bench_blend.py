@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks: overlay compositing on the output frame.
+
+  legacy  — cvtColor(BGR→BGRA) of the whole frame + hard alpha-cut copy (overlay_bgra_on_frame)
+  blend   — copy of the BGR frame + alpha blend on the overlay ROI only (blend_overlay) with a
+            BGRA overlay, i.e. premultiplied per call (uploaded overlays)
+  cached  — same, with the premultiplied overlay the preset cache hands out
+
+Reported for the kernel alone, for kernel + JPEG encode and for the variants loop
+(one image per item) that compose_many_from_bytes runs.
+
+    python benchmarks/bench_blend.py [--jewellery-id ID] [--repeat 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ar_jewelry import (  # noqa: E402
+    DEFAULT_HEIGHT,
+    DEFAULT_WIDTH,
+    blend_overlay,
+    load_jewellery_presets,
+    load_overlay_bgra,
+    overlay_bgra_on_frame,
+    premultiply_overlay,
+    resolve_jewellery_path,
+)
+
+
+def bench(fn: Callable[[], object], repeat: int) -> float:
+    """Median microseconds per call."""
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1e6)
+    return statistics.median(times)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--jewellery-id", default=None, help="preset to use (default: first in jewellery.json)")
+    ap.add_argument("--size", type=int, default=200, help="overlay width/height in px (default 200)")
+    ap.add_argument("--variants", type=int, default=4, help="items in the variants benchmark")
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+    cv2.setNumThreads(1)
+
+    presets = load_jewellery_presets()
+    jid = args.jewellery_id or next(iter(presets))
+    overlay = cv2.resize(load_overlay_bgra(resolve_jewellery_path(presets[jid]["path"])), (args.size, args.size))
+    premultiplied = premultiply_overlay(overlay)
+    rng = np.random.default_rng(0)
+    frame_bgr = rng.integers(0, 256, (DEFAULT_HEIGHT, DEFAULT_WIDTH, 3), dtype=np.uint8)
+    frame_bgr.setflags(write=False)  # like a frame-cache entry
+    x, y = DEFAULT_WIDTH // 2 - args.size // 2, DEFAULT_HEIGHT // 2
+    jpg = [cv2.IMWRITE_JPEG_QUALITY, 90]
+
+    def legacy() -> np.ndarray:
+        out = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2BGRA)
+        overlay_bgra_on_frame(out, overlay, x, y)
+        return out
+
+    def blend(ov: np.ndarray) -> np.ndarray:
+        out = frame_bgr.copy()
+        blend_overlay(out, ov, x, y)
+        return out
+
+    def legacy_variants() -> None:
+        base = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2BGRA)
+        for _ in range(args.variants):
+            out = base.copy()
+            overlay_bgra_on_frame(out, overlay, x, y)
+            cv2.imencode(".jpg", out, jpg)
+
+    def blend_variants(ov: np.ndarray) -> None:
+        out = frame_bgr.copy()
+        for _ in range(args.variants):
+            roi = blend_overlay(out, ov, x, y)
+            cv2.imencode(".jpg", out, jpg)
+            if roi is not None:
+                out[roi] = frame_bgr[roi]
+
+    alpha = overlay[:, :, 3]
+    print(
+        f"frame {DEFAULT_WIDTH}x{DEFAULT_HEIGHT}, overlay {jid} {args.size}x{args.size} "
+        f"({np.mean((alpha > 0) & (alpha < 255)):.0%} semi-transparent px), median of {args.repeat}, 1 OpenCV thread\n"
+    )
+    rows = [
+        ("kernel", legacy, lambda: blend(overlay), lambda: blend(premultiplied)),
+        (
+            "kernel + JPEG",
+            lambda: cv2.imencode(".jpg", legacy(), jpg),
+            lambda: cv2.imencode(".jpg", blend(overlay), jpg),
+            lambda: cv2.imencode(".jpg", blend(premultiplied), jpg),
+        ),
+        (
+            f"variants x{args.variants} + JPEG",
+            legacy_variants,
+            lambda: blend_variants(overlay),
+            lambda: blend_variants(premultiplied),
+        ),
+    ]
+    print(f"{'case':<24}{'legacy us':>11}{'blend us':>11}{'cached us':>11}{'speedup':>9}")
+    for name, a, b, c in rows:
+        ta, tb, tc = bench(a, args.repeat), bench(b, args.repeat), bench(c, args.repeat)
+        print(f"{name:<24}{ta:>11.0f}{tb:>11.0f}{tc:>11.0f}{ta / tc:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full-resolution decode + resize vs reduced (DCT-scaled) decode + resize.
+
+Mirrors what prepare_frame_from_bytes does before face detection. Uses the given photos, or
+synthetic camera-sized JPEGs when none are passed.
+
+    python benchmarks/bench_decode.py [photo.jpg ...] [--width 720 --height 640 --repeat 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ar_jewelry import decode_image_bytes, reduced_decode_factor  # noqa: E402
+
+SYNTHETIC_SIZES = ((1280, 960), (1920, 1080), (3024, 4032), (4000, 3000), (4624, 3472))
+
+
+def synthetic_jpeg(w: int, h: int) -> bytes:
+    """Smooth gradients + noise: compresses like a photo, not like a flat test card."""
+    rng = np.random.default_rng(0)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    base = np.stack([xx / w * 255, yy / h * 255, (xx + yy) / (w + h) * 255], axis=-1)
+    img = np.clip(base + rng.normal(0, 12, (h, w, 3)), 0, 255).astype(np.uint8)
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    assert ok
+    return buf.tobytes()
+
+
+def run(data: bytes, width: int, height: int, reduced: bool, repeat: int) -> tuple[float, int, int]:
+    """Median ms, peak traced bytes and decoded frame bytes for decode + resize."""
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cv2.resize(decode_image_bytes(data, (width, height), reduced=reduced), (width, height))
+        times.append((time.perf_counter() - t0) * 1000)
+    tracemalloc.start()
+    frame = decode_image_bytes(data, (width, height), reduced=reduced)
+    cv2.resize(frame, (width, height))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(times), peak, frame.nbytes
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("images", nargs="*", help="JPEG/PNG files (default: synthetic JPEGs)")
+    ap.add_argument("--width", type=int, default=720)
+    ap.add_argument("--height", type=int, default=640)
+    ap.add_argument("--repeat", type=int, default=10)
+    args = ap.parse_args()
+    cv2.setNumThreads(1)
+
+    if args.images:
+        samples = [(Path(p).name, Path(p).read_bytes()) for p in args.images]
+    else:
+        samples = [(f"synthetic {w}x{h}", synthetic_jpeg(w, h)) for w, h in SYNTHETIC_SIZES]
+
+    print(f"target {args.width}x{args.height}, median of {args.repeat} runs, 1 OpenCV thread\n")
+    print(f"{'image':<22}{'KB':>7}{'factor':>8}{'full ms':>10}{'reduced ms':>12}{'speedup':>9}{'full MB':>9}{'reduced MB':>12}")
+    for name, data in samples:
+        factor = reduced_decode_factor(data, args.width, args.height)
+        full_ms, full_peak, _ = run(data, args.width, args.height, False, args.repeat)
+        red_ms, red_peak, _ = run(data, args.width, args.height, True, args.repeat)
+        print(
+            f"{name[:21]:<22}{len(data) // 1024:>7}{'1/' + str(factor):>8}{full_ms:>10.1f}{red_ms:>12.1f}"
+            f"{full_ms / red_ms:>8.1f}x{full_peak / 2**20:>9.1f}{red_peak / 2**20:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Embedding throughput of a full-table Qdrant sync: per-record vs batched hash embeddings.
+
+Builds product-like records, turns them into text the way QdrantService does, and embeds them
+with the old per-record code (global np.random.seed, Python-list normalisation) and with
+HashEmbedder.embed_batch in sync-sized batches. Reports records/sec for both and checks that
+the vectors match.
+
+    python benchmarks/bench_embed.py [--records 20000] [--batch-size 100]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.text_embedding import EMBEDDING_DIM, HashEmbedder  # noqa: E402
+
+WORDS = "gold silver ring necklace earring bracelet pendant diamond pearl ruby handmade vintage 18k".split()
+
+
+def legacy_embedding(text: str, dim: int = EMBEDDING_DIM) -> List[float]:
+    """QdrantService._simple_text_embedding before batching (reseeds the global RNG)."""
+    np.random.seed(int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], byteorder="big"))
+    embedding = np.random.normal(0, 1, dim).tolist()
+    norm = np.linalg.norm(embedding)
+    if norm > 0:
+        embedding = [x / norm for x in embedding]
+    return embedding
+
+
+def make_texts(n: int) -> list[str]:
+    rng = np.random.default_rng(0)
+    texts = []
+    for i in range(n):
+        desc = " ".join(rng.choice(WORDS, 12))
+        texts.append(f"name: Piece {i} description: {desc} category: {rng.choice(WORDS)} material: {rng.choice(WORDS)}")
+    return texts
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=20000)
+    ap.add_argument("--batch-size", type=int, default=100)
+    args = ap.parse_args()
+    texts = make_texts(args.records)
+    embedder = HashEmbedder()
+
+    t0 = time.perf_counter()
+    legacy = [legacy_embedding(t) for t in texts]
+    legacy_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    batches = [embedder.embed_batch(texts[i : i + args.batch_size]) for i in range(0, len(texts), args.batch_size)]
+    batched_s = time.perf_counter() - t0
+
+    # The upsert still needs lists; include that conversion for a fair end-to-end number.
+    t0 = time.perf_counter()
+    for m in batches:
+        m.tolist()
+    tolist_s = time.perf_counter() - t0
+
+    batched = np.vstack(batches)
+    same = np.array_equal(np.asarray(legacy, dtype=np.float32), batched)
+    max_diff = float(np.abs(np.asarray(legacy) - batched).max())
+
+    print(f"{args.records} records, dim {EMBEDDING_DIM}, batch {args.batch_size}\n")
+    print(f"{'path':<22}{'seconds':>9}{'records/s':>12}")
+    print(f"{'per-record (legacy)':<22}{legacy_s:>9.2f}{args.records / legacy_s:>12.0f}")
+    print(f"{'embed_batch':<22}{batched_s:>9.2f}{args.records / batched_s:>12.0f}")
+    print(f"{'embed_batch + tolist':<22}{batched_s + tolist_s:>9.2f}{args.records / (batched_s + tolist_s):>12.0f}")
+    print(f"\nvectors identical as float32: {same} (max abs diff vs float64 legacy {max_diff:.1e})")
+
+
+if __name__ == "__main__":
+    main()
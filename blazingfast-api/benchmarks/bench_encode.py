@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: encoding one output frame in every try-on output format.
+
+Reports median encode time, payload size and the size as base64 (what /compose/json sends)
+for PNG (OpenCV default and explicit zlib levels), JPEG and WebP at a few qualities.
+
+    python benchmarks/bench_encode.py [photo.jpg] [--width 720 --height 640] [--repeat 30]
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ar_jewelry import DEFAULT_HEIGHT, DEFAULT_WIDTH, encode_image  # noqa: E402
+
+CASES = [
+    ("png", None, None),
+    ("png", None, 0),
+    ("png", None, 1),
+    ("png", None, 6),
+    ("jpg", 95, None),
+    ("jpg", 85, None),
+    ("jpg", 75, None),
+    ("webp", 90, None),
+    ("webp", 80, None),
+    ("webp", 60, None),
+]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("photo", nargs="?", help="photo to encode (default: synthetic gradient + noise)")
+    ap.add_argument("--width", type=int, default=DEFAULT_WIDTH)
+    ap.add_argument("--height", type=int, default=DEFAULT_HEIGHT)
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args()
+    cv2.setNumThreads(1)
+
+    if args.photo:
+        frame = cv2.imread(args.photo, cv2.IMREAD_COLOR)
+        if frame is None:
+            sys.exit(f"Could not read {args.photo}")
+        frame = cv2.resize(frame, (args.width, args.height), interpolation=cv2.INTER_AREA)
+    else:
+        ramp = np.linspace(0, 255, args.width, dtype=np.float32)[None, :, None]
+        noise = np.random.default_rng(0).normal(0, 12, (args.height, args.width, 3))
+        frame = np.clip(ramp + noise, 0, 255).astype(np.uint8)
+
+    print(f"frame {args.width}x{args.height} BGR, median of {args.repeat}, 1 OpenCV thread\n")
+    print(f"{'format':<8}{'setting':>10}{'ms':>9}{'KiB':>9}{'base64 KiB':>12}")
+    for fmt, quality, level in CASES:
+        encode_image(frame, fmt, quality, level)
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            body = encode_image(frame, fmt, quality, level)
+            times.append((time.perf_counter() - t0) * 1000)
+        setting = f"q={quality}" if quality is not None else (f"zlib={level}" if level is not None else "default")
+        b64 = (len(body) + 2) // 3 * 4
+        print(f"{fmt:<8}{setting:>10}{statistics.median(times):>9.2f}{len(body) / 1024:>9.0f}{b64 / 1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Round-trip benchmark for the AR worker pool: pickled pipe vs shared-memory transport.
+
+Runs resize_encode_task (decode → resize → encode, output returned to the API process) on one
+worker with AR_SHM off and on, and reports the median wall time per call plus the part of it
+not spent in the worker (transport + scheduling).
+
+    python benchmarks/bench_transport.py photo.jpg [--format png] [--repeat 20]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.ar_pool import ARWorkerPool, resize_encode_task  # noqa: E402
+
+
+async def measure(data: bytes, shm: bool, fmt: str, repeat: int) -> tuple[float, float, int]:
+    pool = ARWorkerPool(workers=1, shared_memory=shm)
+    try:
+        out = await pool.run(resize_encode_task, data, 720, 640, fmt)
+        walls = []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            await pool.run(resize_encode_task, data, 720, 640, fmt)
+            walls.append((time.perf_counter() - t0) * 1000)
+        busy_ms = 1000 * sum(w["busy_seconds"] for w in pool.stats()["per_worker"].values()) / (repeat + 1)
+        return statistics.median(walls), busy_ms, len(out)
+    finally:
+        pool.shutdown()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("photo")
+    ap.add_argument("--format", default="png", help="output format (png output is the largest)")
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+    data = Path(args.photo).read_bytes()
+
+    print(f"upload {len(data) / 1e6:.2f} MB, output 720x640 {args.format}, 1 worker, median of {args.repeat}\n")
+    print(f"{'transport':<10}{'wall ms':>10}{'worker ms':>11}{'overhead ms':>13}{'output KiB':>12}")
+    for shm in (False, True):
+        wall, busy, size = asyncio.run(measure(data, shm, args.format, args.repeat))
+        print(f"{'shm' if shm else 'pickle':<10}{wall:>10.1f}{busy:>11.1f}{wall - busy:>13.1f}{size / 1024:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
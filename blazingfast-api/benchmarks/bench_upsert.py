@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Qdrant upload throughput: one waited upsert per 100 points vs ParallelUploader
+(size-bounded batches, wait=false, several requests in flight, then one write barrier).
+
+Against a real Qdrant (a scratch collection is created and dropped):
+
+    python benchmarks/bench_upsert.py --url http://localhost:6333 [--points 5000] [--in-flight 4]
+
+Without --url, requests are simulated with a fixed round-trip time (--rtt-ms, default 20).
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+import uuid
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.http import models  # noqa: E402
+
+from services.sync_pipeline import ParallelUploader  # noqa: E402
+from services.text_embedding import EMBEDDING_DIM, HashEmbedder  # noqa: E402
+
+
+class SimulatedClient:
+    """Sleeps rtt (+ a little per point) per call instead of talking to Qdrant."""
+
+    def __init__(self, rtt_ms: float):
+        self.rtt = rtt_ms / 1000
+
+    def upsert(self, collection_name, points, wait=True):
+        time.sleep(self.rtt + len(points) * 20e-6 + (0.05 if wait else 0.0))
+
+    def delete(self, collection_name, points_selector, wait=True):
+        time.sleep(self.rtt)
+
+
+def make_points(n: int) -> list[models.PointStruct]:
+    vectors = HashEmbedder().embed_batch([f"product {i}" for i in range(n)])
+    return [
+        models.PointStruct(id=str(uuid.uuid4()), vector=vectors[i].tolist(), payload={"name": f"product {i}", "i": str(i)})
+        for i in range(n)
+    ]
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="Qdrant URL (default: simulated round trips)")
+    ap.add_argument("--api-key")
+    ap.add_argument("--points", type=int, default=5000)
+    ap.add_argument("--in-flight", type=int, default=4)
+    ap.add_argument("--target-kb", type=int, default=4096)
+    ap.add_argument("--rtt-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    points = make_points(args.points)
+    collection = f"bench_upsert_{uuid.uuid4().hex[:8]}"
+    client = QdrantClient(url=args.url, api_key=args.api_key) if args.url else SimulatedClient(args.rtt_ms)
+    if args.url:
+        client.create_collection(collection, vectors_config=models.VectorParams(size=EMBEDDING_DIM, distance=models.Distance.COSINE))
+    barrier = models.FilterSelector(filter=models.Filter(must=[models.HasIdCondition(has_id=[str(uuid.uuid4())])]))
+    sizes = [20 * EMBEDDING_DIM + 128] * len(points)
+
+    try:
+        t0 = time.perf_counter()
+        for i in range(0, len(points), 100):
+            client.upsert(collection_name=collection, points=points[i : i + 100], wait=True)
+        sequential = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        uploader = ParallelUploader(
+            lambda batch: client.upsert(collection_name=collection, points=batch, wait=False),
+            in_flight=args.in_flight,
+            target_bytes=args.target_kb * 1024,
+        )
+        uploader.add(points, sizes)
+        uploader.close()
+        client.delete(collection_name=collection, points_selector=barrier, wait=True)
+        parallel = time.perf_counter() - t0
+    finally:
+        if args.url:
+            client.delete_collection(collection)
+
+    where = args.url or f"simulated, rtt {args.rtt_ms:g} ms"
+    print(f"{args.points} points x {EMBEDDING_DIM} dims ({where})\n")
+    print(f"{'path':<34}{'seconds':>9}{'points/s':>11}")
+    print(f"{'sequential, 100/batch, wait=true':<34}{sequential:>9.2f}{args.points / sequential:>11.0f}")
+    label = f"parallel x{args.in_flight}, wait=false + barrier"
+    print(f"{label:<34}{parallel:>9.2f}{args.points / parallel:>11.0f}")
+    print(f"\nuploader: {uploader.summary()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,7 @@
+import asyncio
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 from dotenv import load_dotenv
@@ -6,6 +9,10 @@ from pathlib import Path
 import os
 
 from models import Base, engine
+from services.admission import admission_stats
+from services.ar_pool import get_ar_pool, shutdown_ar_pool
+from services.ar_warmup import get_warmup_state, run_warmup
+from services.qdrant_indexer import start_qdrant_indexer, stop_qdrant_indexer
 from routes import product_router, shop_router, product_image_router, product_tryon_image_router, storage_router, user_setting_router, market_insights_router, ticket_router, ticket_response_router, chatbot_router, ar_tryon_router
 
 # Load environment variables (current dir and repo root)
@@ -49,15 +56,53 @@ app.include_router(chatbot_router)
 app.include_router(ar_tryon_router)
 
 
+# Warm up OpenCV, the Haar cascade and preset overlays (API process + AR workers) in the
+# background; /health reports not ready until it finished
+_warmup_task = None
+
+
+@app.on_event("startup")
+async def start_ar_warmup():
+    global _warmup_task
+    _warmup_task = asyncio.create_task(run_warmup(get_ar_pool()))
+
+
+# Stop AR try-on worker processes on shutdown
+@app.on_event("shutdown")
+def shutdown_ar_workers():
+    shutdown_ar_pool()
+
+
+# Index product / shop writes in Qdrant as they commit (services/qdrant_indexer.py)
+@app.on_event("startup")
+def start_write_through_indexing():
+    start_qdrant_indexer()
+
+
+@app.on_event("shutdown")
+def stop_write_through_indexing():
+    stop_qdrant_indexer()
+
+
 # Root endpoint
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Lunova API"}
 
-# Health check endpoint
+# Health / readiness check endpoint (503 while the AR warm-up is still running)
 @app.get("/health")
 def health_check():
-    return {"status": "healthy"}
+    warmup = get_warmup_state()
+    if not warmup.ready:
+        return JSONResponse(status_code=503, content={"status": "starting", "ready": False, "warmup": warmup.public()})
+    # A failed warm-up still serves traffic (AR loads lazily) but is not reported as healthy
+    status = "degraded" if warmup.status == "failed" else "healthy"
+    return {"status": status, "ready": True, "warmup": warmup.public()}
+
+# Admission control: running / queued requests per endpoint class (try-on, enhance, chat)
+@app.get("/admission/stats")
+def get_admission_stats():
+    return admission_stats()
 
 # Run the application
 if __name__ == "__main__":
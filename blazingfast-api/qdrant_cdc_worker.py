@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Continuous Qdrant indexing of products and shops from Postgres LISTEN/NOTIFY.
+
+Installs the notify triggers (idempotent), listens for changes, including writes that bypass
+the API, and indexes them in short batches. Every (re)connect starts with an incremental
+catch-up sync. See services/qdrant_cdc.py.
+
+    python qdrant_cdc_worker.py                # install triggers and run until SIGINT / SIGTERM
+    python qdrant_cdc_worker.py --skip-install # triggers are managed elsewhere
+    python qdrant_cdc_worker.py --uninstall    # drop the triggers and exit
+"""
+
+import argparse
+import os
+import signal
+import sys
+
+import psycopg2
+from dotenv import load_dotenv
+
+from models import Product, Shop
+from models.database import SessionLocal, engine
+from services.qdrant_cdc import CDCWorker, install_triggers, uninstall_triggers
+
+# Load environment variables
+load_dotenv()
+
+INDEXED_MODELS = [Product, Shop]
+
+
+def connect():
+    """New psycopg2 connection to the API's database (POSTGRES_URL), outside the pool."""
+    return psycopg2.connect(engine.url.set(drivername="postgresql").render_as_string(hide_password=False))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index product / shop changes in Qdrant as they commit")
+    parser.add_argument("--skip-install", action="store_true", help="Do not create or replace the notify triggers")
+    parser.add_argument("--uninstall", action="store_true", help="Drop the notify triggers and exit")
+    args = parser.parse_args()
+
+    if not args.uninstall and not os.getenv("QDRANT_API_URL"):
+        print("Error: QDRANT_API_URL environment variable not set", file=sys.stderr)
+        sys.exit(1)
+
+    if args.uninstall or not args.skip_install:
+        conn = connect()
+        try:
+            if args.uninstall:
+                uninstall_triggers(conn, INDEXED_MODELS)
+                print("Dropped notify triggers")
+                return
+            install_triggers(conn, INDEXED_MODELS)
+            print(f"Installed notify triggers on {', '.join(m.__tablename__ for m in INDEXED_MODELS)}")
+        finally:
+            conn.close()
+
+    worker = CDCWorker(INDEXED_MODELS, SessionLocal, connect)
+    signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+    signal.signal(signal.SIGINT, lambda *_: worker.stop())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
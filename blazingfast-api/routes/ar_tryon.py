@@ -4,24 +4,192 @@ AR jewelry try-on endpoints (OpenCV Haar cascade + overlay PNG).
 
 from __future__ import annotations
 
+import asyncio
 import base64
-from typing import Any, Optional, Tuple
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, List, Optional, Tuple, Union
+from uuid import UUID
 
 import cv2
 import numpy as np
-from fastapi import APIRouter, File, Form, HTTPException, UploadFile
-from fastapi.responses import Response
+from fastapi import APIRouter, File, Form, Header, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
 
+from services.admission import BATCH, AdmissionRejected, admission_busy, get_admission
 from services.ar_jewelry import (
     JEWELLERY_JSON,
-    compose_from_bytes,
+    OUTPUT_MEDIA_TYPES,
+    OverlayItem,
     load_jewellery_presets,
-    load_overlay_bgra,
+    normalize_output_format,
+    output_media_type,
     resolve_jewellery_path,
 )
+from services.ar_jobs import (
+    SUPABASE_KEY,
+    SUPABASE_URL,
+    JobOutput,
+    JobStoreFullError,
+    TryonJob,
+    get_job_store,
+    save_outputs_hook,
+)
+from services.ar_pool import (
+    OverlayRef,
+    PoolSaturatedError,
+    compose_many_task,
+    compose_task,
+    get_ar_pool,
+    resize_encode_task,
+)
+from services.ar_stream import StreamSession
+from services.ar_timing import get_stage_metrics, server_timing
+from services.ar_video import render_video
+from services.frame_cache import image_digest
+from services.overlay_cache import PresetOverlay
+from services.result_cache import CachedResult, get_result_cache, result_key
 
 router = APIRouter(prefix="/ar-tryon", tags=["ar-tryon"])
 
+MAX_BATCH_ITEMS = 8
+# Concurrent /ar-tryon/stream connections per API process (each uses about one core).
+AR_STREAM_MAX = int(os.getenv("AR_STREAM_MAX", "4"))
+_active_streams = 0
+# Largest accepted /ar-tryon/jobs/video upload.
+AR_VIDEO_MAX_MB = int(os.getenv("AR_VIDEO_MAX_MB", "100"))
+
+
+class BatchItem(BaseModel):
+    """One piece for /compose/batch: a preset or an uploaded overlay, plus placement overrides."""
+
+    jewellery_id: Optional[str] = None
+    overlay_index: Optional[int] = Field(None, ge=0, description="Index into the uploaded `overlays` files")
+    margin_x: Optional[int] = None
+    margin_y: Optional[int] = None
+    scale_w: Optional[float] = None
+    scale_h: Optional[float] = None
+    drop_factor: Optional[float] = Field(None, ge=0.0, le=0.6)
+    use_face_height: Optional[bool] = None
+
+
+class StreamConfig(BatchItem):
+    """JSON text message configuring /ar-tryon/stream (may be re-sent to switch pieces)."""
+
+    overlay_base64: Optional[str] = Field(None, description="Custom PNG overlay (base64) instead of a preset")
+    width: int = Field(720, ge=160, le=1920)
+    height: int = Field(640, ge=120, le=1080)
+    flip_horizontal: bool = False
+    detect_every: int = Field(10, ge=1, le=120, description="Full face detection every N frames")
+    jpeg_quality: int = Field(80, ge=30, le=95)
+
+
+def _pool_busy(e: PoolSaturatedError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+def _media_type(output_format: str) -> str:
+    return output_media_type(output_format)
+
+
+def _accept_q(accept: Optional[str]) -> dict[str, float]:
+    """Media ranges of an Accept header with their q-values (malformed q counts as 1)."""
+    out: dict[str, float] = {}
+    for item in (accept or "").split(","):
+        media, _, params = item.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    pass
+        if media:
+            out[media.strip().lower()] = q
+    return out
+
+
+def _negotiate_output_format(output_format: Optional[str], accept: Optional[str]) -> str:
+    """
+    Explicit `output_format` wins. Empty or "auto" picks the image type the Accept header
+    names with the highest q; ties go to the fastest encoder (JPEG, then WebP, then PNG).
+    No image type named (e.g. */*) keeps the PNG default.
+    """
+    if output_format and output_format.lower() != "auto":
+        return normalize_output_format(output_format)
+    q = _accept_q(accept)
+    ranked = [
+        (q[OUTPUT_MEDIA_TYPES[fmt]], -i, fmt)
+        for i, fmt in enumerate(("jpg", "webp", "png"))
+        if q.get(OUTPUT_MEDIA_TYPES[fmt], 0) > 0
+    ]
+    return max(ranked)[2] if ranked else "png"
+
+
+def _wants_multipart(accept: Optional[str]) -> bool:
+    """Accept asks for multipart/mixed at least as much as for any bare image type."""
+    q = _accept_q(accept)
+    multipart = q.get("multipart/mixed", 0.0)
+    return multipart > 0 and multipart >= max((v for k, v in q.items() if k.startswith("image/")), default=0.0)
+
+
+def _multipart_response(parts: List[Tuple[dict[str, str], bytes]], headers: Optional[dict[str, str]] = None) -> Response:
+    """Stream a multipart/mixed response from (part headers, body) pairs, one part at a time."""
+    boundary = uuid.uuid4().hex
+
+    def chunks() -> Any:
+        for part_headers, body in parts:
+            head = "".join(f"{k}: {v}\r\n" for k, v in part_headers.items())
+            yield f"--{boundary}\r\n{head}Content-Length: {len(body)}\r\n\r\n".encode("ascii")
+            yield body
+            yield b"\r\n"
+        yield f"--{boundary}--\r\n".encode("ascii")
+
+    return StreamingResponse(chunks(), media_type=f"multipart/mixed; boundary={boundary}", headers=headers)
+
+
+def _variants_response(
+    outputs: List[bytes],
+    media: str,
+    meta: dict[str, Any],
+    names: Optional[List[str]] = None,
+    headers: Optional[dict[str, str]] = None,
+) -> Response:
+    """multipart/mixed: a JSON `meta` part, then one image part per output (in order)."""
+    ext = {"image/png": "png", "image/webp": "webp"}.get(media, "jpg")
+    names = names or [f"item-{i}" for i in range(len(outputs))]
+    parts: List[Tuple[dict[str, str], bytes]] = [
+        (
+            {"Content-Type": "application/json", "Content-Disposition": 'inline; name="meta"'},
+            json.dumps(meta).encode("utf-8"),
+        )
+    ]
+    for name, body in zip(names, outputs):
+        parts.append(
+            (
+                {"Content-Type": media, "Content-Disposition": f'inline; name="{name}"; filename="{name}.{ext}"'},
+                body,
+            )
+        )
+    return _multipart_response(parts, headers)
+
+
+def _decode_overlay_bytes(obytes: bytes) -> np.ndarray:
+    overlay_bgra = cv2.imdecode(np.frombuffer(obytes, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+    if overlay_bgra is None:
+        raise HTTPException(status_code=400, detail="Could not decode overlay image")
+    if overlay_bgra.ndim == 2:
+        overlay_bgra = cv2.cvtColor(overlay_bgra, cv2.COLOR_GRAY2BGRA)
+    elif overlay_bgra.shape[2] == 3:
+        overlay_bgra = cv2.cvtColor(overlay_bgra, cv2.COLOR_BGR2BGRA)
+    return overlay_bgra
+
 
 async def _resolve_overlay(
     jewellery_id: Optional[str],
@@ -30,22 +198,17 @@ async def _resolve_overlay(
     margin_y: Optional[int],
     scale_w: Optional[float],
     scale_h: Optional[float],
-) -> Tuple[np.ndarray, int, int, float, float, float, bool, bool]:
+) -> Tuple[OverlayRef, int, int, float, float, float, bool, bool]:
     """
-    Returns overlay_bgra, mx, my, dw, dh, drop_factor, use_face_height, use_form_placement.
+    Returns overlay, mx, my, dw, dh, drop_factor, use_face_height, use_form_placement.
 
-    If overlay file uploaded, drop_factor/use_face_height placeholders; caller uses Form values.
-    If server preset, drop_factor/use_face_height come from jewellery.json.
+    If overlay file uploaded, overlay is the decoded BGRA array and drop_factor/use_face_height
+    are placeholders; caller uses Form values.
+    If server preset, overlay is the preset id (decoded by the AR worker pool, which preloads
+    presets) and drop_factor/use_face_height come from jewellery.json.
     """
     if overlay is not None and overlay.filename:
-        obytes = await overlay.read()
-        overlay_bgra = cv2.imdecode(np.frombuffer(obytes, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
-        if overlay_bgra is None:
-            raise HTTPException(status_code=400, detail="Could not decode overlay image")
-        if overlay_bgra.ndim == 2:
-            overlay_bgra = cv2.cvtColor(overlay_bgra, cv2.COLOR_GRAY2BGRA)
-        elif overlay_bgra.shape[2] == 3:
-            overlay_bgra = cv2.cvtColor(overlay_bgra, cv2.COLOR_BGR2BGRA)
+        overlay_bgra = _decode_overlay_bytes(await overlay.read())
         mx = int(margin_x if margin_x is not None else 0)
         my = int(margin_y if margin_y is not None else 0)
         dw = float(scale_w if scale_w is not None else 1.0)
@@ -60,15 +223,165 @@ async def _resolve_overlay(
             detail="Provide `jewellery_id` (see /ar-tryon/presets) or upload `overlay` PNG",
         )
     cfg = presets[jid]
-    path = resolve_jewellery_path(cfg["path"])
-    overlay_bgra = load_overlay_bgra(path)
     mx = int(margin_x if margin_x is not None else cfg.get("x", 0))
     my = int(margin_y if margin_y is not None else cfg.get("y", 0))
     dw = float(scale_w if scale_w is not None else cfg.get("dw", 1.0))
     dh = float(scale_h if scale_h is not None else cfg.get("dh", 1.0))
     drop = float(cfg.get("drop_factor", 0) or 0)
     ufh = bool(cfg.get("use_face_height", False))
-    return overlay_bgra, mx, my, dw, dh, drop, ufh, False
+    return jid, mx, my, dw, dh, drop, ufh, False
+
+
+def _parse_faces(faces: Optional[str]) -> Union[str, List[int]]:
+    """`faces` form value: "primary" (default), "all", or comma-separated indices like "0,2"."""
+    value = (faces or "primary").strip().lower()
+    if value in ("primary", "all"):
+        return value
+    try:
+        indices = [int(v) for v in value.split(",") if v.strip()]
+    except ValueError:
+        indices = []
+    if not indices or min(indices) < 0:
+        raise HTTPException(status_code=400, detail="faces must be 'primary', 'all' or face indices like '0,2'")
+    return indices
+
+
+def _compose_headers(meta: dict[str, Any], cache_status: str) -> dict[str, str]:
+    detection = meta.get("detection") or {}
+    used = meta.get("used_face_indices") or [meta.get("used_face_index", "")]
+    return {
+        "X-AR-Face-Count": str(meta.get("face_count", "")),
+        "X-AR-Used-Face-Index": ",".join(str(i) for i in used),
+        "X-AR-Face-Rects": ";".join(",".join(str(v) for v in r) for r in meta.get("faces") or []),
+        "X-AR-Detect-Pass": str(detection.get("winning_pass") or ""),
+        "X-AR-Detect-Ms": str(detection.get("detect_ms", "")),
+        "X-AR-Cache": cache_status,
+    }
+
+
+async def _overlay_token(jewellery_id: Optional[str], overlay: Optional[UploadFile]) -> Optional[str]:
+    """
+    Result-cache identity of the overlay without decoding it: digest of an uploaded file, or
+    preset id + PNG mtime + its jewellery.json entry. None if the preset is unknown.
+    """
+    if overlay is not None and overlay.filename:
+        data = await overlay.read()
+        await overlay.seek(0)  # _resolve_overlay reads it again on a miss
+        return f"upload:{image_digest(data)}"
+    presets = load_jewellery_presets()
+    jid = jewellery_id or (next(iter(presets.keys())) if presets else None)
+    if not jid or jid not in presets:
+        return None
+    try:
+        mtime = resolve_jewellery_path(presets[jid]["path"]).stat().st_mtime_ns
+    except (KeyError, OSError):
+        return None
+    return f"preset:{jid}:{mtime}:{json.dumps(presets[jid], sort_keys=True)}"
+
+
+async def _lookup_result(
+    image_bytes: bytes,
+    jewellery_id: Optional[str],
+    overlay: Optional[UploadFile],
+    params: dict[str, Any],
+) -> Tuple[Optional[str], Optional[CachedResult]]:
+    """(result-cache key or None when caching is off / not possible, cached result or None)."""
+    cache = get_result_cache()
+    if not cache.enabled:
+        return None, None
+    token = await _overlay_token(jewellery_id, overlay)
+    if token is None:
+        return None, None
+    key = result_key(image_digest(image_bytes), token, params)
+    return key, cache.get(key)
+
+
+def _timing_label(jewellery_id: Optional[str], overlay: Optional[UploadFile]) -> str:
+    """Histogram label: the preset the request resolves to, or "upload" for a custom overlay PNG."""
+    if overlay is not None and overlay.filename:
+        return "upload"
+    return jewellery_id or next(iter(load_jewellery_presets()), "default")
+
+
+def _record_timings(label: str, meta: dict[str, Any], pool_ms: float, request_ms: float) -> str:
+    """
+    Feed the worker stage timings plus API-side "queue" (pool wait + pickling) and "request"
+    into the per-preset histograms; returns the matching Server-Timing header value.
+    """
+    stages = dict(meta.get("timings") or {})
+    worker_ms = stages.pop("total", 0.0)
+    stages["worker"] = worker_ms
+    stages["queue"] = round(max(0.0, pool_ms - worker_ms), 2)
+    stages["request"] = round(request_ms, 2)
+    get_stage_metrics().observe(label, stages)
+    winning = (meta.get("detection") or {}).get("winning_pass")
+    return server_timing(stages, {"detect": str(winning)} if winning else None)
+
+
+def _compose_response(
+    body: bytes, media: str, meta: dict[str, Any], headers: dict[str, str], multipart: bool
+) -> Response:
+    """/compose body: the bare image, or multipart/mixed meta + image when the client asked for it."""
+    headers["Vary"] = "Accept"
+    if multipart:
+        return _variants_response([body], media, meta, names=["image"], headers=headers)
+    return Response(content=body, media_type=media, headers=headers)
+
+
+def _compose_params(**params: Any) -> dict[str, Any]:
+    """Compose form values that change the output (output_format normalised to png/jpg/webp)."""
+    params["output_format"] = normalize_output_format(str(params["output_format"]))
+    return params
+
+
+def _placement_item(it: BatchItem, ref: Any, cfg: dict[str, Any]) -> OverlayItem:
+    """Request overrides win; otherwise preset values from jewellery.json (cfg), then defaults."""
+    return OverlayItem(
+        overlay=ref,
+        mx=int(it.margin_x if it.margin_x is not None else cfg.get("x", 0)),
+        my=int(it.margin_y if it.margin_y is not None else cfg.get("y", 0)),
+        dw=float(it.scale_w if it.scale_w is not None else cfg.get("dw", 1.0)),
+        dh=float(it.scale_h if it.scale_h is not None else cfg.get("dh", 1.0)),
+        drop_factor=float(it.drop_factor if it.drop_factor is not None else cfg.get("drop_factor", 0) or 0),
+        use_face_height=bool(it.use_face_height if it.use_face_height is not None else cfg.get("use_face_height", False)),
+    )
+
+
+async def _resolve_batch_items(items_json: str, overlays: List[UploadFile]) -> List[OverlayItem]:
+    """Parse the `items` JSON of /compose/batch into OverlayItems (preset ids or decoded uploads)."""
+    try:
+        raw = json.loads(items_json)
+        if not isinstance(raw, list):
+            raise ValueError("`items` must be a JSON list")
+        parsed = [BatchItem(**d) for d in raw]
+    except (ValueError, TypeError, ValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid `items`: {e}") from e
+    if not parsed:
+        raise HTTPException(status_code=400, detail="`items` must contain at least one piece")
+    if len(parsed) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per batch")
+
+    uploads = [f for f in overlays if f is not None and f.filename]
+    decoded: dict[int, np.ndarray] = {}
+    presets = load_jewellery_presets()
+    out: List[OverlayItem] = []
+    for it in parsed:
+        if it.overlay_index is not None:
+            if it.overlay_index >= len(uploads):
+                raise HTTPException(status_code=400, detail=f"overlay_index {it.overlay_index} out of range")
+            if it.overlay_index not in decoded:
+                decoded[it.overlay_index] = _decode_overlay_bytes(await uploads[it.overlay_index].read())
+            ref: OverlayRef = decoded[it.overlay_index]
+            cfg: dict[str, Any] = {}
+        elif it.jewellery_id in presets:
+            ref, cfg = it.jewellery_id, presets[it.jewellery_id]
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Each item needs a known `jewellery_id` (see /ar-tryon/presets) or an `overlay_index`",
+            )
+        out.append(_placement_item(it, ref, cfg))
+    return out
 
 
 @router.get("/presets")
@@ -88,6 +401,28 @@ def list_jewellery_presets() -> dict[str, Any]:
     return {"presets": out, "config_path": str(JEWELLERY_JSON)}
 
 
+@router.get("/pool/stats")
+def ar_pool_stats() -> dict[str, Any]:
+    """AR worker pool queue depth and per-worker utilisation."""
+    return get_ar_pool().stats()
+
+
+@router.get("/cache/stats")
+def ar_cache_stats() -> dict[str, Any]:
+    """Result cache of this API process (memory tier + optional shared disk tier), with hit ratio."""
+    return {"result_cache": get_result_cache().stats()}
+
+
+@router.get("/metrics")
+def ar_stage_metrics() -> dict[str, Any]:
+    """
+    Per-preset latency histograms of this API process, one per pipeline stage (decode, resize,
+    detect, overlay, blend, encode, ...), plus worker time, pool queue wait and whole request.
+    Result-cache hits are counted under the "result_cache" stage only.
+    """
+    return get_stage_metrics().snapshot()
+
+
 @router.post("/compose")
 async def compose_ar_tryon(
     image: UploadFile = File(..., description="User photo (JPEG/PNG)"),
@@ -103,7 +438,12 @@ async def compose_ar_tryon(
     width: int = Form(720, ge=320, le=1920),
     height: int = Form(640, ge=240, le=1080),
     flip_horizontal: bool = Form(False),
-    output_format: str = Form("png"),
+    output_format: Optional[str] = Form(
+        None,
+        description="png, jpg or webp. Empty or `auto`: picked from the Accept header (default png).",
+    ),
+    quality: Optional[int] = Form(None, ge=1, le=100, description="JPEG/WebP quality (default 95 / 80)"),
+    png_compression: Optional[int] = Form(None, ge=0, le=9, description="PNG zlib level: 0 fastest, 9 smallest"),
     return_original_if_no_face: bool = Form(False),
     detect_scale_factor: Optional[float] = Form(
         None,
@@ -125,15 +465,52 @@ async def compose_ar_tryon(
         False,
         description="Scale dw/dh against face height instead of width.",
     ),
+    faces: str = Form(
+        "primary",
+        description="Group photos: `primary` (largest face), `all`, or face indices left to right, e.g. `0,2`.",
+    ),
+    accept: Optional[str] = Header(None),
 ) -> Response:
     """
     Apply virtual jewellery overlay using Haar frontal face detection (ARJewelBox-style).
 
     Provide either `jewellery_id` (preset) or upload `overlay` PNG. If both are given, `overlay` wins.
+
+    With `Accept: multipart/mixed` the response is a JSON `meta` part followed by an `image`
+    part (no base64, unlike /compose/json).
     """
+    t_request = time.perf_counter()
     image_bytes = await image.read()
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Empty image upload")
+    output_format = _negotiate_output_format(output_format, accept)
+    multipart = _wants_multipart(accept)
+    face_selection = _parse_faces(faces)
+
+    params = _compose_params(
+        margin_x=margin_x,
+        margin_y=margin_y,
+        scale_w=scale_w,
+        scale_h=scale_h,
+        width=width,
+        height=height,
+        flip_horizontal=flip_horizontal,
+        output_format=output_format,
+        quality=quality,
+        png_compression=png_compression,
+        detect_scale_factor=detect_scale_factor,
+        detect_min_neighbors=detect_min_neighbors,
+        drop_factor=drop_factor,
+        use_face_height=use_face_height,
+        faces=face_selection,
+    )
+    cache_key, cached = await _lookup_result(image_bytes, jewellery_id, overlay, params)
+    if cached is not None:
+        headers = _compose_headers(cached.meta, "hit")
+        hit_ms = round((time.perf_counter() - t_request) * 1000, 2)
+        get_stage_metrics().observe(_timing_label(jewellery_id, overlay), {"result_cache": hit_ms})
+        headers["Server-Timing"] = server_timing({"result_cache": hit_ms})
+        return _compose_response(cached.body, cached.media_type, cached.meta, headers, multipart)
 
     ob, mx, my, dw, dh, preset_drop, preset_ufh, use_form_placement = await _resolve_overlay(
         jewellery_id, overlay, margin_x, margin_y, scale_w, scale_h
@@ -141,46 +518,67 @@ async def compose_ar_tryon(
     d_drop = drop_factor if use_form_placement else preset_drop
     d_ufh = use_face_height if use_form_placement else preset_ufh
 
+    pool = get_ar_pool()
+    original = None
     try:
-        out_bytes, meta = compose_from_bytes(
-            image_bytes,
-            ob,
-            mx,
-            my,
-            dw,
-            dh,
-            width=width,
-            height=height,
-            output_format=output_format,
-            flip_horizontal=flip_horizontal,
-            detect_scale_factor=detect_scale_factor,
-            detect_min_neighbors=detect_min_neighbors,
-            drop_factor=d_drop,
-            use_face_height=d_ufh,
-        )
+        async with get_admission("tryon").slot():
+            t_pool = time.perf_counter()
+            try:
+                out_bytes, meta = await pool.run(
+                    compose_task,
+                    image_bytes,
+                    ob,
+                    mx,
+                    my,
+                    dw,
+                    dh,
+                    width=width,
+                    height=height,
+                    output_format=output_format,
+                    quality=quality,
+                    png_compression=png_compression,
+                    flip_horizontal=flip_horizontal,
+                    detect_scale_factor=detect_scale_factor,
+                    detect_min_neighbors=detect_min_neighbors,
+                    drop_factor=d_drop,
+                    use_face_height=d_ufh,
+                    faces=face_selection,
+                )
+            except ValueError as e:
+                if "No face detected" not in str(e) or not return_original_if_no_face:
+                    raise
+                # The fallback encode is pool work too: it stays inside the same admission slot
+                try:
+                    original = await pool.run(
+                        resize_encode_task, image_bytes, width, height, output_format, quality, png_compression
+                    )
+                except (PoolSaturatedError, HTTPException):
+                    raise
+                except ValueError as e2:
+                    raise HTTPException(status_code=400, detail=str(e2)) from e2
+                except Exception as e2:
+                    raise HTTPException(status_code=500, detail="Encode failed") from e2
+    except HTTPException:
+        raise
+    except AdmissionRejected as e:
+        raise admission_busy(e) from e
+    except PoolSaturatedError as e:
+        raise _pool_busy(e) from e
     except ValueError as e:
-        if "No face detected" in str(e) and return_original_if_no_face:
-            arr = np.frombuffer(image_bytes, dtype=np.uint8)
-            frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-            if frame is None:
-                raise HTTPException(status_code=400, detail="Could not decode input image") from e
-            frame = cv2.resize(frame, (width, height))
-            ext = ".png" if output_format.lower() == "png" else ".jpg"
-            ok, buf = cv2.imencode(ext, frame)
-            if not ok:
-                raise HTTPException(status_code=500, detail="Encode failed") from e
-            media = "image/png" if ext == ".png" else "image/jpeg"
-            return Response(content=buf.tobytes(), media_type=media)
         raise HTTPException(status_code=422, detail=str(e)) from e
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
+    if original is not None:
+        return Response(content=original, media_type=_media_type(output_format), headers={"Vary": "Accept"})
 
-    media = "image/png" if output_format.lower() == "png" else "image/jpeg"
-    headers = {
-        "X-AR-Face-Count": str(meta.get("face_count", "")),
-        "X-AR-Used-Face-Index": str(meta.get("used_face_index", "")),
-    }
-    return Response(content=out_bytes, media_type=media, headers=headers)
+    pool_ms = (time.perf_counter() - t_pool) * 1000
+    media = _media_type(output_format)
+    if cache_key is not None:
+        get_result_cache().put(cache_key, CachedResult(out_bytes, media, meta))
+    headers = _compose_headers(meta, "miss" if cache_key else "off")
+    request_ms = (time.perf_counter() - t_request) * 1000
+    headers["Server-Timing"] = _record_timings(_timing_label(jewellery_id, overlay), meta, pool_ms, request_ms)
+    return _compose_response(out_bytes, media, meta, headers, multipart)
 
 
 @router.post("/compose/json")
@@ -195,17 +593,50 @@ async def compose_ar_tryon_json(
     width: int = Form(720),
     height: int = Form(640),
     flip_horizontal: bool = Form(False),
-    output_format: str = Form("png"),
+    output_format: str = Form("png", description="png, jpg or webp"),
+    quality: Optional[int] = Form(None, ge=1, le=100, description="JPEG/WebP quality (default 95 / 80)"),
+    png_compression: Optional[int] = Form(None, ge=0, le=9, description="PNG zlib level: 0 fastest, 9 smallest"),
     detect_scale_factor: Optional[float] = Form(None),
     detect_min_neighbors: Optional[int] = Form(None, ge=1, le=10),
     drop_factor: float = Form(0.0, ge=0.0, le=0.6),
     use_face_height: bool = Form(False),
+    faces: str = Form("primary", description="primary, all, or face indices like 0,2"),
 ) -> dict[str, Any]:
-    """Same as /compose but returns JSON with base64 image."""
+    """
+    Same as /compose but returns JSON with base64 image (a third larger than the image; prefer
+    /compose with `Accept: multipart/mixed` for image + meta in one binary response).
+    """
     image_bytes = await image.read()
     if not image_bytes:
         raise HTTPException(status_code=400, detail="Empty image upload")
 
+    face_selection = _parse_faces(faces)
+    params = _compose_params(
+        margin_x=margin_x,
+        margin_y=margin_y,
+        scale_w=scale_w,
+        scale_h=scale_h,
+        width=width,
+        height=height,
+        flip_horizontal=flip_horizontal,
+        output_format=output_format,
+        quality=quality,
+        png_compression=png_compression,
+        detect_scale_factor=detect_scale_factor,
+        detect_min_neighbors=detect_min_neighbors,
+        drop_factor=drop_factor,
+        use_face_height=use_face_height,
+        faces=face_selection,
+    )
+    cache_key, cached = await _lookup_result(image_bytes, jewellery_id, overlay, params)
+    if cached is not None:
+        return {
+            "image_base64": base64.b64encode(cached.body).decode("ascii"),
+            "mime_type": cached.media_type,
+            "meta": cached.meta,
+            "cache": "hit",
+        }
+
     ob, mx, my, dw, dh, preset_drop, preset_ufh, use_form_placement = await _resolve_overlay(
         jewellery_id, overlay, margin_x, margin_y, scale_w, scale_h
     )
@@ -213,28 +644,533 @@ async def compose_ar_tryon_json(
     d_ufh = use_face_height if use_form_placement else preset_ufh
 
     try:
-        out_bytes, meta = compose_from_bytes(
-            image_bytes,
-            ob,
-            mx,
-            my,
-            dw,
-            dh,
-            width=width,
-            height=height,
-            output_format=output_format,
-            flip_horizontal=flip_horizontal,
-            detect_scale_factor=detect_scale_factor,
-            detect_min_neighbors=detect_min_neighbors,
-            drop_factor=d_drop,
-            use_face_height=d_ufh,
-        )
+        async with get_admission("tryon").slot():
+            out_bytes, meta = await get_ar_pool().run(
+                compose_task,
+                image_bytes,
+                ob,
+                mx,
+                my,
+                dw,
+                dh,
+                width=width,
+                height=height,
+                output_format=output_format,
+                quality=quality,
+                png_compression=png_compression,
+                flip_horizontal=flip_horizontal,
+                detect_scale_factor=detect_scale_factor,
+                detect_min_neighbors=detect_min_neighbors,
+                drop_factor=d_drop,
+                use_face_height=d_ufh,
+                faces=face_selection,
+            )
+    except AdmissionRejected as e:
+        raise admission_busy(e) from e
+    except PoolSaturatedError as e:
+        raise _pool_busy(e) from e
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e)) from e
 
-    mime = "image/png" if output_format.lower() == "png" else "image/jpeg"
+    mime = _media_type(output_format)
+    if cache_key is not None:
+        get_result_cache().put(cache_key, CachedResult(out_bytes, mime, meta))
     return {
         "image_base64": base64.b64encode(out_bytes).decode("ascii"),
         "mime_type": mime,
         "meta": meta,
+        "cache": "miss" if cache_key else "off",
+    }
+
+
+@router.post("/compose/batch")
+async def compose_ar_tryon_batch(
+    image: UploadFile = File(..., description="User photo (JPEG/PNG)"),
+    items: str = Form(
+        ...,
+        description='JSON list of pieces, e.g. [{"jewellery_id": "jewel1"}, {"overlay_index": 0, "margin_x": -20}]',
+    ),
+    overlays: List[UploadFile] = File([], description="Custom PNG overlays referenced by overlay_index"),
+    mode: str = Form("composite", description="composite: all pieces on one image; variants: one image per piece"),
+    width: int = Form(720, ge=320, le=1920),
+    height: int = Form(640, ge=240, le=1080),
+    flip_horizontal: bool = Form(False),
+    output_format: str = Form("png", description="png, jpg or webp"),
+    quality: Optional[int] = Form(None, ge=1, le=100, description="JPEG/WebP quality (default 95 / 80)"),
+    png_compression: Optional[int] = Form(None, ge=0, le=9, description="PNG zlib level: 0 fastest, 9 smallest"),
+    detect_scale_factor: Optional[float] = Form(None),
+    detect_min_neighbors: Optional[int] = Form(None, ge=1, le=10),
+) -> Response:
+    """
+    Try several pieces (e.g. necklace + earrings) with one upload, one face detection and, in
+    composite mode, one encode.
+
+    composite → single image (same headers as /compose).
+    variants → multipart/mixed: a JSON `meta` part, then one image part per item (in order).
+    """
+    if mode not in ("composite", "variants"):
+        raise HTTPException(status_code=400, detail="`mode` must be 'composite' or 'variants'")
+    image_bytes = await image.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    overlay_items = await _resolve_batch_items(items, overlays)
+
+    try:
+        async with get_admission("tryon").slot():
+            outputs, meta = await get_ar_pool().run(
+                compose_many_task,
+                image_bytes,
+                overlay_items,
+                width=width,
+                height=height,
+                output_format=output_format,
+                quality=quality,
+                png_compression=png_compression,
+                flip_horizontal=flip_horizontal,
+                detect_scale_factor=detect_scale_factor,
+                detect_min_neighbors=detect_min_neighbors,
+                variants=mode == "variants",
+            )
+    except AdmissionRejected as e:
+        raise admission_busy(e) from e
+    except PoolSaturatedError as e:
+        raise _pool_busy(e) from e
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e)) from e
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e)) from e
+
+    media = _media_type(output_format)
+    if mode == "composite":
+        headers = {
+            "X-AR-Face-Count": str(meta.get("face_count", "")),
+            "X-AR-Used-Face-Index": str(meta.get("used_face_index", "")),
+            "X-AR-Item-Count": str(meta.get("item_count", "")),
+        }
+        return Response(content=outputs[0], media_type=media, headers=headers)
+    return _variants_response(outputs, media, meta)
+
+
+def _job_busy(e: JobStoreFullError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+
+def _storage_hook(save_to_storage: bool, product_id: Optional[UUID], user_id: Optional[UUID]) -> Any:
+    if not save_to_storage:
+        return None
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise HTTPException(status_code=500, detail="Supabase configuration missing")
+    return save_outputs_hook(str(product_id) if product_id else None, str(user_id) if user_id else None)
+
+
+def _job_accepted(job: TryonJob) -> dict[str, Any]:
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/ar-tryon/jobs/{job.id}",
+        "result_url": f"/ar-tryon/jobs/{job.id}/result",
     }
+
+
+@router.post("/jobs/compose", status_code=202)
+async def submit_compose_job(
+    image: UploadFile = File(..., description="User photo (JPEG/PNG)"),
+    jewellery_id: Optional[str] = Form(None),
+    overlay: Optional[UploadFile] = File(None),
+    margin_x: Optional[int] = Form(None),
+    margin_y: Optional[int] = Form(None),
+    scale_w: Optional[float] = Form(None),
+    scale_h: Optional[float] = Form(None),
+    width: int = Form(720, ge=320, le=1920),
+    height: int = Form(640, ge=240, le=1080),
+    flip_horizontal: bool = Form(False),
+    output_format: str = Form("png", description="png, jpg or webp"),
+    quality: Optional[int] = Form(None, ge=1, le=100, description="JPEG/WebP quality (default 95 / 80)"),
+    png_compression: Optional[int] = Form(None, ge=0, le=9, description="PNG zlib level: 0 fastest, 9 smallest"),
+    detect_scale_factor: Optional[float] = Form(None),
+    detect_min_neighbors: Optional[int] = Form(None, ge=1, le=10),
+    drop_factor: float = Form(0.0, ge=0.0, le=0.6),
+    use_face_height: bool = Form(False),
+    faces: str = Form("primary", description="primary, all, or face indices like 0,2"),
+    save_to_storage: bool = Form(False, description="Upload the result to storage when done"),
+    product_id: Optional[UUID] = Form(None, description="With user_id: also create a ProductTryonImage row"),
+    user_id: Optional[UUID] = Form(None),
+) -> dict[str, Any]:
+    """
+    Queue a /compose request and return its job id at once (202).
+
+    Poll GET /ar-tryon/jobs/{job_id}, then fetch GET /ar-tryon/jobs/{job_id}/result.
+    """
+    image_bytes = await image.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    after = _storage_hook(save_to_storage, product_id, user_id)
+    face_selection = _parse_faces(faces)
+
+    params = _compose_params(
+        margin_x=margin_x,
+        margin_y=margin_y,
+        scale_w=scale_w,
+        scale_h=scale_h,
+        width=width,
+        height=height,
+        flip_horizontal=flip_horizontal,
+        output_format=output_format,
+        quality=quality,
+        png_compression=png_compression,
+        detect_scale_factor=detect_scale_factor,
+        detect_min_neighbors=detect_min_neighbors,
+        drop_factor=drop_factor,
+        use_face_height=use_face_height,
+        faces=face_selection,
+    )
+    cache_key, cached = await _lookup_result(image_bytes, jewellery_id, overlay, params)
+    if cached is None:
+        ob, mx, my, dw, dh, preset_drop, preset_ufh, use_form_placement = await _resolve_overlay(
+            jewellery_id, overlay, margin_x, margin_y, scale_w, scale_h
+        )
+        d_drop = drop_factor if use_form_placement else preset_drop
+        d_ufh = use_face_height if use_form_placement else preset_ufh
+
+    async def work() -> JobOutput:
+        if cached is not None:
+            return [cached.body], cached.media_type, cached.meta
+        async with get_admission("tryon").slot(BATCH):
+            out_bytes, meta = await get_ar_pool().run(
+                compose_task,
+                image_bytes,
+                ob,
+                mx,
+                my,
+                dw,
+                dh,
+                width=width,
+                height=height,
+                output_format=output_format,
+                quality=quality,
+                png_compression=png_compression,
+                flip_horizontal=flip_horizontal,
+                detect_scale_factor=detect_scale_factor,
+                detect_min_neighbors=detect_min_neighbors,
+                drop_factor=d_drop,
+                use_face_height=d_ufh,
+                faces=face_selection,
+            )
+        media = _media_type(output_format)
+        if cache_key is not None:
+            get_result_cache().put(cache_key, CachedResult(out_bytes, media, meta))
+        return [out_bytes], media, meta
+
+    try:
+        job = get_job_store().submit("compose", work, after)
+    except JobStoreFullError as e:
+        raise _job_busy(e) from e
+    return _job_accepted(job)
+
+
+@router.post("/jobs/batch", status_code=202)
+async def submit_batch_job(
+    image: UploadFile = File(..., description="User photo (JPEG/PNG)"),
+    items: str = Form(..., description="Same JSON list as /compose/batch"),
+    overlays: List[UploadFile] = File([], description="Custom PNG overlays referenced by overlay_index"),
+    mode: str = Form("composite", description="composite: all pieces on one image; variants: one image per piece"),
+    width: int = Form(720, ge=320, le=1920),
+    height: int = Form(640, ge=240, le=1080),
+    flip_horizontal: bool = Form(False),
+    output_format: str = Form("png", description="png, jpg or webp"),
+    quality: Optional[int] = Form(None, ge=1, le=100, description="JPEG/WebP quality (default 95 / 80)"),
+    png_compression: Optional[int] = Form(None, ge=0, le=9, description="PNG zlib level: 0 fastest, 9 smallest"),
+    detect_scale_factor: Optional[float] = Form(None),
+    detect_min_neighbors: Optional[int] = Form(None, ge=1, le=10),
+    save_to_storage: bool = Form(False, description="Upload every result image to storage when done"),
+    product_id: Optional[UUID] = Form(None, description="With user_id: also create ProductTryonImage rows"),
+    user_id: Optional[UUID] = Form(None),
+) -> dict[str, Any]:
+    """Queue a /compose/batch request and return its job id at once (202)."""
+    if mode not in ("composite", "variants"):
+        raise HTTPException(status_code=400, detail="`mode` must be 'composite' or 'variants'")
+    image_bytes = await image.read()
+    if not image_bytes:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    after = _storage_hook(save_to_storage, product_id, user_id)
+    overlay_items = await _resolve_batch_items(items, overlays)
+
+    async def work() -> JobOutput:
+        async with get_admission("tryon").slot(BATCH):
+            outputs, meta = await get_ar_pool().run(
+                compose_many_task,
+                image_bytes,
+                overlay_items,
+                width=width,
+                height=height,
+                output_format=output_format,
+                quality=quality,
+                png_compression=png_compression,
+                flip_horizontal=flip_horizontal,
+                detect_scale_factor=detect_scale_factor,
+                detect_min_neighbors=detect_min_neighbors,
+                variants=mode == "variants",
+            )
+        return outputs, _media_type(output_format), meta
+
+    try:
+        job = get_job_store().submit("batch", work, after)
+    except JobStoreFullError as e:
+        raise _job_busy(e) from e
+    return _job_accepted(job)
+
+
+@router.post("/jobs/video", status_code=202)
+async def submit_video_job(
+    video: UploadFile = File(..., description="Short clip (MP4 or anything OpenCV/FFmpeg decodes)"),
+    jewellery_id: Optional[str] = Form(None),
+    overlay: Optional[UploadFile] = File(None),
+    margin_x: Optional[int] = Form(None),
+    margin_y: Optional[int] = Form(None),
+    scale_w: Optional[float] = Form(None),
+    scale_h: Optional[float] = Form(None),
+    width: Optional[int] = Form(None, ge=160, le=1920, description="Output width (default: source, max side AR_VIDEO_MAX_SIDE)"),
+    height: Optional[int] = Form(None, ge=120, le=1920),
+    flip_horizontal: bool = Form(False),
+    detect_every: int = Form(10, ge=1, le=120, description="Full face detection every N frames"),
+    drop_factor: float = Form(0.0, ge=0.0, le=0.6),
+    use_face_height: bool = Form(False),
+    save_to_storage: bool = Form(False, description="Upload the clip to storage when done"),
+    product_id: Optional[UUID] = Form(None, description="With user_id: also create a ProductTryonImage row"),
+    user_id: Optional[UUID] = Form(None),
+) -> dict[str, Any]:
+    """
+    Queue a video try-on: the clip is rendered on the AR worker pool (segments in parallel)
+    and the result (video/mp4, no audio) is fetched from GET /ar-tryon/jobs/{job_id}/result.
+    Job meta reports frames, detections and render frames/sec.
+    """
+    after = _storage_hook(save_to_storage, product_id, user_id)
+    ob, mx, my, dw, dh, preset_drop, preset_ufh, use_form_placement = await _resolve_overlay(
+        jewellery_id, overlay, margin_x, margin_y, scale_w, scale_h
+    )
+    item = OverlayItem(
+        ob,
+        mx,
+        my,
+        dw,
+        dh,
+        drop_factor if use_form_placement else preset_drop,
+        use_face_height if use_form_placement else preset_ufh,
+    )
+
+    work_dir = tempfile.mkdtemp(prefix="ar-video-")
+    src_path = os.path.join(work_dir, "source" + (os.path.splitext(video.filename or "")[1] or ".mp4"))
+    try:
+        size = 0
+        with open(src_path, "wb") as f:
+            while chunk := await video.read(1024 * 1024):
+                size += len(chunk)
+                if size > AR_VIDEO_MAX_MB * 1024 * 1024:
+                    raise HTTPException(status_code=413, detail=f"Video larger than {AR_VIDEO_MAX_MB} MB")
+                f.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty video upload")
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    async def work() -> JobOutput:
+        try:
+            dst_path = os.path.join(work_dir, "tryon.mp4")
+            meta = await render_video(
+                src_path,
+                dst_path,
+                item,
+                width=width,
+                height=height,
+                flip_horizontal=flip_horizontal,
+                detect_every=detect_every,
+            )
+            with open(dst_path, "rb") as f:
+                return [f.read()], "video/mp4", meta
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    try:
+        job = get_job_store().submit("video", work, after)
+    except JobStoreFullError as e:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise _job_busy(e) from e
+    return _job_accepted(job)
+
+
+@router.get("/jobs/stats")
+def ar_job_stats() -> dict[str, Any]:
+    """Jobs held by this API process, by status."""
+    return get_job_store().stats()
+
+
+@router.get("/jobs/{job_id}")
+def get_job_status(job_id: str) -> dict[str, Any]:
+    """Job status, timings and (when done) meta and storage URLs."""
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.public()
+
+
+@router.get("/jobs/{job_id}/result")
+def get_job_result(job_id: str) -> Response:
+    """
+    Finished job output: the image (compose, batch composite) or multipart/mixed (batch variants).
+
+    409 while the job is queued/running; a failed job answers with its error status.
+    """
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}", headers={"Retry-After": "1"})
+    if job.status == "failed":
+        raise HTTPException(status_code=job.error_status, detail=job.error)
+    if len(job.outputs) == 1:
+        headers = _compose_headers(job.meta, "job")
+        headers["X-AR-Job-Id"] = job.id
+        return Response(content=job.outputs[0], media_type=job.media_type, headers=headers)
+    return _variants_response(job.outputs, job.media_type, job.meta)
+
+
+def _stream_session(text: str, previous: Optional[StreamSession]) -> StreamSession:
+    """Build a StreamSession from a StreamConfig JSON message (HTTPException / ValueError if invalid)."""
+    sc = StreamConfig(**json.loads(text))
+    if sc.overlay_base64:
+        payload = sc.overlay_base64.split("base64,")[-1]
+        ref: Any = _decode_overlay_bytes(base64.b64decode(payload))
+        cfg: dict[str, Any] = {}
+    else:
+        presets = load_jewellery_presets()
+        jid = sc.jewellery_id or (next(iter(presets.keys())) if presets else None)
+        if not jid or jid not in presets:
+            raise ValueError("Provide `jewellery_id` (see /ar-tryon/presets) or `overlay_base64`")
+        ref, cfg = PresetOverlay(jid), presets[jid]
+    session = StreamSession(
+        _placement_item(sc, ref, cfg),
+        width=sc.width,
+        height=sc.height,
+        flip_horizontal=sc.flip_horizontal,
+        detect_every=sc.detect_every,
+        jpeg_quality=sc.jpeg_quality,
+    )
+    if previous is not None and (previous.width, previous.height, previous.flip_horizontal) == (
+        session.width,
+        session.height,
+        session.flip_horizontal,
+    ):
+        # Same geometry: keep following the face instead of re-detecting after a piece switch.
+        session.tracker.adopt(previous.tracker)
+    return session
+
+
+@router.websocket("/stream")
+async def ar_tryon_stream(websocket: WebSocket) -> None:
+    """
+    Live mirror try-on over WebSocket.
+
+    1. Client sends a JSON text message (StreamConfig: `jewellery_id` or `overlay_base64`,
+       placement overrides, `width`, `height`, `flip_horizontal`, `detect_every`, `jpeg_quality`).
+       It may be re-sent at any time to switch pieces.
+    2. Client sends binary JPEG frames; each processed frame comes back as a binary JPEG.
+       Frames that arrive while another is being processed replace each other: only the
+       newest is composited, stale ones are dropped.
+    3. Server text messages: {"type": "config"} ack, {"type": "stats"} about once per second,
+       {"type": "error", "detail"}.
+
+    Face detection runs every `detect_every` frames (or when tracking is lost); frames in
+    between use template tracking. Each frame takes a try-on admission slot (interactive lane);
+    a frame refused admission is answered with an error message.
+    """
+    global _active_streams
+    await websocket.accept()
+    if _active_streams >= AR_STREAM_MAX:
+        await websocket.close(code=1013)  # try again later
+        return
+    _active_streams += 1
+    try:
+        await _serve_stream(websocket)
+    finally:
+        _active_streams -= 1
+
+
+async def _serve_stream(websocket: WebSocket) -> None:
+    session: Optional[StreamSession] = None
+    pending: Optional[bytes] = None
+    ready = asyncio.Event()
+
+    async def receive_loop() -> None:
+        nonlocal session, pending
+        while True:
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("text") is not None:
+                try:
+                    session = _stream_session(msg["text"], session)
+                except (ValueError, TypeError, ValidationError, HTTPException) as e:
+                    detail = e.detail if isinstance(e, HTTPException) else str(e)
+                    await websocket.send_json({"type": "error", "detail": detail})
+                    continue
+                await websocket.send_json(
+                    {"type": "config", "width": session.width, "height": session.height}
+                )
+            elif msg.get("bytes"):
+                if pending is not None and session is not None:
+                    session.dropped += 1
+                pending = msg["bytes"]
+                ready.set()
+
+    async def process_loop() -> None:
+        nonlocal pending
+        last_stats = time.monotonic()
+        while True:
+            await ready.wait()
+            ready.clear()
+            if pending is None:
+                continue
+            if session is None:
+                pending = None
+                await websocket.send_json({"type": "error", "detail": "Send a JSON config before frames"})
+                continue
+            out: Optional[bytes] = None
+            error: Optional[str] = None
+            try:
+                # Frames run in this process, not the worker pool (the tracker state belongs to the
+                # connection), but each one holds an interactive try-on admission slot.
+                async with get_admission("tryon").slot():
+                    # Frames that arrived while waiting replaced this one: take the newest
+                    data, pending = pending, None
+                    current = session
+                    if data is not None:
+                        try:
+                            out, info = await asyncio.to_thread(current.process, data)
+                        except Exception as e:
+                            # A bad frame (undecodable, cv2.error, ...) costs that frame, not the stream
+                            error = str(e) or type(e).__name__
+            except AdmissionRejected as e:
+                error = str(e)  # the frame stays pending until a newer one replaces it
+            if error is not None:
+                await websocket.send_json({"type": "error", "detail": error})
+                continue
+            if out is None:
+                continue
+            await websocket.send_bytes(out)
+            now = time.monotonic()
+            if now - last_stats >= 1.0:
+                last_stats = now
+                await websocket.send_json({"type": "stats", **current.stats(), "last": info})
+
+    tasks = [asyncio.create_task(receive_loop()), asyncio.create_task(process_loop())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for t in tasks:
+            t.cancel()
+        for t in tasks:
+            try:
+                await t
+            except (asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+                pass
@@ -8,6 +8,7 @@ import json
 from dotenv import load_dotenv
 
 from models.database import get_db
+from services.admission import admit
 from services.qdrant_service import QdrantService
 from models.product_image import ProductImage
 from models.product import Product
@@ -69,7 +70,7 @@ Follow these steps:
 When suggesting products or shops, explain briefly why you're recommending them.
 """
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=ChatResponse, dependencies=[Depends(admit("chat"))])
 async def chat(
     request: ChatRequest,
     db: Session = Depends(get_db)
@@ -86,7 +87,7 @@ async def chat(
     try:
         # Step 1: Use OpenAI to understand the user's query and extract search parameters
         try:
-            completion = openai.ChatCompletion.create(
+            completion = await openai.ChatCompletion.acreate(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": SYSTEM_PROMPT},
@@ -243,7 +244,7 @@ async def chat(
             """
             
             # Get final response from OpenAI
-            final_completion = openai.ChatCompletion.create(
+            final_completion = await openai.ChatCompletion.acreate(
                 model="gpt-4o",
                 messages=[
                     {"role": "system", "content": "You are a helpful virtual shop assistant for Lunova, a luxury marketplace."},
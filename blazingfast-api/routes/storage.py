@@ -14,6 +14,8 @@ from PIL import Image
 import requests
 from io import BytesIO
 
+from services.admission import admit, get_admission
+
 # Load environment variables
 load_dotenv()
 
@@ -61,7 +63,8 @@ async def upload_file(
         if enhance and file.content_type.startswith('image/'):
             try:
                 print("Starting AI image enhancement...")
-                enhanced_content = await enhance_image_with_ai(file_content, file.content_type)
+                async with get_admission("enhance").slot():
+                    enhanced_content = await enhance_image_with_ai(file_content, file.content_type)
                 if enhanced_content:
                     file_content = enhanced_content
                     print("Image successfully enhanced with AI")
@@ -214,7 +217,7 @@ async def enhance_image_with_ai(image_content: bytes, content_type: str) -> byte
         base64_image = base64.b64encode(image_content).decode('utf-8')
         
         # Call OpenAI API to get enhanced image using the image generation API
-        response = openai.Image.create(
+        response = await openai.Image.acreate(
             model="gpt-image-1",
             prompt="Enhance this product image by removing the background completely. Make it transparent or clean white and improve the overall quality.",
             n=1,  # Generate one image
@@ -239,7 +242,7 @@ async def enhance_image_with_ai(image_content: bytes, content_type: str) -> byte
         # Return original image if enhancement fails
         return image_content
 
-@router.post("/enhance-image")
+@router.post("/enhance-image", dependencies=[Depends(admit("enhance"))])
 async def enhance_image(
     file: UploadFile = File(...),
 ):
@@ -0,0 +1,240 @@
+"""
+Admission control for slow, CPU- or upstream-heavy endpoints.
+
+Each endpoint class (AR try-on, AI image enhancement, chatbot) gets a concurrency limit and a
+bounded wait queue in the API process. A request over the limit waits for a slot; when the
+queue is full, or the wait exceeds the class max wait, it fails fast with 503 + Retry-After
+instead of piling up and slowing down every other route on the same event loop.
+
+Waiters are served by lane: INTERACTIVE (a user waiting on the response) before BATCH (async
+try-on jobs, video segments). A full queue makes room for an interactive request by bouncing
+the newest batch waiter, whose caller retries later (see services/ar_jobs.py).
+
+Configuration (environment), per class NAME in TRYON, ENHANCE, CHAT:
+- ADMISSION_<NAME>_CONCURRENCY: requests running at once (tryon default: AR worker pool
+  size; enhance 4; chat 8)
+- ADMISSION_<NAME>_QUEUE: requests allowed to wait for a slot (default 4x concurrency)
+- ADMISSION_<NAME>_MAX_WAIT: seconds an interactive request may wait before 503 (default 10;
+  batch waiters wait until admitted)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+
+from fastapi import HTTPException
+
+INTERACTIVE = 0
+BATCH = 1
+LANES = {INTERACTIVE: "interactive", BATCH: "batch"}
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a class is at its limit and the request cannot wait (callers answer 503)."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future", "enqueued")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+        self.enqueued = time.perf_counter()
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionClass:
+    """Concurrency limit + priority wait queue for one endpoint class (one event loop)."""
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait = max(0.0, float(max_wait))
+        self.active = 0
+        self._heap: list[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.bounced = 0
+        self.peak_queued = 0
+        self._wait_ms_sum = 0.0
+        self._wait_ms_max = 0.0
+        self._waited = 0
+
+    @property
+    def queued(self) -> int:
+        return sum(1 for w in self._heap if not w.future.done())
+
+    def retry_after(self) -> int:
+        """Rough Retry-After in seconds: one per full round of the queue through the slots."""
+        rounds = (self.queued + self.concurrency) / self.concurrency
+        return max(1, min(30, int(rounds)))
+
+    def _reject(self, message: str) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(f"{self.name}: {message}", self.retry_after())
+
+    def _bounce_batch_waiter(self) -> bool:
+        """Drop the newest queued batch waiter to make room for an interactive request."""
+        batch = [w for w in self._heap if w.priority > INTERACTIVE and not w.future.done()]
+        if not batch:
+            return False
+        victim = max(batch, key=lambda w: w.seq)
+        victim.future.set_exception(
+            AdmissionRejected(f"{self.name}: queue slot taken by an interactive request", self.retry_after())
+        )
+        self.bounced += 1
+        return True
+
+    async def acquire(self, priority: int = INTERACTIVE) -> None:
+        if self.active < self.concurrency and not self.queued:
+            self.active += 1
+            self.admitted += 1
+            return
+        if self.queued >= self.max_queue and not (priority == INTERACTIVE and self._bounce_batch_waiter()):
+            raise self._reject(f"too many requests waiting ({self.queued}/{self.max_queue})")
+        waiter = _Waiter(priority, next(self._seq), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._heap, waiter)
+        self.peak_queued = max(self.peak_queued, self.queued)
+        # Batch waiters have no deadline: they leave the queue only when admitted or bounced.
+        timeout = (self.max_wait or None) if priority == INTERACTIVE else None
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            if not (waiter.future.done() and waiter.future.exception() is None):
+                waiter.future.cancel()
+                self.timed_out += 1
+                raise self._reject(f"no slot within {self.max_wait:g}s") from None
+            # granted just as the wait ran out
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled() and not waiter.future.exception():
+                self.release()  # slot was handed over to a client that went away
+            else:
+                waiter.future.cancel()
+            raise
+        self._record_wait(waiter)
+
+    def _record_wait(self, waiter: _Waiter) -> None:
+        ms = (time.perf_counter() - waiter.enqueued) * 1000
+        self._waited += 1
+        self._wait_ms_sum += ms
+        self._wait_ms_max = max(self._wait_ms_max, ms)
+
+    def release(self) -> None:
+        """Free a slot, handing it straight to the best waiting request if there is one."""
+        while self._heap:
+            waiter = heapq.heappop(self._heap)
+            if not waiter.future.done():
+                waiter.future.set_result(None)
+                self.admitted += 1
+                return
+        self.active = max(0, self.active - 1)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE) -> AsyncIterator[None]:
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict[str, Any]:
+        by_lane = {label: 0 for label in LANES.values()}
+        for w in self._heap:
+            if not w.future.done():
+                by_lane[LANES[w.priority]] += 1
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": sum(by_lane.values()),
+            "queued_by_lane": by_lane,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait,
+            "peak_queued": self.peak_queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "bounced_batch": self.bounced,
+            "avg_wait_ms": round(self._wait_ms_sum / self._waited, 2) if self._waited else 0.0,
+            "max_wait_ms": round(self._wait_ms_max, 2),
+        }
+
+
+def _from_env(name: str, default_concurrency: int) -> AdmissionClass:
+    key = name.upper()
+    concurrency = int(os.getenv(f"ADMISSION_{key}_CONCURRENCY", str(default_concurrency)))
+    return AdmissionClass(
+        name,
+        concurrency,
+        int(os.getenv(f"ADMISSION_{key}_QUEUE", str(max(1, concurrency) * 4))),
+        float(os.getenv(f"ADMISSION_{key}_MAX_WAIT", "10")),
+    )
+
+
+def _default_tryon_concurrency() -> int:
+    from services.ar_pool import AR_POOL_WORKERS
+
+    return max(1, AR_POOL_WORKERS)
+
+
+_classes: dict[str, AdmissionClass] = {}
+_classes_lock = threading.Lock()
+_DEFAULTS: dict[str, Callable[[], int]] = {
+    "tryon": _default_tryon_concurrency,
+    "enhance": lambda: 4,
+    "chat": lambda: 8,
+}
+
+
+def get_admission(name: str) -> AdmissionClass:
+    """Per-process admission class by name ("tryon", "enhance", "chat")."""
+    with _classes_lock:
+        cls = _classes.get(name)
+        if cls is None:
+            cls = _classes[name] = _from_env(name, _DEFAULTS[name]())
+        return cls
+
+
+def admission_stats() -> dict[str, Any]:
+    return {name: get_admission(name).stats() for name in _DEFAULTS}
+
+
+def admission_busy(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+
+def admit(name: str, priority: int = INTERACTIVE) -> Callable[[], AsyncIterator[None]]:
+    """
+    FastAPI dependency holding a slot of class `name` for the whole request:
+
+        @router.post("/chat", dependencies=[Depends(admit("chat"))])
+    """
+
+    async def dependency() -> AsyncIterator[None]:
+        cls = get_admission(name)
+        try:
+            await cls.acquire(priority)
+        except AdmissionRejected as e:
+            raise admission_busy(e) from e
+        try:
+            yield
+        finally:
+            cls.release()
+
+    return dependency
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+import hashlib
+import io
 import json
+import os
+import time
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Optional, Tuple
+from typing import Any, Optional, Protocol, Sequence, Tuple, Union
 
 import cv2
 import numpy as np
+from PIL import Image
+
+from services.ar_timing import stage, with_timings
+from services.face_detection import DetectionConfig, DetectPass, detect_face_adaptive
+from services.frame_cache import PreparedFrame, get_frame_cache
+from services.frame_cache import image_digest as content_digest
 
 # Paths relative to blazingfast-api package root (parent of services/)
 _BASE = Path(__file__).resolve().parent.parent
@@ -16,7 +27,56 @@ JEWELLERY_JSON = _BASE / "assets" / "jewellery" / "jewellery.json"
 DEFAULT_WIDTH = 720
 DEFAULT_HEIGHT = 640
 
+# "adaptive" (pyramid + early exit, services/face_detection.py) or "exhaustive" (all passes)
+AR_DETECT_STRATEGY = os.getenv("AR_DETECT_STRATEGY", "adaptive")
+
+# Let libjpeg decode large uploads at 1/2, 1/4 or 1/8 scale (DCT scaling) when the result is
+# still at least as large as the output frame; "false" always decodes at full resolution.
+AR_DECODE_REDUCED = os.getenv("AR_DECODE_REDUCED", "true").lower() not in ("0", "false", "no")
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+# Bytes of a non-bytes upload buffer handed to PIL to read the JPEG header (APP segments
+# such as EXIF/ICC come first; a header beyond this just means full-resolution decode).
+_HEADER_PROBE_BYTES = 512 * 1024
+
+# Output encoders. Default qualities apply when a request does not set `quality`;
+# AR_PNG_COMPRESSION unset keeps OpenCV's default zlib level.
+OUTPUT_MEDIA_TYPES = {"png": "image/png", "jpg": "image/jpeg", "webp": "image/webp"}
+_OUTPUT_EXT = {"png": ".png", "jpg": ".jpg", "webp": ".webp"}
+AR_JPEG_QUALITY = int(os.getenv("AR_JPEG_QUALITY", "95"))
+AR_WEBP_QUALITY = int(os.getenv("AR_WEBP_QUALITY", "80"))
+AR_PNG_COMPRESSION = os.getenv("AR_PNG_COMPRESSION", "")
+
 _cascade: Optional[cv2.CascadeClassifier] = None
+_presets_cache: Optional[Tuple[int, dict[str, Any]]] = None
+
+
+class ScalableOverlay(Protocol):
+    """Overlay source that can hand out ready-made resized BGRA arrays (see overlay_cache)."""
+
+    def resized(self, fw: int, fh: int) -> np.ndarray: ...
+
+    def premultiplied(self, fw: int, fh: int) -> np.ndarray: ...
+
+
+Overlay = Union[np.ndarray, ScalableOverlay]
+
+
+@dataclass
+class OverlayItem:
+    """One jewellery piece with its placement (see apply_ar_jewelry_to_frame for the meaning)."""
+
+    overlay: Any  # Overlay, or a preset id string resolved by the AR worker pool
+    mx: int = 0
+    my: int = 0
+    dw: float = 1.0
+    dh: float = 1.0
+    drop_factor: float = 0.0
+    use_face_height: bool = False
 
 
 def get_cascade() -> cv2.CascadeClassifier:
@@ -29,11 +89,20 @@ def get_cascade() -> cv2.CascadeClassifier:
 
 
 def load_jewellery_presets() -> dict[str, Any]:
-    """Load jewellery.json (paths are relative to _BASE)."""
-    if not JEWELLERY_JSON.is_file():
+    """
+    Load jewellery.json (paths are relative to _BASE).
+
+    Parsed once and reused until the file's mtime changes; treat the result as read-only.
+    """
+    global _presets_cache
+    try:
+        mtime = JEWELLERY_JSON.stat().st_mtime_ns
+    except FileNotFoundError:
         return {}
-    with open(JEWELLERY_JSON, encoding="utf-8") as f:
-        return json.load(f)
+    if _presets_cache is None or _presets_cache[0] != mtime:
+        with open(JEWELLERY_JSON, encoding="utf-8") as f:
+            _presets_cache = (mtime, json.load(f))
+    return _presets_cache[1]
 
 
 def resolve_jewellery_path(relative_path: str) -> Path:
@@ -54,6 +123,18 @@ def load_overlay_bgra(path: Path) -> np.ndarray:
     return img
 
 
+def resize_overlay(overlay: Overlay, fw: int, fh: int, premultiplied: bool = False) -> np.ndarray:
+    """
+    Resize a BGRA overlay to (fw, fh); cached overlays may return a quantised size.
+
+    premultiplied=True returns the premultiply_overlay form that blend_overlay consumes.
+    """
+    if isinstance(overlay, np.ndarray):
+        resized = cv2.resize(overlay, (fw, fh))
+        return premultiply_overlay(resized) if premultiplied else resized
+    return overlay.premultiplied(fw, fh) if premultiplied else overlay.resized(fw, fh)
+
+
 def _detect_face_haar(
     gray: np.ndarray,
     cascade: cv2.CascadeClassifier,
@@ -109,6 +190,57 @@ def _detect_face_haar(
     return max(((int(x), int(y), int(w), int(h)) for (x, y, w, h) in faces), key=lambda r: r[2] * r[3])
 
 
+def detect_face(
+    gray: np.ndarray,
+    cascade: cv2.CascadeClassifier,
+    *,
+    scale_factor: Optional[float] = None,
+    min_neighbors: Optional[int] = None,
+    config: Optional[DetectionConfig] = None,
+    multi_face: bool = False,
+) -> Tuple[Optional[Tuple[int, int, int, int]], dict[str, Any]]:
+    """
+    Find the face to decorate; returns (x, y, w, h) or None, plus a detection report for meta.
+
+    Explicit scale_factor + min_neighbors run exactly one full-resolution pass. Otherwise the
+    AR_DETECT_STRATEGY picks adaptive early-exit detection or the legacy exhaustive search.
+    multi_face: several faces will be decorated, so adaptive detection runs every pass.
+    """
+    if scale_factor is not None and min_neighbors is not None:
+        sf, mn = float(scale_factor), int(min_neighbors)
+        single = DetectPass(f"custom-{sf}x{mn}", sf, mn, 30, level="full")
+        single_cfg = DetectionConfig(level_width=0, refine=False, passes=(single,))
+        return detect_face_adaptive(gray, cascade, single_cfg, multi_face=multi_face)
+    if AR_DETECT_STRATEGY == "exhaustive":
+        t0 = time.perf_counter()
+        face = _detect_face_haar(gray, cascade)
+        return face, {"strategy": "exhaustive", "detect_ms": round((time.perf_counter() - t0) * 1000, 2)}
+    return detect_face_adaptive(gray, cascade, config, multi_face=multi_face)
+
+
+def _clip_overlay(
+    frame_shape: Tuple[int, ...],
+    overlay_shape: Tuple[int, ...],
+    top_left_x: int,
+    top_left_y: int,
+) -> Optional[Tuple[slice, slice, slice, slice]]:
+    """Frame and overlay slices (rows, cols) of the part of the overlay that lands on the frame."""
+    h_f, w_f = frame_shape[:2]
+    ih, iw = overlay_shape[:2]
+    y0, x0 = top_left_y, top_left_x
+    fy0, fx0 = max(0, y0), max(0, x0)
+    fy1, fx1 = min(h_f, y0 + ih), min(w_f, x0 + iw)
+    if fy0 >= fy1 or fx0 >= fx1:
+        return None
+    oy0, ox0 = fy0 - y0, fx0 - x0
+    return (
+        slice(fy0, fy1),
+        slice(fx0, fx1),
+        slice(oy0, oy0 + (fy1 - fy0)),
+        slice(ox0, ox0 + (fx1 - fx0)),
+    )
+
+
 def overlay_bgra_on_frame(
     frame_bgra: np.ndarray,
     overlay_bgra: np.ndarray,
@@ -117,27 +249,332 @@ def overlay_bgra_on_frame(
 ) -> None:
     """
     Copy non-transparent pixels from overlay onto frame (same logic as ARJewelBox loop,
-    implemented with numpy for clarity and bounds clipping).
+    implemented with numpy for clarity and bounds clipping). Hard alpha cut on a BGRA frame;
+    compose uses blend_overlay instead.
     """
-    h_f, w_f = frame_bgra.shape[:2]
-    ih, iw = overlay_bgra.shape[:2]
-    y0, x0 = top_left_y, top_left_x
-    y1, x1 = y0 + ih, x0 + iw
-    # Intersection with frame
-    fy0, fx0 = max(0, y0), max(0, x0)
-    fy1, fx1 = min(h_f, y1), min(w_f, x1)
-    if fy0 >= fy1 or fx0 >= fx1:
+    clip = _clip_overlay(frame_bgra.shape, overlay_bgra.shape, top_left_x, top_left_y)
+    if clip is None:
         return
-    oy0, ox0 = fy0 - y0, fx0 - x0
-    sub_o = overlay_bgra[oy0 : oy0 + (fy1 - fy0), ox0 : ox0 + (fx1 - fx0)]
-    sub_f = frame_bgra[fy0:fy1, fx0:fx1]
+    fy, fx, oy, ox = clip
+    sub_o = overlay_bgra[oy, ox]
+    sub_f = frame_bgra[fy, fx]
     mask = sub_o[:, :, 3] > 0
     sub_f[mask] = sub_o[mask]
 
 
+def premultiply_overlay(overlay_bgra: np.ndarray) -> np.ndarray:
+    """
+    BGRA overlay -> premultiplied form for blend_overlay: array of shape (2, h, w, 3) with
+    [0] = BGR * alpha / 255 and [1] = 255 - alpha (replicated per channel).
+    """
+    b, g, r, a = cv2.split(overlay_bgra)
+    a3 = cv2.merge((a, a, a))
+    out = np.empty((2,) + a3.shape, dtype=np.uint8)
+    cv2.multiply(cv2.merge((b, g, r)), a3, dst=out[0], scale=1.0 / 255)
+    cv2.bitwise_not(a3, dst=out[1])
+    return out
+
+
+def blend_overlay(
+    frame_bgr: np.ndarray,
+    overlay: np.ndarray,
+    top_left_x: int,
+    top_left_y: int,
+) -> Optional[Tuple[slice, slice]]:
+    """
+    Alpha-composite an overlay onto a BGR frame in place: out = fg*a + bg*(1-a).
+
+    overlay is BGRA or already premultiplied (premultiply_overlay). Only the clipped overlay
+    ROI of the frame is read and written (saturating cv2 arithmetic, no full-frame temporaries).
+    Returns the (rows, cols) slices written, or None when the overlay is off-frame.
+    """
+    premultiplied = overlay.ndim == 4
+    clip = _clip_overlay(frame_bgr.shape, overlay.shape[1:] if premultiplied else overlay.shape, top_left_x, top_left_y)
+    if clip is None:
+        return None
+    fy, fx, oy, ox = clip
+    pm = overlay[:, oy, ox] if premultiplied else premultiply_overlay(overlay[oy, ox])
+    roi = frame_bgr[fy, fx]
+    cv2.add(pm[0], cv2.multiply(roi, pm[1], scale=1.0 / 255), dst=roi)
+    return fy, fx
+
+
+_detector_fingerprint: Optional[str] = None
+
+
+def detector_fingerprint() -> str:
+    """Every setting besides the request that changes the prepared frame or the detected face."""
+    global _detector_fingerprint
+    if _detector_fingerprint is None:
+        _detector_fingerprint = f"{AR_DETECT_STRATEGY}|{DetectionConfig.from_env()!r}|reduced={AR_DECODE_REDUCED}"
+    return _detector_fingerprint
+
+
+def _prepare_cache_key(
+    digest: str,
+    width: int,
+    height: int,
+    flip_horizontal: bool,
+    detect_scale_factor: Optional[float],
+    detect_min_neighbors: Optional[int],
+    multi_face: bool = False,
+) -> str:
+    """Frame-cache key: image digest + every input that changes the resized frame or the face."""
+    raw = f"{digest}|{width}x{height}|{int(flip_horizontal)}|{detect_scale_factor}|{detect_min_neighbors}|{detector_fingerprint()}"
+    if multi_face:
+        raw += "|multi"
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _face_meta(face: Optional[Tuple[int, int, int, int]], detection: dict[str, Any]) -> dict[str, Any]:
+    """face_count / used_face_index / faces for meta; reports without a face list count one face."""
+    if face is None:
+        return {"face_count": 0, "used_face_index": None, "faces": []}
+    faces = detection.get("faces") or [list(face)]
+    primary = detection.get("primary_index") or 0
+    return {"face_count": len(faces), "used_face_index": primary, "faces": faces}
+
+
+def _cached_prepare(key: str) -> Optional[Tuple[np.ndarray, Optional[Tuple[int, int, int, int]], dict[str, Any]]]:
+    hit = get_frame_cache().get(key)
+    if hit is None:
+        return None
+    meta = _face_meta(hit.face, hit.detection)
+    meta["detection"] = {**hit.detection, "cache": "hit"}
+    return hit.frame_bgr, hit.face, meta
+
+
+def _prepare_frame_uncached(
+    frame_bgr: np.ndarray,
+    width: int,
+    height: int,
+    flip_horizontal: bool,
+    detect_scale_factor: Optional[float],
+    detect_min_neighbors: Optional[int],
+    multi_face: bool = False,
+) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]], dict[str, Any]]:
+    with stage("resize"):
+        if flip_horizontal:
+            frame_bgr = cv2.flip(frame_bgr, 1)
+        frame_bgr = cv2.resize(frame_bgr, (width, height))
+        gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
+    cascade = get_cascade()
+    with stage("detect"):
+        face, detection = detect_face(
+            gray,
+            cascade,
+            scale_factor=detect_scale_factor,
+            min_neighbors=detect_min_neighbors,
+            multi_face=multi_face,
+        )
+    meta = _face_meta(face, detection)
+    meta["detection"] = detection
+    return frame_bgr, face, meta
+
+
+def prepare_frame(
+    frame_bgr: np.ndarray,
+    *,
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    flip_horizontal: bool = False,
+    detect_scale_factor: Optional[float] = None,
+    detect_min_neighbors: Optional[int] = None,
+    image_digest: Optional[str] = None,
+    multi_face: bool = False,
+) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]], dict[str, Any]]:
+    """
+    Flip / resize the frame and detect the face once; returns (frame_bgr, face, meta).
+
+    With image_digest (frame_cache.image_digest of the source bytes) the result is looked
+    up in / stored to the frame cache; cached frames are read-only. multi_face: see detect_face.
+    """
+    args = (width, height, flip_horizontal, detect_scale_factor, detect_min_neighbors, multi_face)
+    key = _prepare_cache_key(image_digest, *args) if image_digest else None
+    if key is not None:
+        with stage("frame_cache"):
+            cached = _cached_prepare(key)
+        if cached is not None:
+            return cached
+    frame_bgr, face, meta = _prepare_frame_uncached(frame_bgr, *args)
+    if key is not None:
+        get_frame_cache().put(key, PreparedFrame(frame_bgr, face, meta["detection"]))
+    return frame_bgr, face, meta
+
+
+def prepare_frame_from_bytes(
+    image_bytes: bytes,
+    *,
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    flip_horizontal: bool = False,
+    detect_scale_factor: Optional[float] = None,
+    detect_min_neighbors: Optional[int] = None,
+    multi_face: bool = False,
+) -> Tuple[np.ndarray, Optional[Tuple[int, int, int, int]], dict[str, Any]]:
+    """prepare_frame for encoded bytes: a frame-cache hit also skips decoding."""
+    args = (width, height, flip_horizontal, detect_scale_factor, detect_min_neighbors, multi_face)
+    with stage("hash"):
+        key = _prepare_cache_key(content_digest(image_bytes), *args)
+    with stage("frame_cache"):
+        cached = _cached_prepare(key)
+    if cached is not None:
+        return cached
+    frame_bgr, face, meta = _prepare_frame_uncached(decode_image_bytes(image_bytes, (width, height)), *args)
+    get_frame_cache().put(key, PreparedFrame(frame_bgr, face, meta["detection"]))
+    return frame_bgr, face, meta
+
+
+def place_overlay(
+    frame_bgr: np.ndarray,
+    face: Tuple[int, int, int, int],
+    overlay_bgra: Overlay,
+    mx: int,
+    my: int,
+    dw: float,
+    dh: float,
+    drop_factor: float = 0.0,
+    use_face_height: bool = False,
+) -> Optional[Tuple[slice, slice]]:
+    """
+    Resize overlay relative to the face box and alpha-blend it onto a BGR frame in place.
+
+    Returns the (rows, cols) slices of the frame that changed (None if nothing was drawn).
+    """
+    x, y, w, h = face
+    # ref: face width (rings) or face height (necklaces) × dw/dh
+    ref = float(h) if use_face_height else float(w)
+    fw, fh = int(ref * dw), int(ref * dh)
+    if fw < 1 or fh < 1:
+        return None
+
+    with stage("overlay"):
+        new_impose = resize_overlay(overlay_bgra, fw, fh, premultiplied=True)
+    # ARJewelBox + optional neck drop: top-left at (x + mx, y + h + my + drop*h)
+    top_x = x + mx
+    top_y = int(y + h + my + drop_factor * h)
+    with stage("blend"):
+        return blend_overlay(frame_bgr, new_impose, top_x, top_y)
+
+
+def reduced_decode_factor(image_bytes: bytes, width: int, height: int) -> int:
+    """
+    Largest JPEG DCT downscale (8, 4, 2 or 1) that still yields at least width x height pixels.
+
+    Only the header is read. The short side must cover the longer target side so the choice
+    also holds when EXIF orientation swaps the axes. PNG/WebP etc. always return 1 (OpenCV's
+    reduced modes decode those in full and resize afterwards, which saves nothing).
+    """
+    if not isinstance(image_bytes, bytes):
+        # Shared-memory view (services/ar_shm.py): hand PIL a copy of the head only.
+        image_bytes = bytes(memoryview(image_bytes)[:_HEADER_PROBE_BYTES])
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as im:
+            if im.format != "JPEG":
+                return 1
+            src_w, src_h = im.size
+    except Exception:
+        return 1  # let cv2.imdecode decide whether this is an image at all
+    need = max(width, height)
+    for factor, _ in _REDUCED_DECODE_FLAGS:
+        if min(src_w, src_h) // factor >= need:
+            return factor
+    return 1
+
+
+def decode_image_bytes(
+    image_bytes: bytes,
+    target: Optional[Tuple[int, int]] = None,
+    *,
+    reduced: Optional[bool] = None,
+) -> np.ndarray:
+    """
+    Decode JPEG/PNG bytes to BGR; ValueError if not an image.
+
+    target=(width, height) is the size the caller resizes to next: large JPEGs are then decoded
+    at a reduced scale (see reduced_decode_factor) unless reduced=False / AR_DECODE_REDUCED=false.
+    """
+    with stage("decode"):
+        flag = cv2.IMREAD_COLOR
+        if target is not None and (AR_DECODE_REDUCED if reduced is None else reduced):
+            factor = reduced_decode_factor(image_bytes, *target)
+            flag = dict(_REDUCED_DECODE_FLAGS).get(factor, cv2.IMREAD_COLOR)
+        frame = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), flag)
+    if frame is None:
+        raise ValueError("Could not decode input image")
+    return frame
+
+
+def normalize_output_format(output_format: str) -> str:
+    """"png", "webp" or "jpg" (anything else, e.g. "jpeg", is JPEG as before)."""
+    fmt = (output_format or "").lower()
+    return fmt if fmt in ("png", "webp") else "jpg"
+
+
+def output_media_type(output_format: str) -> str:
+    return OUTPUT_MEDIA_TYPES[normalize_output_format(output_format)]
+
+
+def encode_params(output_format: str, quality: Optional[int] = None, png_compression: Optional[int] = None) -> list[int]:
+    """cv2.imencode flags: quality 1-100 for JPEG/WebP, zlib level 0-9 for PNG (None: defaults)."""
+    fmt = normalize_output_format(output_format)
+    if fmt == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, int(quality or AR_JPEG_QUALITY)]
+    if fmt == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, int(quality or AR_WEBP_QUALITY)]
+    if png_compression is None and AR_PNG_COMPRESSION != "":
+        png_compression = int(AR_PNG_COMPRESSION)
+    return [] if png_compression is None else [cv2.IMWRITE_PNG_COMPRESSION, int(png_compression)]
+
+
+def encode_image(
+    frame: np.ndarray,
+    output_format: str = "png",
+    quality: Optional[int] = None,
+    png_compression: Optional[int] = None,
+) -> bytes:
+    """Encode a frame to PNG ("png"), WebP ("webp") or JPEG (anything else)."""
+    fmt = normalize_output_format(output_format)
+    params = encode_params(fmt, quality, png_compression)
+    with stage("encode"):
+        ok, buf = cv2.imencode(_OUTPUT_EXT[fmt], frame, params)
+    if not ok:
+        raise RuntimeError("Failed to encode output image")
+    return buf.tobytes()
+
+
+FaceSelection = Union[None, str, Sequence[int]]
+
+
+def select_faces(
+    face: Tuple[int, int, int, int], meta: dict[str, Any], faces: FaceSelection = None
+) -> list[Tuple[int, int, int, int]]:
+    """
+    Face rects to decorate: None / "primary" → the detected face, "all" → every face in
+    meta["faces"] (left to right), or explicit indices into meta["faces"].
+    Records used_face_index(es) in meta; raises ValueError for an index out of range.
+    """
+    if faces is None or faces == "primary":
+        meta["used_face_indices"] = [meta["used_face_index"]]
+        return [face]
+    rects = [tuple(int(v) for v in r) for r in meta["faces"]]
+    if faces == "all":
+        indices = list(range(len(rects)))
+    elif isinstance(faces, str):
+        raise ValueError(f"faces must be 'primary', 'all' or a list of indices, got {faces!r}")
+    else:
+        indices = list(dict.fromkeys(int(i) for i in faces))
+        bad = [i for i in indices if not 0 <= i < len(rects)]
+        if bad or not indices:
+            raise ValueError(f"Face index {bad or indices} out of range: {len(rects)} face(s) detected")
+    meta["used_face_indices"] = indices
+    return [rects[i] for i in indices]
+
+
+@with_timings
 def apply_ar_jewelry_to_frame(
     frame_bgr: np.ndarray,
-    overlay_bgra: np.ndarray,
+    overlay_bgra: Overlay,
     mx: int,
     my: int,
     dw: float,
@@ -149,6 +586,7 @@ def apply_ar_jewelry_to_frame(
     detect_min_neighbors: Optional[int] = None,
     drop_factor: float = 0.0,
     use_face_height: bool = False,
+    image_digest: Optional[str] = None,
 ) -> Tuple[np.ndarray, dict[str, Any]]:
     """
     Detect face (Haar cascade XML), resize frame, overlay jewellery (ARJewelBox-style).
@@ -157,49 +595,36 @@ def apply_ar_jewelry_to_frame(
 
     drop_factor: push overlay down by drop_factor * face_height (necklaces).
     use_face_height: if True, scale overlay using face height instead of width.
+    overlay_bgra: BGRA array, or a ScalableOverlay (e.g. cached PresetOverlay) that serves
+    pre-resized arrays.
+    image_digest: content hash of the source image; repeat photos reuse the cached resized
+    frame and face rect instead of running detection again.
 
-    Returns (output_bgra_or_bgr, meta) where meta has face_count, used_face_index.
+    Returns (output_bgr, meta) where meta has face_count, used_face_index and
+    detection (winning pass + per-pass timings, see services/face_detection.py).
     """
-    meta: dict[str, Any] = {"face_count": 0, "used_face_index": None}
-
-    if flip_horizontal:
-        frame_bgr = cv2.flip(frame_bgr, 1)
-
-    frame_bgr = cv2.resize(frame_bgr, (width, height))
-    gray = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2GRAY)
-    cascade = get_cascade()
-    face = _detect_face_haar(
-        gray,
-        cascade,
-        scale_factor=detect_scale_factor,
-        min_neighbors=detect_min_neighbors,
+    frame_bgr, face, meta = prepare_frame(
+        frame_bgr,
+        width=width,
+        height=height,
+        flip_horizontal=flip_horizontal,
+        detect_scale_factor=detect_scale_factor,
+        detect_min_neighbors=detect_min_neighbors,
+        image_digest=image_digest,
     )
-
     if face is None:
         return frame_bgr, meta
 
-    x, y, w, h = face
-    meta["face_count"] = 1
-    meta["used_face_index"] = 0
-
-    frame_bgra = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2BGRA)
-    # ref: face width (rings) or face height (necklaces) × dw/dh
-    ref = float(h) if use_face_height else float(w)
-    fw, fh = int(ref * dw), int(ref * dh)
-    if fw < 1 or fh < 1:
-        return frame_bgra, meta
-
-    new_impose = cv2.resize(overlay_bgra, (fw, fh))
-    # ARJewelBox + optional neck drop: top-left at (x + mx, y + h + my + drop*h)
-    top_x = x + mx
-    top_y = int(y + h + my + drop_factor * h)
-    overlay_bgra_on_frame(frame_bgra, new_impose, top_x, top_y)
-    return frame_bgra, meta
+    with stage("copy"):
+        out = frame_bgr.copy()  # prepared frames are shared read-only cache entries
+    place_overlay(out, face, overlay_bgra, mx, my, dw, dh, drop_factor, use_face_height)
+    return out, meta
 
 
+@with_timings
 def compose_from_bytes(
     image_bytes: bytes,
-    overlay_bgra: np.ndarray,
+    overlay_bgra: Overlay,
     mx: int,
     my: int,
     dw: float,
@@ -208,43 +633,91 @@ def compose_from_bytes(
     width: int = DEFAULT_WIDTH,
     height: int = DEFAULT_HEIGHT,
     output_format: str = "png",
+    quality: Optional[int] = None,
+    png_compression: Optional[int] = None,
     flip_horizontal: bool = False,
     detect_scale_factor: Optional[float] = None,
     detect_min_neighbors: Optional[int] = None,
     drop_factor: float = 0.0,
     use_face_height: bool = False,
+    faces: FaceSelection = None,
 ) -> Tuple[bytes, dict[str, Any]]:
     """
-    Decode image bytes, run AR overlay, encode to PNG or JPEG bytes.
+    Decode image bytes, run AR overlay, encode to PNG, JPEG or WebP bytes (see encode_image).
 
-    Raises ValueError if no face detected (face_count == 0).
+    The decoded + resized frame and face rect come from the frame cache on repeat photos.
+    faces: which faces get the overlay (see select_faces). Anything but the primary face runs
+    every detection pass (detect_face multi_face), so weaker faces in group photos are found;
+    the face list is computed once per photo and cached.
+    Raises ValueError if no face detected (face_count == 0) or a face index is out of range.
     """
-    arr = np.frombuffer(image_bytes, dtype=np.uint8)
-    frame = cv2.imdecode(arr, cv2.IMREAD_COLOR)
-    if frame is None:
-        raise ValueError("Could not decode input image")
-
-    out, meta = apply_ar_jewelry_to_frame(
-        frame,
-        overlay_bgra,
-        mx,
-        my,
-        dw,
-        dh,
+    frame_bgr, face, meta = prepare_frame_from_bytes(
+        image_bytes,
         width=width,
         height=height,
         flip_horizontal=flip_horizontal,
         detect_scale_factor=detect_scale_factor,
         detect_min_neighbors=detect_min_neighbors,
-        drop_factor=drop_factor,
-        use_face_height=use_face_height,
+        multi_face=faces not in (None, "primary"),
     )
-
-    if meta["face_count"] == 0:
+    if face is None:
         raise ValueError("No face detected in the image")
+    targets = select_faces(face, meta, faces)
 
-    ext = ".png" if output_format.lower() == "png" else ".jpg"
-    ok, buf = cv2.imencode(ext, out)
-    if not ok:
-        raise RuntimeError("Failed to encode output image")
-    return buf.tobytes(), meta
+    with stage("copy"):
+        out = frame_bgr.copy()
+    for rect in targets:
+        place_overlay(out, rect, overlay_bgra, mx, my, dw, dh, drop_factor, use_face_height)
+    return encode_image(out, output_format, quality, png_compression), meta
+
+
+@with_timings
+def compose_many_from_bytes(
+    image_bytes: bytes,
+    items: Sequence[OverlayItem],
+    *,
+    width: int = DEFAULT_WIDTH,
+    height: int = DEFAULT_HEIGHT,
+    output_format: str = "png",
+    quality: Optional[int] = None,
+    png_compression: Optional[int] = None,
+    flip_horizontal: bool = False,
+    detect_scale_factor: Optional[float] = None,
+    detect_min_neighbors: Optional[int] = None,
+    variants: bool = False,
+) -> Tuple[list[bytes], dict[str, Any]]:
+    """
+    Decode once, detect the face once, then apply several overlays.
+
+    variants=False: every item is drawn onto one frame (necklace + earrings) → one image.
+    variants=True: each item is drawn onto its own copy of the frame → one image per item.
+
+    Raises ValueError if no face detected.
+    """
+    frame_bgr, face, meta = prepare_frame_from_bytes(
+        image_bytes,
+        width=width,
+        height=height,
+        flip_horizontal=flip_horizontal,
+        detect_scale_factor=detect_scale_factor,
+        detect_min_neighbors=detect_min_neighbors,
+    )
+    if face is None:
+        raise ValueError("No face detected in the image")
+    meta["item_count"] = len(items)
+
+    with stage("copy"):
+        out = frame_bgr.copy()
+    if not variants:
+        for it in items:
+            place_overlay(out, face, it.overlay, it.mx, it.my, it.dw, it.dh, it.drop_factor, it.use_face_height)
+        return [encode_image(out, output_format, quality, png_compression)], meta
+
+    # One working frame: after encoding a variant, restore only the ROI it touched.
+    outputs = []
+    for it in items:
+        roi = place_overlay(out, face, it.overlay, it.mx, it.my, it.dw, it.dh, it.drop_factor, it.use_face_height)
+        outputs.append(encode_image(out, output_format, quality, png_compression))
+        if roi is not None:
+            out[roi] = frame_bgr[roi]
+    return outputs, meta
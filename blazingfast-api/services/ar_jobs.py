@@ -0,0 +1,296 @@
+"""
+In-process job store for asynchronous try-on (routes/ar_tryon.py: /ar-tryon/jobs).
+
+A submitted job returns its id immediately; the compute runs on the AR worker pool
+(services/ar_pool.py) as an asyncio task in the API process. Results stay in memory until
+AR_JOB_TTL_SECONDS after the job finished, then are dropped on the next store access.
+
+Configuration (environment):
+- AR_JOB_TTL_SECONDS: how long finished jobs (and their images) are kept (default 900)
+- AR_JOB_MAX: max jobs held per process, finished or not (default 256; beyond → 503)
+- AR_JOB_CONCURRENCY: jobs running on the pool at once (default: pool workers), so bursts
+  of jobs wait here instead of filling the pool queue that interactive /compose shares
+- AR_JOB_RETRY_SECONDS: how long a job keeps retrying while the pool / admission is full
+  before it fails with 503 (default 120)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional, Tuple
+
+import httpx
+
+from services.admission import AdmissionRejected
+from services.ar_pool import PoolSaturatedError, get_ar_pool
+
+AR_JOB_TTL_SECONDS = float(os.getenv("AR_JOB_TTL_SECONDS", "900"))
+AR_JOB_MAX = int(os.getenv("AR_JOB_MAX", "256"))
+AR_JOB_CONCURRENCY = int(os.getenv("AR_JOB_CONCURRENCY", "0"))
+AR_JOB_RETRY_SECONDS = float(os.getenv("AR_JOB_RETRY_SECONDS", "120"))
+
+# Supabase storage (same bucket as routes/storage.py)
+SUPABASE_URL = os.getenv("VITE_SUPABASE_URL")
+SUPABASE_KEY = os.getenv("VITE_SUPABASE_ANON_KEY")
+STORAGE_BUCKET = "images"
+
+# (encoded images, media type, meta)
+JobOutput = Tuple[list[bytes], str, dict[str, Any]]
+
+_POOL_RETRY_SECONDS = 0.25
+
+
+class JobStoreFullError(RuntimeError):
+    """Raised when AR_JOB_MAX unfinished jobs are held (callers answer 503 + Retry-After)."""
+
+
+@dataclass
+class TryonJob:
+    id: str
+    kind: str  # "compose", "batch" or "video"
+    status: str = "queued"  # queued → running → done | failed
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    outputs: list[bytes] = field(default_factory=list)
+    media_type: str = ""
+    meta: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    error_status: int = 500
+    storage: list[dict[str, Any]] = field(default_factory=list)
+    storage_error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def public(self) -> dict[str, Any]:
+        """Status document for GET /ar-tryon/jobs/{id} (no image bytes)."""
+        out: dict[str, Any] = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.started_at is not None:
+            out["queue_ms"] = round((self.started_at - self.created_at) * 1000, 1)
+        if self.finished_at is not None and self.started_at is not None:
+            out["run_ms"] = round((self.finished_at - self.started_at) * 1000, 1)
+        if self.status == "done":
+            out["media_type"] = self.media_type
+            out["output_count"] = len(self.outputs)
+            out["meta"] = self.meta
+            if self.storage:
+                out["storage"] = self.storage
+            if self.storage_error:
+                out["storage_error"] = self.storage_error
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class JobStore:
+    def __init__(
+        self,
+        ttl_seconds: float = AR_JOB_TTL_SECONDS,
+        max_jobs: int = AR_JOB_MAX,
+        concurrency: int = AR_JOB_CONCURRENCY,
+        retry_seconds: float = AR_JOB_RETRY_SECONDS,
+    ):
+        self.ttl_seconds = max(1.0, float(ttl_seconds))
+        self.retry_seconds = max(0.0, float(retry_seconds))
+        self.max_jobs = max(1, int(max_jobs))
+        self.concurrency = int(concurrency) or max(1, get_ar_pool().workers)
+        self._jobs: dict[str, TryonJob] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def _cleanup_locked(self) -> None:
+        now = time.time()
+        stale = [
+            jid for jid, j in self._jobs.items() if j.finished and now - (j.finished_at or now) > self.ttl_seconds
+        ]
+        for jid in stale:
+            del self._jobs[jid]
+        self.expired += len(stale)
+
+    def submit(
+        self,
+        kind: str,
+        work: Callable[[], Awaitable[JobOutput]],
+        after: Optional[Callable[[TryonJob], Awaitable[None]]] = None,
+    ) -> TryonJob:
+        """Register a job and schedule `work` (then `after`, e.g. a storage upload) on the loop."""
+        with self._lock:
+            self._cleanup_locked()
+            if len(self._jobs) >= self.max_jobs:
+                # Make room by dropping the oldest finished jobs before refusing.
+                for old in sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at or 0):
+                    if len(self._jobs) < self.max_jobs:
+                        break
+                    del self._jobs[old.id]
+                    self.expired += 1
+            if len(self._jobs) >= self.max_jobs:
+                raise JobStoreFullError(f"Too many try-on jobs in progress ({len(self._jobs)}/{self.max_jobs})")
+            job = TryonJob(id=uuid.uuid4().hex, kind=kind)
+            self._jobs[job.id] = job
+            self.submitted += 1
+        task = asyncio.get_running_loop().create_task(self._run(job, work, after))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _run(
+        self,
+        job: TryonJob,
+        work: Callable[[], Awaitable[JobOutput]],
+        after: Optional[Callable[[TryonJob], Awaitable[None]]],
+    ) -> None:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = time.time()
+            retry_until = time.monotonic() + self.retry_seconds
+            try:
+                while True:
+                    try:
+                        job.outputs, job.media_type, job.meta = await work()
+                        break
+                    except (AdmissionRejected, PoolSaturatedError):
+                        # Interactive requests filled the pool: wait instead of failing the job,
+                        # up to retry_seconds (then 503, and the concurrency slot is freed).
+                        if time.monotonic() >= retry_until:
+                            raise
+                        await asyncio.sleep(_POOL_RETRY_SECONDS)
+                if after is not None:
+                    try:
+                        await after(job)
+                    except Exception as e:
+                        # The image is still served from the job; only persisting it failed.
+                        job.storage_error = str(e) or type(e).__name__
+                job.status = "done"
+            except (AdmissionRejected, PoolSaturatedError) as e:
+                job.status, job.error_status = "failed", 503
+                job.error = f"Try-on workers stayed busy for {self.retry_seconds:g}s: {e}"
+            except ValueError as e:
+                job.status, job.error, job.error_status = "failed", str(e), 422
+            except Exception as e:
+                job.status, job.error, job.error_status = "failed", str(e) or type(e).__name__, 500
+            finally:
+                job.finished_at = time.time()
+                with self._lock:
+                    if job.status == "done":
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+
+    def get(self, job_id: str) -> Optional[TryonJob]:
+        with self._lock:
+            self._cleanup_locked()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            self._cleanup_locked()
+            by_status: dict[str, int] = {}
+            held = 0
+            for j in self._jobs.values():
+                by_status[j.status] = by_status.get(j.status, 0) + 1
+                held += sum(len(o) for o in j.outputs)
+            return {
+                "jobs": len(self._jobs),
+                "by_status": by_status,
+                "result_bytes": held,
+                "max_jobs": self.max_jobs,
+                "concurrency": self.concurrency,
+                "ttl_seconds": self.ttl_seconds,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "expired": self.expired,
+            }
+
+
+async def upload_to_storage(data: bytes, content_type: str, folder: str) -> dict[str, str]:
+    """Upload bytes to the Supabase `images` bucket; returns {"url", "path"}."""
+    if not SUPABASE_URL or not SUPABASE_KEY:
+        raise RuntimeError("Supabase configuration missing")
+    ext = {"image/png": ".png", "image/webp": ".webp", "video/mp4": ".mp4"}.get(content_type, ".jpg")
+    path = f"{folder}/{uuid.uuid4()}{ext}"
+    async with httpx.AsyncClient() as client:
+        response = await client.post(
+            f"{SUPABASE_URL}/storage/v1/object/{STORAGE_BUCKET}/{path}",
+            content=data,
+            headers={"Authorization": f"Bearer {SUPABASE_KEY}", "apikey": SUPABASE_KEY, "Content-Type": content_type},
+        )
+    if response.status_code != 200:
+        raise RuntimeError(f"Failed to upload try-on image: {response.text}")
+    return {"url": f"{SUPABASE_URL}/storage/v1/object/public/{STORAGE_BUCKET}/{path}", "path": path}
+
+
+def _create_tryon_rows(product_id: str, user_id: str, urls: list[str], metadata: dict[str, Any]) -> list[str]:
+    from models.database import SessionLocal
+    from models.product_tryon_image import ProductTryonImage
+
+    db = SessionLocal()
+    try:
+        rows = [
+            ProductTryonImage(product_id=product_id, user_id=user_id, image_url=url, tryon_metadata=metadata)
+            for url in urls
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [str(r.id) for r in rows]
+    finally:
+        db.close()
+
+
+def save_outputs_hook(product_id: Optional[str], user_id: Optional[str]) -> Callable[[TryonJob], Awaitable[None]]:
+    """
+    `after` hook for JobStore.submit: upload every output image to storage and, when both ids
+    are given, create one ProductTryonImage row per image. Results land in job.storage.
+    """
+
+    async def save(job: TryonJob) -> None:
+        folder = f"tryon/{product_id}" if product_id else "tryon"
+        uploads = [await upload_to_storage(data, job.media_type, folder) for data in job.outputs]
+        if product_id and user_id:
+            metadata = {
+                "job_id": job.id,
+                "kind": job.kind,
+                "face_count": job.meta.get("face_count"),
+                "winning_pass": (job.meta.get("detection") or {}).get("winning_pass"),
+            }
+            row_ids = await asyncio.to_thread(
+                _create_tryon_rows, product_id, user_id, [u["url"] for u in uploads], metadata
+            )
+            for u, rid in zip(uploads, row_ids):
+                u["tryon_image_id"] = rid
+        job.storage = uploads
+
+    return save
+
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            _job_store = JobStore()
+        return _job_store
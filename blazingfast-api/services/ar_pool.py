@@ -0,0 +1,334 @@
+"""
+Process pool for CPU-heavy AR try-on work (services/ar_jewelry.py).
+
+OpenCV decode / Haar detection / encode run in worker processes so a large upload never
+blocks the API event loop. Workers preload the Haar cascade and the jewellery preset
+overlays when they spawn; routes pass a preset id (str) instead of a decoded overlay.
+
+Configuration (environment):
+- AR_POOL_WORKERS: number of worker processes (default: CPU count; 0 = thread fallback)
+- AR_POOL_MAX_PENDING: max queued + running jobs before new ones are rejected
+- AR_POOL_START_METHOD: multiprocessing start method (default: spawn)
+
+Large arguments and results travel through shared memory instead of the executor pipe
+(services/ar_shm.py, AR_SHM).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from services.ar_jewelry import (
+    Overlay,
+    OverlayItem,
+    compose_from_bytes,
+    compose_many_from_bytes,
+    decode_image_bytes,
+    encode_image,
+    get_cascade,
+)
+from services.ar_shm import AR_SHM, SharedMemoryTransport, attach_args, export_result
+from services.frame_cache import get_frame_cache
+from services.overlay_cache import PresetOverlay, get_overlay_cache
+
+AR_POOL_WORKERS = int(os.getenv("AR_POOL_WORKERS", str(os.cpu_count() or 1)))
+AR_POOL_MAX_PENDING = int(os.getenv("AR_POOL_MAX_PENDING", str(max(1, AR_POOL_WORKERS) * 4)))
+AR_POOL_START_METHOD = os.getenv("AR_POOL_START_METHOD", "spawn")
+
+OverlayRef = Union[np.ndarray, str]
+
+
+class PoolSaturatedError(RuntimeError):
+    """Raised when the bounded try-on queue is full (callers answer 503 + Retry-After)."""
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs inside the pool processes)
+# ---------------------------------------------------------------------------
+
+
+def _init_worker() -> None:
+    """Preload cascade + preset overlays (decoded and pre-scaled) once per worker process."""
+    # One OpenCV thread per process: parallelism comes from the pool itself.
+    cv2.setNumThreads(1)
+    get_cascade()
+    get_overlay_cache().prescale_presets()
+
+
+def resolve_overlay_ref(overlay: OverlayRef) -> Overlay:
+    """Map a preset id to its cached overlay handle; arrays (custom uploads) pass through."""
+    if not isinstance(overlay, str):
+        return overlay
+    handle = PresetOverlay(overlay)
+    # Unknown preset / missing PNG fails here, before detection runs.
+    handle.cache.get_base(overlay)
+    return handle
+
+
+def compose_task(image_bytes: bytes, overlay: OverlayRef, *args: Any, **kwargs: Any) -> Tuple[bytes, dict[str, Any]]:
+    """Worker entry point for compose_from_bytes with a preset id or overlay array."""
+    return compose_from_bytes(image_bytes, resolve_overlay_ref(overlay), *args, **kwargs)
+
+
+def compose_many_task(image_bytes: bytes, items: list[OverlayItem], **kwargs: Any) -> Tuple[list[bytes], dict[str, Any]]:
+    """Worker entry point for compose_many_from_bytes; item overlays may be preset ids."""
+    resolved = [
+        OverlayItem(resolve_overlay_ref(it.overlay), it.mx, it.my, it.dw, it.dh, it.drop_factor, it.use_face_height)
+        for it in items
+    ]
+    return compose_many_from_bytes(image_bytes, resolved, **kwargs)
+
+
+def resize_encode_task(
+    image_bytes: bytes,
+    width: int,
+    height: int,
+    output_format: str = "png",
+    quality: Optional[int] = None,
+    png_compression: Optional[int] = None,
+) -> bytes:
+    """Decode, resize and re-encode the original photo (return_original_if_no_face)."""
+    frame = cv2.resize(decode_image_bytes(image_bytes, (width, height)), (width, height))
+    return encode_image(frame, output_format, quality, png_compression)
+
+
+def _worker_info() -> dict[str, Any]:
+    """Worker-local state reported back with every task (caches live in the workers)."""
+    return {"overlay_cache": get_overlay_cache().stats(), "frame_cache": get_frame_cache().stats()}
+
+
+def _run_task(
+    fn: Callable[..., Any], args: tuple, kwargs: dict, shm_min_bytes: Optional[int] = None
+) -> Tuple[int, float, bool, Any, dict[str, Any]]:
+    """
+    Run fn and report (pid, busy_seconds, ok, result_or_exception, worker_info) to the parent.
+
+    shm_min_bytes set: SharedRef arguments are mapped for the call, and result bytes of at
+    least that size are returned in shared segments (services/ar_shm.py).
+    """
+    started = time.perf_counter()
+    attached: list = []
+    try:
+        if shm_min_bytes is not None:
+            args, kwargs, attached = attach_args(args, kwargs)
+        result = fn(*args, **kwargs)
+        if shm_min_bytes is not None:
+            result = export_result(result, shm_min_bytes)
+        ok = True
+    except Exception as e:  # re-raised in the parent after stats are recorded
+        result = e
+        ok = False
+    finally:
+        for a in attached:
+            a.close()
+    return os.getpid(), time.perf_counter() - started, ok, result, _worker_info()
+
+
+# ---------------------------------------------------------------------------
+# Parent side
+# ---------------------------------------------------------------------------
+
+
+def _free_orphaned_output(transport: SharedMemoryTransport, cfut: concurrent.futures.Future) -> None:
+    """Done-callback for tasks whose caller was cancelled: unlink result segments."""
+    if cfut.cancelled() or cfut.exception() is not None:
+        return
+    _, _, ok, result, _ = cfut.result()
+    if ok:
+        transport.free(result)
+
+
+class ARWorkerPool:
+    """Bounded process pool with per-worker utilisation stats."""
+
+    def __init__(
+        self,
+        workers: int = AR_POOL_WORKERS,
+        max_pending: int = AR_POOL_MAX_PENDING,
+        start_method: str = AR_POOL_START_METHOD,
+        shared_memory: bool = AR_SHM,
+    ):
+        self.workers = max(0, int(workers))
+        # Thread fallback shares the address space already: no transport needed.
+        self.transport = SharedMemoryTransport() if shared_memory and self.workers else None
+        self.max_pending = max(1, int(max_pending))
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._started_at = time.monotonic()
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._queue_wait_total = 0.0
+        self._worker_stats: dict[int, dict[str, float]] = {}
+        self._worker_info: dict[int, dict[str, Any]] = {}
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(self.start_method),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _discard_executor(self, executor: Optional[ProcessPoolExecutor]) -> None:
+        """Forget a broken executor and stop its threads; a newer one created meanwhile stays."""
+        if executor is None:
+            return
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _acquire_slot(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise PoolSaturatedError(
+                    f"AR try-on queue is full ({self._pending}/{self.max_pending} jobs)"
+                )
+            self._pending += 1
+            self._submitted += 1
+
+    def _release_slot(
+        self, pid: Optional[int], busy: float, wall: float, ok: bool, info: Optional[dict[str, Any]] = None
+    ) -> None:
+        with self._lock:
+            self._pending -= 1
+            if not ok:
+                self._failed += 1
+            if pid is None:
+                return
+            if info:
+                self._worker_info[pid] = info
+            self._queue_wait_total += max(0.0, wall - busy)
+            st = self._worker_stats.setdefault(pid, {"tasks": 0, "errors": 0, "busy_seconds": 0.0})
+            st["tasks"] += 1
+            st["busy_seconds"] += busy
+            if not ok:
+                st["errors"] += 1
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a module-level function in the pool and await its result.
+
+        Raises PoolSaturatedError immediately when max_pending jobs are already in flight.
+        Exceptions raised by fn in the worker are re-raised here unchanged.
+        """
+        self._acquire_slot()
+        transport = self.transport
+        refs: list = []
+        submitted = time.perf_counter()
+        pid: Optional[int] = None
+        busy, ok, info = 0.0, False, None
+        cfut: Optional[concurrent.futures.Future] = None
+        try:
+            executor = self._get_executor()
+            try:
+                if executor is None:
+                    call = functools.partial(_run_task, fn, args, kwargs)
+                    fut = asyncio.get_running_loop().run_in_executor(None, call)
+                else:
+                    shm_min = None
+                    if transport is not None:
+                        args, kwargs, refs = transport.export_args(args, kwargs)
+                        shm_min = transport.min_bytes
+                    cfut = executor.submit(_run_task, fn, args, kwargs, shm_min)
+                    fut = asyncio.wrap_future(cfut)
+                pid, busy, ok, result, info = await fut
+            except BrokenProcessPool as e:
+                # A worker died (OOM / segfault in native code): start a fresh pool next time.
+                self._discard_executor(executor)
+                raise RuntimeError("AR worker process crashed; please retry") from e
+            except asyncio.CancelledError:
+                if cfut is not None and transport is not None:
+                    # The worker still finishes the task: free its output segments then.
+                    cfut.add_done_callback(functools.partial(_free_orphaned_output, transport))
+                raise
+        finally:
+            self._release_slot(pid, busy, time.perf_counter() - submitted, ok, info)
+            if transport is not None:
+                transport.release(refs)
+                transport.sweep()
+        if not ok:
+            raise result
+        if transport is not None and cfut is not None:
+            result = transport.collect(result)
+        return result
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth, totals and per-worker utilisation (busy time / pool uptime)."""
+        with self._lock:
+            uptime = max(1e-9, time.monotonic() - self._started_at)
+            workers = {
+                str(pid): {
+                    "tasks": int(st["tasks"]),
+                    "errors": int(st["errors"]),
+                    "busy_seconds": round(st["busy_seconds"], 3),
+                    "utilisation": round(st["busy_seconds"] / uptime, 4),
+                    **self._worker_info.get(pid, {}),
+                }
+                for pid, st in self._worker_stats.items()
+            }
+            done = sum(int(st["tasks"]) for st in self._worker_stats.values())
+            return {
+                "mode": "process" if self.workers else "thread",
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "failed": self._failed,
+                "avg_queue_wait_ms": round(1000 * self._queue_wait_total / done, 2) if done else 0.0,
+                "uptime_seconds": round(uptime, 1),
+                "per_worker": workers,
+                "shared_memory": self.transport.stats() if self.transport is not None else None,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if self.transport is not None and wait:
+            # No task is running any more: whatever is left of ours is a leak.
+            self.transport.sweep(max_age=0, force=True)
+
+
+_pool: Optional[ARWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ar_pool() -> ARWorkerPool:
+    """Process-wide pool singleton (created lazily with env configuration)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ARWorkerPool()
+        return _pool
+
+
+def shutdown_ar_pool() -> None:
+    """Stop worker processes (FastAPI shutdown hook)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown()
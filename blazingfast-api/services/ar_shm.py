@@ -0,0 +1,288 @@
+"""
+Shared-memory transport for AR worker pool jobs (services/ar_pool.py).
+
+ProcessPoolExecutor pickles every argument and result through a pipe: a 5 MB upload is
+copied into the pickle, written, read and unpickled before the worker even decodes it, and
+the encoded output travels back the same way. With this transport, large `bytes` and numpy
+arguments are copied once into a POSIX shared-memory segment and only a small handle
+(SharedRef) crosses the pipe. The worker maps the segment and decodes straight from it.
+Large encoded outputs come back the same way, in segments the worker creates.
+
+Lifecycle:
+- Input segments are created by the API process and unlinked when the job finishes,
+  whatever the outcome.
+- Output segments are created by the worker, and the API process copies them out and
+  unlinks them. If the waiting request was cancelled, the pool frees them when the worker
+  finishes anyway.
+- Every segment name starts with `lar<api pid>_`. sweep() unlinks ours that are older than
+  AR_SHM_LEAK_SECONDS (e.g. orphaned by a crashed worker) and counts them as leaks. The
+  pool sweeps periodically and at shutdown.
+
+Configuration (environment):
+- AR_SHM: "false" sends everything through the pipe as before (default true)
+- AR_SHM_MIN_BYTES: smaller payloads are pickled; a segment costs a few syscalls (default 65536)
+- AR_SHM_LEAK_SECONDS: age after which a leftover segment is considered leaked (default 300)
+"""
+
+from __future__ import annotations
+
+import os
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+AR_SHM = os.getenv("AR_SHM", "true").lower() not in ("0", "false", "no")
+AR_SHM_MIN_BYTES = int(os.getenv("AR_SHM_MIN_BYTES", "65536"))
+AR_SHM_LEAK_SECONDS = float(os.getenv("AR_SHM_LEAK_SECONDS", "300"))
+
+_SHM_DIR = "/dev/shm"
+
+
+@dataclass(frozen=True)
+class SharedRef:
+    """Picklable handle to a shared segment holding bytes (shape None) or a numpy array."""
+
+    name: str
+    size: int
+    shape: Optional[Tuple[int, ...]] = None
+    dtype: str = "uint8"
+
+
+def segment_prefix(owner_pid: Optional[int] = None) -> str:
+    """Name prefix of segments belonging to one API process (workers pass os.getppid())."""
+    return f"lar{owner_pid or os.getpid()}_"
+
+
+def _create(size: int, owner_pid: Optional[int] = None) -> shared_memory.SharedMemory:
+    name = segment_prefix(owner_pid) + secrets.token_hex(6)
+    return shared_memory.SharedMemory(name=name, create=True, size=max(1, size))
+
+
+def put(value: Any, owner_pid: Optional[int] = None) -> SharedRef:
+    """Copy bytes or a C-contiguous array into a new segment and return its handle."""
+    if isinstance(value, np.ndarray):
+        arr = np.ascontiguousarray(value)
+        shm = _create(arr.nbytes, owner_pid)
+        try:
+            np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[...] = arr
+            return SharedRef(shm.name, arr.nbytes, tuple(arr.shape), arr.dtype.str)
+        finally:
+            shm.close()
+    data = memoryview(value).cast("B")
+    shm = _create(data.nbytes, owner_pid)
+    try:
+        shm.buf[: data.nbytes] = data
+        return SharedRef(shm.name, data.nbytes)
+    finally:
+        shm.close()
+
+
+class Attached:
+    """A mapped segment plus the view handed to the task (memoryview or ndarray)."""
+
+    def __init__(self, ref: SharedRef):
+        self.shm = shared_memory.SharedMemory(name=ref.name)
+        if ref.shape is None:
+            self.value: Any = self.shm.buf[: ref.size]
+        else:
+            self.value = np.ndarray(ref.shape, np.dtype(ref.dtype), buffer=self.shm.buf)
+
+    def close(self) -> None:
+        try:
+            if isinstance(self.value, memoryview):
+                self.value.release()
+            self.value = None
+            self.shm.close()
+        except BufferError:
+            pass  # a view is still referenced somewhere; the mapping goes with it on GC
+
+
+def read_bytes(ref: SharedRef) -> bytes:
+    """Copy a bytes segment out (the response needs real bytes anyway)."""
+    shm = shared_memory.SharedMemory(name=ref.name)
+    try:
+        return bytes(shm.buf[: ref.size])
+    finally:
+        shm.close()
+
+
+def unlink(ref: SharedRef) -> bool:
+    """Remove a segment; False if it was already gone."""
+    try:
+        shm = shared_memory.SharedMemory(name=ref.name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Worker side
+# ---------------------------------------------------------------------------
+
+
+def attach_args(args: tuple, kwargs: dict) -> Tuple[tuple, dict, list[Attached]]:
+    """Swap SharedRef arguments for views of their segments (close them after the task)."""
+    attached: list[Attached] = []
+
+    def resolve(v: Any) -> Any:
+        if isinstance(v, SharedRef):
+            a = Attached(v)
+            attached.append(a)
+            return a.value
+        return v
+
+    return tuple(resolve(v) for v in args), {k: resolve(v) for k, v in kwargs.items()}, attached
+
+
+def export_result(result: Any, min_bytes: int) -> Any:
+    """Move large bytes in a task result (top level, or in a tuple / list in a tuple) into segments."""
+    owner = os.getppid()
+
+    def move(v: Any) -> Any:
+        return put(v, owner) if isinstance(v, bytes) and len(v) >= min_bytes else v
+
+    if isinstance(result, tuple):
+        return tuple([move(x) for x in v] if isinstance(v, list) else move(v) for v in result)
+    return move(result)
+
+
+# ---------------------------------------------------------------------------
+# API process side
+# ---------------------------------------------------------------------------
+
+
+class SharedMemoryTransport:
+    """Owns the segments of one API process: export args, collect results, sweep leaks."""
+
+    def __init__(self, min_bytes: int = AR_SHM_MIN_BYTES, leak_seconds: float = AR_SHM_LEAK_SECONDS):
+        self.min_bytes = max(0, int(min_bytes))
+        self.leak_seconds = max(1.0, float(leak_seconds))
+        self._lock = threading.Lock()
+        self._live: dict[str, Tuple[int, float]] = {}  # input segments: name → (size, created)
+        self.segments_in = 0
+        self.segments_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.orphans_freed = 0
+        self.leaks_swept = 0
+        self._last_sweep = time.monotonic()
+
+    def _large(self, value: Any) -> bool:
+        if isinstance(value, (bytes, bytearray)):
+            return len(value) >= self.min_bytes
+        return isinstance(value, np.ndarray) and value.nbytes >= self.min_bytes
+
+    def export_args(self, args: tuple, kwargs: dict) -> Tuple[tuple, dict, list[SharedRef]]:
+        """Replace large bytes / arrays with SharedRefs; returns the refs to release later."""
+        refs: list[SharedRef] = []
+
+        def convert(v: Any) -> Any:
+            if not self._large(v):
+                return v
+            ref = put(v)
+            refs.append(ref)
+            return ref
+
+        try:
+            out_args = tuple(convert(v) for v in args)
+            out_kwargs = {k: convert(v) for k, v in kwargs.items()}
+        except BaseException:
+            self.release(refs)
+            raise
+        with self._lock:
+            now = time.monotonic()
+            for ref in refs:
+                self._live[ref.name] = (ref.size, now)
+            self.segments_in += len(refs)
+            self.bytes_in += sum(r.size for r in refs)
+        return out_args, out_kwargs, refs
+
+    def release(self, refs: list[SharedRef]) -> None:
+        for ref in refs:
+            unlink(ref)
+        with self._lock:
+            for ref in refs:
+                self._live.pop(ref.name, None)
+
+    def collect(self, result: Any) -> Any:
+        """Copy worker-created segments in a result back into bytes and unlink them."""
+        if isinstance(result, SharedRef):
+            try:
+                data = read_bytes(result)
+            finally:
+                unlink(result)
+            with self._lock:
+                self.segments_out += 1
+                self.bytes_out += result.size
+            return data
+        if isinstance(result, tuple):
+            return tuple(self.collect(v) for v in result)
+        if isinstance(result, list):
+            return [self.collect(v) for v in result]
+        return result
+
+    def free(self, result: Any) -> None:
+        """Drop the output segments of a result nobody will collect (cancelled request)."""
+        refs = [result] if isinstance(result, SharedRef) else []
+        if isinstance(result, (tuple, list)):
+            for v in result:
+                if isinstance(v, SharedRef):
+                    refs.append(v)
+                elif isinstance(v, list):
+                    refs.extend(x for x in v if isinstance(x, SharedRef))
+        freed = sum(unlink(r) for r in refs)
+        with self._lock:
+            self.orphans_freed += freed
+
+    def sweep(self, max_age: Optional[float] = None, force: bool = False) -> int:
+        """
+        Unlink this process's segments older than max_age (default leak_seconds) that nothing
+        is tracking as live; returns how many were removed. Linux only (/dev/shm listing).
+        Throttled to once a minute unless force=True.
+        """
+        now_mono = time.monotonic()
+        if not force and now_mono - self._last_sweep < 60:
+            return 0
+        self._last_sweep = now_mono
+        if not os.path.isdir(_SHM_DIR):
+            return 0
+        max_age = self.leak_seconds if max_age is None else max_age
+        prefix = segment_prefix()
+        now = time.time()
+        with self._lock:
+            live = set(self._live)
+        removed = 0
+        for entry in os.scandir(_SHM_DIR):
+            if not entry.name.startswith(prefix) or entry.name in live:
+                continue
+            try:
+                if now - entry.stat().st_mtime < max_age:
+                    continue
+            except FileNotFoundError:
+                continue
+            if unlink(SharedRef(entry.name, 0)):
+                removed += 1
+        with self._lock:
+            self.leaks_swept += removed
+        return removed
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "min_bytes": self.min_bytes,
+                "live_segments": len(self._live),
+                "live_bytes": sum(size for size, _ in self._live.values()),
+                "segments_in": self.segments_in,
+                "segments_out": self.segments_out,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "orphans_freed": self.orphans_freed,
+                "leaks_swept": self.leaks_swept,
+            }
@@ -0,0 +1,83 @@
+"""
+Per-connection state for the live try-on WebSocket (routes/ar_tryon.py: /ar-tryon/stream).
+
+Each incoming JPEG frame is decoded, resized, tracked (services/face_tracking.py), decorated
+with the current overlay and re-encoded as JPEG. A session processes one frame at a time;
+the route keeps only the newest pending frame so slow clients never build up latency.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Tuple
+
+import cv2
+
+from services.ar_jewelry import (
+    DEFAULT_HEIGHT,
+    DEFAULT_WIDTH,
+    OverlayItem,
+    decode_image_bytes,
+    place_overlay,
+)
+from services.face_tracking import FaceTracker
+
+
+class StreamSession:
+    def __init__(
+        self,
+        item: OverlayItem,
+        *,
+        width: int = DEFAULT_WIDTH,
+        height: int = DEFAULT_HEIGHT,
+        flip_horizontal: bool = False,
+        detect_every: int = 10,
+        jpeg_quality: int = 80,
+    ):
+        self.item = item
+        self.width = width
+        self.height = height
+        self.flip_horizontal = flip_horizontal
+        self.jpeg_quality = int(jpeg_quality)
+        self.tracker = FaceTracker(detect_every=detect_every)
+        self.frames = 0
+        self.dropped = 0
+        self._started = time.monotonic()
+        self._busy = 0.0
+
+    def process(self, frame_bytes: bytes) -> Tuple[bytes, dict[str, Any]]:
+        """Composite one JPEG/PNG frame; returns (jpeg_bytes, per-frame info)."""
+        t0 = time.perf_counter()
+        frame = decode_image_bytes(frame_bytes, (self.width, self.height))
+        if self.flip_horizontal:
+            frame = cv2.flip(frame, 1)
+        if frame.shape[1] != self.width or frame.shape[0] != self.height:
+            frame = cv2.resize(frame, (self.width, self.height))
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        face, info = self.tracker.update(gray)
+
+        if face is not None:
+            it = self.item
+            place_overlay(frame, face, it.overlay, it.mx, it.my, it.dw, it.dh, it.drop_factor, it.use_face_height)
+        ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            raise RuntimeError("Failed to encode output frame")
+
+        self.frames += 1
+        elapsed = time.perf_counter() - t0
+        self._busy += elapsed
+        info["face"] = list(face) if face is not None else None
+        info["frame_ms"] = round(elapsed * 1000, 2)
+        return buf.tobytes(), info
+
+    def stats(self) -> dict[str, Any]:
+        wall = max(1e-9, time.monotonic() - self._started)
+        return {
+            "frames": self.frames,
+            "dropped": self.dropped,
+            "detections": self.tracker.detections,
+            "tracked": self.tracker.tracked,
+            "fps": round(self.frames / wall, 2),
+            "capacity_fps": round(self.frames / self._busy, 2) if self._busy else 0.0,
+        }
+
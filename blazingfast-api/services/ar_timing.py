@@ -0,0 +1,179 @@
+"""
+Per-stage timers for the AR pipeline and per-preset latency histograms.
+
+ar_jewelry wraps each stage (decode, resize, detect, overlay, blend, encode, ...) in
+`stage(name)`. The timings only land somewhere while a `timed()` block is active: the compose
+entry points are decorated with `with_timings` and return them as meta["timings"] (ms, plus
+"total"). Outside such a block `stage` is a no-op, so the instrumentation stays on in
+production for about a microsecond per stage.
+
+The API process feeds finished timings into StageMetrics (bucketed histograms per preset and
+stage) for GET /ar-tryon/metrics, and renders them as a Server-Timing response header.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator, Mapping, Optional, Tuple
+
+# Histogram bucket upper bounds in ms (last bucket: +Inf).
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class StageTimer:
+    """Accumulated milliseconds per stage name, in first-seen order."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def add(self, name: str, ms: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + ms
+
+    def as_meta(self) -> dict[str, float]:
+        out = {name: round(ms, 2) for name, ms in self.stages.items()}
+        out["total"] = round((time.perf_counter() - self.started) * 1000, 2)
+        return out
+
+
+_current: ContextVar[Optional[StageTimer]] = ContextVar("ar_stage_timer", default=None)
+
+
+@contextmanager
+def timed() -> Iterator[StageTimer]:
+    """Collect every `stage` run inside the block (nested blocks share the outer timer)."""
+    outer = _current.get()
+    if outer is not None:
+        yield outer
+        return
+    timer = StageTimer()
+    token = _current.set(timer)
+    try:
+        yield timer
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    timer = _current.get()
+    if timer is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timer.add(name, (time.perf_counter() - t0) * 1000)
+
+
+def with_timings(fn: Callable[..., Tuple[Any, dict[str, Any]]]) -> Callable[..., Tuple[Any, dict[str, Any]]]:
+    """Decorator for functions returning (result, meta): run in `timed()`, add meta["timings"]."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Tuple[Any, dict[str, Any]]:
+        with timed() as timer:
+            result, meta = fn(*args, **kwargs)
+        meta["timings"] = timer.as_meta()
+        return result, meta
+
+    return wrapper
+
+
+def server_timing(timings: Mapping[str, float], descriptions: Optional[Mapping[str, str]] = None) -> str:
+    """Format {stage: ms} as a Server-Timing header value (RFC: name;dur=ms;desc="...")."""
+    descriptions = descriptions or {}
+    parts = []
+    for name, ms in timings.items():
+        entry = f"{name};dur={ms:.2f}"
+        if name in descriptions:
+            entry += f';desc="{descriptions[name]}"'
+        parts.append(entry)
+    return ", ".join(parts)
+
+
+class _Histogram:
+    __slots__ = ("counts", "count", "sum_ms", "max_ms")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-quantile (None above the last bound)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else None
+        return None
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.sum_ms / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 2),
+            "p50_le_ms": self.quantile(0.5),
+            "p95_le_ms": self.quantile(0.95),
+            "buckets": {
+                **{f"le_{b}": c for b, c in zip(BUCKETS_MS, self.counts)},
+                "le_inf": self.counts[-1],
+            },
+        }
+
+
+class StageMetrics:
+    """Thread-safe histograms keyed by (preset, stage)."""
+
+    def __init__(self) -> None:
+        self._hist: dict[tuple[str, str], _Histogram] = {}
+        self._lock = threading.Lock()
+        self.started = time.time()
+
+    def observe(self, preset: str, timings: Mapping[str, float]) -> None:
+        with self._lock:
+            for name, ms in timings.items():
+                hist = self._hist.get((preset, name))
+                if hist is None:
+                    hist = self._hist[(preset, name)] = _Histogram()
+                hist.observe(float(ms))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            presets: dict[str, dict[str, Any]] = {}
+            for (preset, name), hist in sorted(self._hist.items()):
+                presets.setdefault(preset, {})[name] = hist.summary()
+        return {"since": self.started, "buckets_ms": list(BUCKETS_MS), "presets": presets}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hist.clear()
+            self.started = time.time()
+
+
+_metrics: Optional[StageMetrics] = None
+_metrics_lock = threading.Lock()
+
+
+def get_stage_metrics() -> StageMetrics:
+    """Per-process histogram store (API process; workers only return timings)."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = StageMetrics()
+        return _metrics
@@ -0,0 +1,271 @@
+"""
+Offline video try-on: uploaded clip in, composited clip out (routes/ar_tryon.py: /jobs/video).
+
+Frames are streamed: cv2.VideoCapture decodes one frame at a time, the face is detected every
+`detect_every` frames and tracked in between (services/face_tracking.py), the overlay is
+blended in place and cv2.VideoWriter encodes the frame straight away — memory does not grow
+with clip length. Long clips are split into frame ranges rendered in parallel on the AR
+worker pool, then joined (ffmpeg stream copy when available, otherwise re-encoded by OpenCV).
+Audio is not carried over.
+
+Configuration (environment):
+- AR_VIDEO_MAX_SIDE: longest output side in px when width/height are not given (default 720)
+- AR_VIDEO_SEGMENT_FRAMES: minimum frames per parallel segment (default 150)
+- AR_VIDEO_FOURCC: output codec for cv2.VideoWriter (default mp4v)
+- AR_VIDEO_MAX_FRAMES: longest accepted clip in frames (default 3000)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import cv2
+
+from services.admission import BATCH, AdmissionRejected, get_admission
+from services.ar_jewelry import OverlayItem, place_overlay
+from services.ar_jobs import AR_JOB_RETRY_SECONDS
+from services.ar_pool import PoolSaturatedError, get_ar_pool, resolve_overlay_ref
+from services.face_tracking import FaceTracker
+
+AR_VIDEO_MAX_SIDE = int(os.getenv("AR_VIDEO_MAX_SIDE", "720"))
+AR_VIDEO_SEGMENT_FRAMES = int(os.getenv("AR_VIDEO_SEGMENT_FRAMES", "150"))
+AR_VIDEO_FOURCC = os.getenv("AR_VIDEO_FOURCC", "mp4v")
+AR_VIDEO_MAX_FRAMES = int(os.getenv("AR_VIDEO_MAX_FRAMES", "3000"))
+
+_POOL_RETRY_SECONDS = 0.25
+
+
+def probe_video(path: str) -> dict[str, Any]:
+    """Frame count, fps and size from the container header; ValueError if unreadable."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise ValueError("Could not open video")
+        info = {
+            "frames": int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0),
+            "fps": float(cap.get(cv2.CAP_PROP_FPS) or 0.0) or 25.0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+    if info["width"] <= 0 or info["height"] <= 0:
+        raise ValueError("Could not read video dimensions")
+    return info
+
+
+def output_size(src_w: int, src_h: int, width: Optional[int], height: Optional[int]) -> Tuple[int, int]:
+    """Requested size, or the source size scaled to AR_VIDEO_MAX_SIDE (even numbers for codecs)."""
+    if width and height:
+        w, h = width, height
+    else:
+        scale = min(1.0, AR_VIDEO_MAX_SIDE / max(src_w, src_h))
+        w, h = int(src_w * scale), int(src_h * scale)
+    return max(2, w - w % 2), max(2, h - h % 2)
+
+
+def render_segment_task(
+    src_path: str,
+    dst_path: str,
+    item: OverlayItem,
+    start: int,
+    end: Optional[int],
+    *,
+    width: int,
+    height: int,
+    fps: float,
+    flip_horizontal: bool = False,
+    detect_every: int = 10,
+    fourcc: str = AR_VIDEO_FOURCC,
+    max_frames: Optional[int] = None,
+) -> dict[str, Any]:
+    """
+    Worker entry point: render frames [start, end) of src_path into dst_path (end=None: to EOF).
+
+    One frame is held at a time. Returns per-segment counters and frames/sec. Raises
+    ValueError on reaching frame index max_frames: the header frame count is only an estimate.
+    """
+    t0 = time.perf_counter()
+    it = OverlayItem(
+        resolve_overlay_ref(item.overlay), item.mx, item.my, item.dw, item.dh, item.drop_factor, item.use_face_height
+    )
+    cap = cv2.VideoCapture(src_path)
+    if not cap.isOpened():
+        raise ValueError("Could not open video")
+    writer = cv2.VideoWriter(dst_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        cap.release()
+        raise RuntimeError(f"Could not open video writer ({fourcc})")
+    tracker = FaceTracker(detect_every=detect_every)
+    frames = with_face = 0
+    try:
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        while end is None or start + frames < end:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            if max_frames and start + frames >= max_frames:
+                raise ValueError(f"Video too long: more than {max_frames} frames")
+            if flip_horizontal:
+                frame = cv2.flip(frame, 1)
+            if frame.shape[1] != width or frame.shape[0] != height:
+                frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            face, _ = tracker.update(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+            if face is not None:
+                place_overlay(frame, face, it.overlay, it.mx, it.my, it.dw, it.dh, it.drop_factor, it.use_face_height)
+                with_face += 1
+            writer.write(frame)
+            frames += 1
+    finally:
+        cap.release()
+        writer.release()
+    elapsed = time.perf_counter() - t0
+    return {
+        "start": start,
+        "frames": frames,
+        "frames_with_face": with_face,
+        "detections": tracker.detections,
+        "tracked": tracker.tracked,
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+
+
+def concat_segments_task(parts: list[str], dst_path: str, fps: float, fourcc: str = AR_VIDEO_FOURCC) -> str:
+    """
+    Join rendered segments into dst_path. Uses `ffmpeg -c copy` when the binary is installed,
+    otherwise decodes and re-encodes the parts with OpenCV (still one frame at a time).
+    Returns the method used.
+    """
+    if len(parts) == 1:
+        os.replace(parts[0], dst_path)
+        return "single"
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg:
+        listing = Path(dst_path).with_suffix(".txt")
+        listing.write_text("".join(f"file '{p}'\n" for p in parts), encoding="utf-8")
+        proc = subprocess.run(
+            [ffmpeg, "-loglevel", "error", "-y", "-f", "concat", "-safe", "0", "-i", str(listing), "-c", "copy", dst_path],
+            capture_output=True,
+        )
+        if proc.returncode == 0:
+            return "ffmpeg-copy"
+    writer: Optional[cv2.VideoWriter] = None
+    try:
+        for part in parts:
+            cap = cv2.VideoCapture(part)
+            try:
+                while True:
+                    ok, frame = cap.read()
+                    if not ok:
+                        break
+                    if writer is None:
+                        h, w = frame.shape[:2]
+                        writer = cv2.VideoWriter(dst_path, cv2.VideoWriter_fourcc(*fourcc), fps, (w, h))
+                    writer.write(frame)
+            finally:
+                cap.release()
+    finally:
+        if writer is not None:
+            writer.release()
+    if writer is None:
+        raise ValueError("Video contains no frames")
+    return "opencv-reencode"
+
+
+def plan_segments(frame_count: int, workers: int, min_frames: int = AR_VIDEO_SEGMENT_FRAMES) -> list[Tuple[int, Optional[int]]]:
+    """Split [0, frame_count) into at most `workers` ranges of >= min_frames; last one runs to EOF."""
+    if frame_count <= 0:
+        return [(0, None)]
+    n = max(1, min(workers, frame_count // max(1, min_frames)))
+    step = math.ceil(frame_count / n)
+    bounds = [i * step for i in range(n)]
+    return [(b, bounds[i + 1] if i + 1 < n else None) for i, b in enumerate(bounds)]
+
+
+async def _run_on_pool(fn: Any, *args: Any, **kwargs: Any) -> Any:
+    """
+    pool.run in the batch admission lane (services/admission.py), waiting for a free slot
+    instead of failing while interactive requests fill it. Each segment holds its own slot.
+    Gives up after AR_JOB_RETRY_SECONDS, re-raising, so the job fails with 503.
+    """
+    retry_until = time.monotonic() + AR_JOB_RETRY_SECONDS
+    while True:
+        try:
+            async with get_admission("tryon").slot(BATCH):
+                return await get_ar_pool().run(fn, *args, **kwargs)
+        except (AdmissionRejected, PoolSaturatedError):
+            if time.monotonic() >= retry_until:
+                raise
+            await asyncio.sleep(_POOL_RETRY_SECONDS)
+
+
+async def render_video(
+    src_path: str,
+    dst_path: str,
+    item: OverlayItem,
+    *,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    flip_horizontal: bool = False,
+    detect_every: int = 10,
+    max_frames: Optional[int] = AR_VIDEO_MAX_FRAMES,
+) -> dict[str, Any]:
+    """
+    Render src_path into dst_path on the AR worker pool (segments in parallel) and return meta:
+    source info, segments, frames, detections and render frames/sec.
+    """
+    t0 = time.perf_counter()
+    info = await asyncio.to_thread(probe_video, src_path)
+    # Early reject on the header count; the segments enforce max_frames on what they decode
+    # (the count is 0 / wrong for streamed or variable-frame-rate files).
+    if max_frames and info["frames"] > max_frames:
+        raise ValueError(f"Video too long: {info['frames']} frames (max {max_frames})")
+    w, h = output_size(info["width"], info["height"], width, height)
+    pool = get_ar_pool()
+    segments = plan_segments(info["frames"], max(1, pool.workers))
+    work_dir = Path(dst_path).parent
+    parts = [str(work_dir / f"part-{i:03d}.mp4") for i in range(len(segments))]
+
+    seg_stats = await asyncio.gather(
+        *(
+            _run_on_pool(
+                render_segment_task,
+                src_path,
+                part,
+                item,
+                start,
+                end,
+                width=w,
+                height=h,
+                fps=info["fps"],
+                flip_horizontal=flip_horizontal,
+                detect_every=detect_every,
+                max_frames=max_frames,
+            )
+            for part, (start, end) in zip(parts, segments)
+        )
+    )
+    rendered = sum(s["frames"] for s in seg_stats)
+    if rendered == 0:
+        raise ValueError("Video contains no frames")
+    join = await _run_on_pool(concat_segments_task, parts, dst_path, info["fps"])
+    elapsed = time.perf_counter() - t0
+    return {
+        "source": info,
+        "output": {"width": w, "height": h, "fps": info["fps"], "codec": AR_VIDEO_FOURCC, "join": join},
+        "frames": rendered,
+        "frames_with_face": sum(s["frames_with_face"] for s in seg_stats),
+        "detections": sum(s["detections"] for s in seg_stats),
+        "segments": seg_stats,
+        "seconds": round(elapsed, 3),
+        "render_fps": round(rendered / elapsed, 2) if elapsed > 0 else 0.0,
+    }
@@ -0,0 +1,154 @@
+"""
+Startup warm-up for AR try-on (main.py starts it; /health reports ready once it finished).
+
+Without it the first /ar-tryon/compose after a deploy pays for the Haar cascade XML load,
+the first preset PNG decodes and OpenCV spinning up its thread pool and codecs. Warm-up does
+all of that up front: in the API process (live mirror, thread fallback) and in the AR
+worker processes, by running a synthetic detection, overlay blend and encode in each.
+A failed warm-up is logged as a warning and shown in /health ("degraded"); traffic is let in
+and AR requests load lazily as before.
+
+Configuration (environment):
+- AR_WARMUP: "false" skips warm-up; the app is ready immediately (default true)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import warnings
+from typing import Any, Optional
+
+import cv2
+import numpy as np
+
+from services.ar_jewelry import (
+    DEFAULT_HEIGHT,
+    DEFAULT_WIDTH,
+    detect_face,
+    encode_image,
+    get_cascade,
+    load_jewellery_presets,
+    place_overlay,
+)
+from services.ar_pool import ARWorkerPool
+from services.overlay_cache import PresetOverlay, get_overlay_cache
+
+AR_WARMUP = os.getenv("AR_WARMUP", "true").lower() not in ("0", "false", "no")
+
+
+def _synthetic_frame() -> np.ndarray:
+    """Gradient + noise at the default output size: a full Haar scan with no early exit."""
+    ramp = np.linspace(40, 220, DEFAULT_WIDTH, dtype=np.float32)[None, :, None]
+    noise = np.random.default_rng(0).normal(0, 10, (DEFAULT_HEIGHT, DEFAULT_WIDTH, 3))
+    return np.clip(ramp + noise, 0, 255).astype(np.uint8)
+
+
+def warm_process() -> dict[str, Any]:
+    """
+    Load the cascade, decode and pre-scale every preset, then run one synthetic detection and,
+    per preset, one overlay blend; encode the result once per output format.
+    Returns what was warmed and how long each step took (ms).
+    """
+    steps: dict[str, float] = {}
+    t = time.perf_counter()
+
+    def lap(name: str) -> None:
+        nonlocal t
+        now = time.perf_counter()
+        steps[name] = round((now - t) * 1000, 2)
+        t = now
+
+    cascade = get_cascade()
+    lap("cascade")
+    get_overlay_cache().prescale_presets()
+    presets = list(load_jewellery_presets())
+    lap("presets")
+    frame = _synthetic_frame()
+    detect_face(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), cascade)
+    lap("detect")
+    face = (DEFAULT_WIDTH // 3, DEFAULT_HEIGHT // 4, DEFAULT_WIDTH // 3, DEFAULT_WIDTH // 3)
+    warmed = 0
+    for jid in presets:
+        try:
+            place_overlay(frame, face, PresetOverlay(jid), 0, 0, 1.0, 1.0)
+            warmed += 1
+        except (KeyError, FileNotFoundError, ValueError):
+            continue
+    lap("blend")
+    for fmt in ("jpg", "png", "webp"):
+        encode_image(frame, fmt)
+    lap("encode")
+    return {"pid": os.getpid(), "presets": warmed, "steps_ms": steps, "ms": round(sum(steps.values()), 2)}
+
+
+def warmup_task() -> dict[str, Any]:
+    """Worker entry point (the pool initializer already loaded cascade + presets)."""
+    return warm_process()
+
+
+class WarmupState:
+    """Progress of the startup warm-up, reported by /health."""
+
+    def __init__(self) -> None:
+        self.status = "pending"  # pending → running → ready | failed (or skipped)
+        self.started_at: Optional[float] = None
+        self.duration_ms: Optional[float] = None
+        self.api_process: Optional[dict[str, Any]] = None
+        self.workers: list[dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    @property
+    def ready(self) -> bool:
+        # A failed warm-up still lets traffic in: AR requests then load lazily as before.
+        return self.status in ("ready", "failed", "skipped")
+
+    def public(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"status": self.status, "duration_ms": self.duration_ms}
+        if self.api_process is not None:
+            out["api_process"] = self.api_process
+        if self.workers:
+            out["workers"] = self.workers
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+_state = WarmupState()
+
+
+def get_warmup_state() -> WarmupState:
+    return _state
+
+
+async def run_warmup(pool: ARWorkerPool, enabled: bool = AR_WARMUP) -> WarmupState:
+    """
+    Warm the API process and the pool workers, all in parallel. One task is submitted per
+    worker, capped at the pool's max_pending so warm-up never trips PoolSaturatedError.
+    ProcessPoolExecutor starts a process per task submitted while none is idle, but does not
+    promise one task per worker: a worker that gets none was still primed by the pool
+    initializer (cascade + presets) and warms the rest on its first request.
+    """
+    state = _state
+    if not enabled:
+        state.status = "skipped"
+        return state
+    state.status = "running"
+    state.started_at = time.time()
+    t0 = time.perf_counter()
+    tasks = min(pool.workers, pool.max_pending)
+    try:
+        api, *workers = await asyncio.gather(
+            asyncio.to_thread(warm_process), *(pool.run(warmup_task) for _ in range(tasks))
+        )
+        state.api_process = api
+        state.workers = sorted(workers, key=lambda r: r["pid"])
+        state.status = "ready"
+    except Exception as e:
+        state.status = "failed"
+        state.error = str(e) or type(e).__name__
+        warnings.warn(f"AR warm-up failed, AR requests will load lazily: {state.error}")
+    finally:
+        state.duration_ms = round((time.perf_counter() - t0) * 1000, 1)
+    return state
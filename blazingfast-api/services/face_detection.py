@@ -0,0 +1,221 @@
+"""
+Adaptive Haar face detection with early exit (used by services/ar_jewelry.py).
+
+Instead of running every detectMultiScale pass on the full-resolution frame, passes run on a
+downscaled pyramid level (AR_DETECT_LEVEL_WIDTH px wide) and stop as soon as one finds a face
+that is large enough (AR_DETECT_MIN_FACE_FRAC of the frame width) and confident enough
+(Haar final-stage weight >= AR_DETECT_MIN_CONFIDENCE). The winning rectangle is then refined
+in a small ROI at full resolution. Full-resolution and CLAHE passes only run on misses.
+
+Each call returns a report with the winning pass and per-pass timings (ms) for response meta.
+The report also lists every face the winning pass found ("faces", left to right, overlaps
+merged) with "primary_index" pointing at the returned one, so group photos need no second scan.
+With multi_face=True the early exit only settles the primary face: the remaining passes still
+run and their confident faces are merged in, so weaker faces a finer pass finds are kept.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+Rect = Tuple[int, int, int, int]
+
+# Haar frontal-face window is 24x24: smaller minSize values are meaningless.
+_CASCADE_WINDOW = 24
+
+
+@dataclass(frozen=True)
+class DetectPass:
+    """One detectMultiScale call. min_size is in full-frame pixels (scaled on pyramid levels)."""
+
+    name: str
+    scale_factor: float
+    min_neighbors: int
+    min_size: int
+    level: str = "pyramid"  # "pyramid" or "full"
+    equalize: bool = False  # CLAHE before detection (low light)
+
+
+# Cheap, reliable pass first; looser / costlier passes only when it is not conclusive.
+DEFAULT_PASSES: Tuple[DetectPass, ...] = (
+    DetectPass("pyramid-1.1x3", 1.1, 3, 40),
+    DetectPass("pyramid-1.05x4", 1.05, 4, 50),
+    DetectPass("pyramid-1.15x2", 1.15, 2, 30),
+    DetectPass("pyramid-1.3x2", 1.3, 2, 25),
+    DetectPass("pyramid-1.8x3", 1.8, 3, 20),  # ARJewelBox-style
+    DetectPass("full-1.1x3", 1.1, 3, 30, level="full"),  # small faces lost on the pyramid level
+    DetectPass("clahe-1.05x2", 1.05, 2, 25, equalize=True),
+)
+
+
+@dataclass
+class DetectionConfig:
+    level_width: int = 320  # 0 disables the pyramid level (all passes at full resolution)
+    min_face_frac: float = 0.1
+    min_confidence: float = 1.5
+    refine: bool = True
+    passes: Sequence[DetectPass] = field(default_factory=lambda: DEFAULT_PASSES)
+
+    @classmethod
+    def from_env(cls) -> "DetectionConfig":
+        return cls(
+            level_width=int(os.getenv("AR_DETECT_LEVEL_WIDTH", "320")),
+            min_face_frac=float(os.getenv("AR_DETECT_MIN_FACE_FRAC", "0.1")),
+            min_confidence=float(os.getenv("AR_DETECT_MIN_CONFIDENCE", "1.5")),
+            refine=os.getenv("AR_DETECT_REFINE", "true").lower() not in ("0", "false", "no"),
+        )
+
+
+def _run_pass(
+    img: np.ndarray,
+    cascade: cv2.CascadeClassifier,
+    p: DetectPass,
+    scale: float,
+) -> list[Tuple[Rect, float]]:
+    """Run one pass on img (already at `scale` of the full frame); rects in full-frame coords."""
+    min_sz = max(_CASCADE_WINDOW, int(round(p.min_size * scale)))
+    faces, _, weights = cascade.detectMultiScale3(
+        img,
+        scaleFactor=p.scale_factor,
+        minNeighbors=p.min_neighbors,
+        minSize=(min_sz, min_sz),
+        outputRejectLevels=True,
+    )
+    inv = 1.0 / scale
+    return [
+        ((int(x * inv), int(y * inv), int(w * inv), int(h * inv)), float(wt))
+        for (x, y, w, h), wt in zip(faces, np.ravel(weights))
+    ]
+
+
+def _refine(gray: np.ndarray, cascade: cv2.CascadeClassifier, rect: Rect) -> Optional[Rect]:
+    """Re-detect in a padded ROI at full resolution with a narrow size range."""
+    x, y, w, h = rect
+    m = int(0.3 * w)
+    x0, y0 = max(0, x - m), max(0, y - m)
+    x1, y1 = min(gray.shape[1], x + w + m), min(gray.shape[0], y + h + m)
+    lo, hi = max(_CASCADE_WINDOW, int(w * 0.75)), int(w * 1.35)
+    faces = cascade.detectMultiScale(
+        gray[y0:y1, x0:x1], scaleFactor=1.05, minNeighbors=3, minSize=(lo, lo), maxSize=(hi, hi)
+    )
+    if len(faces) == 0:
+        return None
+    fx, fy, fw, fh = max(faces, key=lambda r: r[2] * r[3])
+    return int(fx) + x0, int(fy) + y0, int(fw), int(fh)
+
+
+def _iou(a: Rect, b: Rect) -> float:
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union else 0.0
+
+
+def merge_faces(found: Sequence[Tuple[Rect, float]], min_confidence: float, keep: Rect) -> list[Rect]:
+    """
+    Faces of one pass: confident ones (plus `keep`, the primary face), overlapping boxes merged
+    into the larger one, sorted left to right (stable indices for callers selecting faces).
+    """
+    candidates = sorted(
+        (r for r, wt in found if wt >= min_confidence and _iou(r, keep) < 0.3), key=lambda r: -r[2] * r[3]
+    )
+    kept: list[Rect] = [keep]
+    for r in candidates:
+        if all(_iou(r, k) < 0.3 for k in kept):
+            kept.append(r)
+    return sorted(kept, key=lambda r: (r[0], r[1]))
+
+
+def detect_face_adaptive(
+    gray: np.ndarray,
+    cascade: cv2.CascadeClassifier,
+    config: Optional[DetectionConfig] = None,
+    multi_face: bool = False,
+) -> Tuple[Optional[Rect], dict[str, Any]]:
+    """
+    Return the largest accepted face (x, y, w, h) on the full-resolution gray frame plus a report:
+    {"strategy", "level_scale", "winning_pass", "confidence", "refined", "passes": [...],
+    "faces": [[x, y, w, h], ...], "primary_index", "detect_ms"}.
+
+    multi_face: run every pass and list the faces of all of them (the primary face is the same).
+    """
+    cfg = config or DetectionConfig.from_env()
+    t_start = time.perf_counter()
+    h_full, w_full = gray.shape[:2]
+    scale = min(1.0, cfg.level_width / w_full) if cfg.level_width > 0 else 1.0
+    level = gray if scale >= 1.0 else cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    min_face_w = cfg.min_face_frac * w_full
+
+    report: dict[str, Any] = {
+        "strategy": "adaptive",
+        "level_scale": round(scale, 4),
+        "winning_pass": None,
+        "confidence": None,
+        "refined": False,
+        "multi_face": multi_face,
+        "passes": [],
+    }
+    best: Optional[Tuple[Rect, float, str, float]] = None  # rect, weight, pass name, scale
+    best_found: list[Tuple[Rect, float]] = []  # every face of the pass that produced `best`
+    all_found: list[Tuple[Rect, float]] = []  # every face of every pass (multi_face)
+    settled = False
+    equalized: dict[str, np.ndarray] = {}
+
+    for p in cfg.passes:
+        use_full = p.level == "full" or scale >= 1.0
+        img, s = (gray, 1.0) if use_full else (level, scale)
+        if p.equalize:
+            key = "full" if use_full else "pyramid"
+            if key not in equalized:
+                equalized[key] = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(img)
+            img = equalized[key]
+        t0 = time.perf_counter()
+        found = _run_pass(img, cascade, p, s)
+        report["passes"].append(
+            {"name": p.name, "ms": round((time.perf_counter() - t0) * 1000, 2), "faces": len(found)}
+        )
+        all_found.extend(found)
+        if settled:
+            continue  # multi_face: later passes only add faces
+        for rect, wt in found:
+            if best is None or rect[2] * rect[3] > best[0][2] * best[0][3]:
+                best = (rect, wt, p.name, s)
+                best_found = found
+        if best is not None and best[0][2] >= min_face_w and best[1] >= cfg.min_confidence:
+            settled = True
+            if not multi_face:
+                break  # confident, large face: skip the remaining passes
+
+    if best is not None:
+        rect, wt, name, s = best
+        report["winning_pass"] = name
+        report["confidence"] = round(wt, 3)
+        if cfg.refine and s < 1.0:
+            t0 = time.perf_counter()
+            refined = _refine(gray, cascade, rect)
+            report["passes"].append(
+                {"name": "refine-roi", "ms": round((time.perf_counter() - t0) * 1000, 2), "faces": int(refined is not None)}
+            )
+            if refined is not None:
+                rect = refined
+                report["refined"] = True
+        best_rect: Optional[Rect] = rect
+        faces = merge_faces(all_found if multi_face else best_found, cfg.min_confidence, best[0])
+        primary = faces.index(best[0])
+        faces[primary] = rect
+        report["faces"] = [list(f) for f in faces]
+        report["primary_index"] = primary
+    else:
+        best_rect = None
+        report["faces"] = []
+        report["primary_index"] = None
+
+    report["detect_ms"] = round((time.perf_counter() - t_start) * 1000, 2)
+    return best_rect, report
@@ -0,0 +1,108 @@
+"""
+Cheap inter-frame face tracking for live try-on (WebSocket stream, video rendering).
+
+Full Haar detection (ar_jewelry.detect_face) runs every `detect_every` frames or when tracking
+confidence drops. In between, the face box is followed with normalised template matching in
+a small search window on a half-resolution grayscale frame — a few milliseconds per frame.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.ar_jewelry import detect_face, get_cascade
+
+Rect = Tuple[int, int, int, int]
+
+
+class FaceTracker:
+    def __init__(
+        self,
+        detect_every: int = 10,
+        min_score: float = 0.55,
+        search_margin: float = 0.4,
+        track_scale: float = 0.5,
+    ):
+        self.detect_every = max(1, int(detect_every))
+        self.min_score = float(min_score)
+        self.search_margin = float(search_margin)
+        self.track_scale = float(track_scale)
+        self.face: Optional[Rect] = None
+        self._template: Optional[np.ndarray] = None
+        self._since_detect = 0
+        self.detections = 0
+        self.tracked = 0
+
+    def adopt(self, other: "FaceTracker") -> None:
+        """Continue tracking from another tracker's state (e.g. after a config change)."""
+        self.face = other.face
+        self._template = other._template
+
+    def reset(self) -> None:
+        self.face = None
+        self._template = None
+        self._since_detect = 0
+
+    def _small(self, gray: np.ndarray) -> np.ndarray:
+        if self.track_scale >= 1.0:
+            return gray
+        return cv2.resize(gray, None, fx=self.track_scale, fy=self.track_scale, interpolation=cv2.INTER_AREA)
+
+    def _set_template(self, small: np.ndarray, face: Rect) -> None:
+        s = self.track_scale
+        x, y, w, h = (int(v * s) for v in face)
+        patch = small[max(0, y) : y + h, max(0, x) : x + w]
+        self._template = patch.copy() if patch.size and min(patch.shape) >= 8 else None
+
+    def _track(self, small: np.ndarray) -> Tuple[Optional[Rect], float]:
+        if self.face is None or self._template is None:
+            return None, 0.0
+        s = self.track_scale
+        th, tw = self._template.shape[:2]
+        x, y = int(self.face[0] * s), int(self.face[1] * s)
+        mx, my = int(tw * self.search_margin), int(th * self.search_margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        x1, y1 = min(small.shape[1], x + tw + mx), min(small.shape[0], y + th + my)
+        window = small[y0:y1, x0:x1]
+        if window.shape[0] < th or window.shape[1] < tw:
+            return None, 0.0
+        res = cv2.matchTemplate(window, self._template, cv2.TM_CCOEFF_NORMED)
+        _, score, _, loc = cv2.minMaxLoc(res)
+        _, _, w, h = self.face
+        return (int((x0 + loc[0]) / s), int((y0 + loc[1]) / s), w, h), float(score)
+
+    def update(self, gray: np.ndarray) -> Tuple[Optional[Rect], dict[str, Any]]:
+        """Return the face box for this frame and {"mode": detect|track|lost, "score", "ms"}."""
+        t0 = time.perf_counter()
+        small = self._small(gray)
+        info: dict[str, Any] = {"mode": "track", "score": None}
+
+        face: Optional[Rect] = None
+        if self.face is not None and self._since_detect < self.detect_every:
+            face, score = self._track(small)
+            info["score"] = round(score, 3)
+            if face is not None and score < self.min_score:
+                face = None
+
+        if face is None:
+            info["mode"] = "detect"
+            face, _ = detect_face(gray, get_cascade())
+            self.detections += 1
+            self._since_detect = 0
+            if face is not None:
+                self._set_template(small, face)
+        else:
+            self.tracked += 1
+            self._since_detect += 1
+
+        if face is None:
+            info["mode"] = "lost"
+            self.reset()
+        else:
+            self.face = face
+        info["ms"] = round((time.perf_counter() - t0) * 1000, 2)
+        return face, info
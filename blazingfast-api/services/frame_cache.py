@@ -0,0 +1,122 @@
+"""
+Content-addressed cache of prepared try-on frames.
+
+Key: digest of the uploaded image bytes + output width/height + flip + detector settings.
+Value: the resized BGR frame, the detected face rect (or None) and the detection report.
+Repeat submissions of the same selfie (user flipping through presets) skip decode, resize
+and Haar detection entirely.
+
+Memory tier: LRU bounded by AR_FRAME_CACHE_MB (0 disables). Optional disk tier shared by
+all AR workers on the host: set AR_FRAME_CACHE_DIR (capped by AR_FRAME_CACHE_DISK_MB).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional, Tuple
+
+import numpy as np
+
+from services.lru_cache import ByteBudgetLRU, DiskCacheTier
+
+AR_FRAME_CACHE_MB = float(os.getenv("AR_FRAME_CACHE_MB", "128"))
+AR_FRAME_CACHE_DIR = os.getenv("AR_FRAME_CACHE_DIR", "")
+AR_FRAME_CACHE_DISK_MB = float(os.getenv("AR_FRAME_CACHE_DISK_MB", "512"))
+
+Rect = Tuple[int, int, int, int]
+
+
+@dataclass
+class PreparedFrame:
+    frame_bgr: np.ndarray  # read-only: shared between requests
+    face: Optional[Rect]
+    detection: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.frame_bgr.nbytes) + 512
+
+
+def image_digest(image_bytes: bytes) -> str:
+    """Content hash of an upload (BLAKE2b-160, hex)."""
+    return hashlib.blake2b(image_bytes, digest_size=20).hexdigest()
+
+
+def _pack(p: PreparedFrame) -> bytes:
+    header = json.dumps(
+        {
+            "shape": list(p.frame_bgr.shape),
+            "dtype": str(p.frame_bgr.dtype),
+            "face": list(p.face) if p.face is not None else None,
+            "detection": p.detection,
+        }
+    ).encode("utf-8")
+    return struct.pack("<I", len(header)) + header + np.ascontiguousarray(p.frame_bgr).tobytes()
+
+
+def _unpack(data: bytes) -> PreparedFrame:
+    (hlen,) = struct.unpack_from("<I", data)
+    header = json.loads(data[4 : 4 + hlen])
+    frame = np.frombuffer(data, dtype=np.dtype(header["dtype"]), offset=4 + hlen).reshape(header["shape"])
+    face = tuple(int(v) for v in header["face"]) if header["face"] is not None else None
+    return PreparedFrame(frame, face, header.get("detection") or {})  # type: ignore[arg-type]
+
+
+class FrameCache:
+    def __init__(
+        self,
+        max_bytes: int = int(AR_FRAME_CACHE_MB * 1024 * 1024),
+        directory: str = AR_FRAME_CACHE_DIR,
+        disk_max_bytes: int = int(AR_FRAME_CACHE_DISK_MB * 1024 * 1024),
+    ):
+        self.memory: ByteBudgetLRU[PreparedFrame] = ByteBudgetLRU(max_bytes, lambda p: p.nbytes)
+        self.disk: Optional[DiskCacheTier] = (
+            DiskCacheTier(directory, disk_max_bytes, suffix=".frame") if directory else None
+        )
+
+    def get(self, key: str) -> Optional[PreparedFrame]:
+        hit = self.memory.get(key)
+        if hit is not None or self.disk is None:
+            return hit
+        data = self.disk.get(key)
+        if data is None:
+            return None
+        try:
+            hit = _unpack(data)
+        except (ValueError, KeyError, struct.error):
+            return None
+        self.memory.put(key, hit)
+        return hit
+
+    def put(self, key: str, prepared: PreparedFrame) -> None:
+        prepared.frame_bgr.setflags(write=False)
+        self.memory.put(key, prepared)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, _pack(prepared))
+            except OSError:
+                pass  # disk tier is best effort
+
+    def stats(self) -> dict[str, Any]:
+        out: dict[str, Any] = {"memory": self.memory.stats()}
+        if self.disk is not None:
+            out["disk"] = self.disk.stats()
+        return out
+
+
+_frame_cache: Optional[FrameCache] = None
+_frame_cache_lock = threading.Lock()
+
+
+def get_frame_cache() -> FrameCache:
+    """Per-process cache singleton (disk tier, if configured, is shared between processes)."""
+    global _frame_cache
+    with _frame_cache_lock:
+        if _frame_cache is None:
+            _frame_cache = FrameCache()
+        return _frame_cache
@@ -0,0 +1,165 @@
+"""
+In-memory cache of decoded jewellery preset overlays (BGRA) and pre-resized, premultiplied variants.
+
+Entries are keyed by preset id + PNG mtime, so editing a file under assets/jewellery/
+invalidates it on the next lookup. Resized overlays are quantised to AR_OVERLAY_SIZE_STEP
+pixels so nearby face widths share one ready-made array. The whole cache is LRU with a
+byte budget (AR_OVERLAY_CACHE_MB), evicted like the other AR caches (lru_cache.ByteBudgetLRU).
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from services.ar_jewelry import (
+    load_jewellery_presets,
+    load_overlay_bgra,
+    premultiply_overlay,
+    resolve_jewellery_path,
+)
+from services.lru_cache import ByteBudgetLRU
+
+AR_OVERLAY_CACHE_MB = float(os.getenv("AR_OVERLAY_CACHE_MB", "64"))
+AR_OVERLAY_SIZE_STEP = int(os.getenv("AR_OVERLAY_SIZE_STEP", "8"))
+
+# Face reference sizes (px, in the default 720x640 frame) pre-scaled at worker start.
+DEFAULT_PRESCALE_REFS: Tuple[int, ...] = tuple(range(96, 321, 32))
+
+# (preset id, mtime_ns, width, height, premultiplied); width == height == 0 is the decoded original.
+_Key = Tuple[str, int, int, int, bool]
+
+
+def _quantise(v: int, step: int) -> int:
+    if step <= 1:
+        return max(1, v)
+    return max(step, int(round(v / step)) * step)
+
+
+class OverlayCache:
+    """LRU cache of preset overlays with hit/miss counters and a memory cap."""
+
+    def __init__(self, max_bytes: int = int(AR_OVERLAY_CACHE_MB * 1024 * 1024), size_step: int = AR_OVERLAY_SIZE_STEP):
+        self.size_step = max(1, int(size_step))
+        self.memory: ByteBudgetLRU[np.ndarray] = ByteBudgetLRU(max_bytes, lambda a: a.nbytes)
+
+    @property
+    def max_bytes(self) -> int:
+        return self.memory.max_bytes
+
+    def _lookup(self, key: _Key) -> Optional[np.ndarray]:
+        return self.memory.get(key)
+
+    def _store(self, key: _Key, arr: np.ndarray) -> None:
+        arr.setflags(write=False)  # shared between requests: never blend into it
+        self.memory.put(key, arr)
+
+    def _preset_source(self, jid: str) -> Tuple[Any, int]:
+        presets = load_jewellery_presets()
+        if jid not in presets:
+            raise ValueError(f"Unknown jewellery preset: {jid}")
+        path = resolve_jewellery_path(presets[jid]["path"])
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Overlay image not found: {path}") from None
+        return path, mtime
+
+    def get_base(self, jid: str) -> np.ndarray:
+        """Decoded full-size BGRA overlay for a preset (read-only array)."""
+        path, mtime = self._preset_source(jid)
+        return self._get_base(jid, path, mtime)
+
+    def _get_base(self, jid: str, path: Any, mtime: int) -> np.ndarray:
+        key = (jid, mtime, 0, 0, False)
+        arr = self._lookup(key)
+        if arr is None:
+            arr = load_overlay_bgra(path)
+            self._store(key, arr)
+        return arr
+
+    def get_scaled(self, jid: str, fw: int, fh: int) -> np.ndarray:
+        """
+        Overlay resized to (fw, fh) rounded to size_step pixels.
+
+        The returned array may differ from the requested size by up to size_step / 2 px.
+        """
+        return self._get_scaled(jid, fw, fh, premultiplied=False)
+
+    def get_premultiplied(self, jid: str, fw: int, fh: int) -> np.ndarray:
+        """Like get_scaled, in ar_jewelry.premultiply_overlay form (what compose blends with)."""
+        return self._get_scaled(jid, fw, fh, premultiplied=True)
+
+    def _get_scaled(self, jid: str, fw: int, fh: int, premultiplied: bool) -> np.ndarray:
+        path, mtime = self._preset_source(jid)
+        qw, qh = _quantise(fw, self.size_step), _quantise(fh, self.size_step)
+        key = (jid, mtime, qw, qh, premultiplied)
+        arr = self._lookup(key)
+        if arr is None:
+            base = self._get_base(jid, path, mtime)
+            arr = cv2.resize(base, (qw, qh))
+            if premultiplied:
+                arr = premultiply_overlay(arr)
+            self._store(key, arr)
+        return arr
+
+    def prescale(self, jid: str, dw: float, dh: float, refs: Iterable[int] = DEFAULT_PRESCALE_REFS) -> None:
+        """Build the pyramid of overlay sizes for common face reference sizes."""
+        for ref in refs:
+            fw, fh = int(ref * dw), int(ref * dh)
+            if fw >= 1 and fh >= 1:
+                self.get_premultiplied(jid, fw, fh)
+
+    def prescale_presets(self, refs: Iterable[int] = DEFAULT_PRESCALE_REFS) -> None:
+        """Decode every preset in jewellery.json and pre-scale it with its dw/dh."""
+        refs = tuple(refs)
+        for jid, cfg in load_jewellery_presets().items():
+            try:
+                self.prescale(jid, float(cfg.get("dw", 1.0)), float(cfg.get("dh", 1.0)), refs)
+            except (KeyError, FileNotFoundError, ValueError):
+                continue
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {**self.memory.stats(), "size_step": self.size_step}
+
+
+class PresetOverlay:
+    """
+    Lazy handle to a cached preset overlay, accepted wherever ar_jewelry takes an overlay.
+
+    place_overlay calls `premultiplied(fw, fh)` instead of resizing the original per request.
+    """
+
+    def __init__(self, jid: str, cache: Optional[OverlayCache] = None):
+        self.jid = jid
+        self.cache = cache or get_overlay_cache()
+
+    def resized(self, fw: int, fh: int) -> np.ndarray:
+        return self.cache.get_scaled(self.jid, fw, fh)
+
+    def premultiplied(self, fw: int, fh: int) -> np.ndarray:
+        return self.cache.get_premultiplied(self.jid, fw, fh)
+
+    @property
+    def base(self) -> np.ndarray:
+        return self.cache.get_base(self.jid)
+
+
+_overlay_cache: Optional[OverlayCache] = None
+_overlay_cache_lock = threading.Lock()
+
+
+def get_overlay_cache() -> OverlayCache:
+    """Per-process cache singleton (each AR pool worker has its own)."""
+    global _overlay_cache
+    with _overlay_cache_lock:
+        if _overlay_cache is None:
+            _overlay_cache = OverlayCache()
+        return _overlay_cache
@@ -0,0 +1,234 @@
+"""
+Change-data capture for the Qdrant index over Postgres LISTEN/NOTIFY (qdrant_cdc_worker.py).
+
+Writes that bypass the API (Supabase dashboard, SQL scripts such as update_db.py) never reach
+the session events of services/qdrant_indexer.py. install_triggers() adds an AFTER INSERT /
+UPDATE / DELETE row trigger to each indexed table that sends the table name and the row's
+primary key with pg_notify. Postgres delivers notifications only when the writing transaction
+commits, and folds identical ones sent by the same transaction.
+
+CDCWorker LISTENs on a dedicated autocommit connection and feeds the keys to a
+WriteThroughIndexer, which batches them over QDRANT_INDEX_DELAY_SECONDS, upserts rows that
+exist and deletes points of rows that are gone. Notifications sent while nobody listens are
+lost, so after every (re)connect, once LISTEN is active, the worker catches up with an
+incremental QdrantService.sync_table per table: rows whose updated_at passed the stored
+watermark are re-embedded and points of deleted rows removed. Connection errors reconnect
+with exponential backoff; an idle connection is pinged so silent drops are noticed.
+
+The API's own writes fire the triggers too, so with the worker running the API can set
+QDRANT_INDEX_ON_WRITE=0. The worker replaces the scheduled Lambda sync, which is disabled
+(QDRANT_LAMBDA_SYNC_ENABLED): the Lambda embeds differently and must not write the same
+collections.
+
+Configuration (environment):
+- QDRANT_CDC_CHANNEL: notification channel (default "qdrant_index")
+- QDRANT_CDC_PING_SECONDS: idle time before the listening connection is checked (default 30)
+- QDRANT_CDC_RECONNECT_MAX_SECONDS: upper bound of the reconnect backoff (default 60)
+- QDRANT_INDEX_DELAY_SECONDS: batching window (services/qdrant_indexer.py)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import select
+import threading
+import time
+from typing import Any, Callable, Iterable, List, Optional, Tuple, Type
+
+from psycopg2 import sql
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+
+from services.qdrant_indexer import INDEX_DELAY_SECONDS, WriteThroughIndexer
+
+CDC_CHANNEL = os.getenv("QDRANT_CDC_CHANNEL", "qdrant_index")
+CDC_PING_SECONDS = float(os.getenv("QDRANT_CDC_PING_SECONDS", "30"))
+CDC_RECONNECT_MAX_SECONDS = float(os.getenv("QDRANT_CDC_RECONNECT_MAX_SECONDS", "60"))
+
+TRIGGER_NAME = "qdrant_notify_change"
+
+# Trigger arguments: primary-key column, channel. RETURN NULL is fine for AFTER triggers.
+_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION qdrant_notify_change() RETURNS trigger AS $$
+DECLARE
+    changed jsonb;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := to_jsonb(OLD);
+    ELSE
+        changed := to_jsonb(NEW);
+    END IF;
+    PERFORM pg_notify(
+        TG_ARGV[1],
+        json_build_object('table', TG_TABLE_NAME, 'pk', changed ->> TG_ARGV[0], 'op', TG_OP)::text
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def text_columns(model: Type[Any]) -> List[str]:
+    """Text-like columns of a model, the fields sync_all_tables_to_qdrant.py embeds."""
+    return [
+        c.name
+        for c in inspect(model).columns
+        if any(t in str(c.type).lower() for t in ("varchar", "text", "char", "string"))
+    ]
+
+
+def install_triggers(conn: Any, models: Iterable[Type[Any]], channel: str = CDC_CHANNEL) -> None:
+    """Create (or replace) the notify function and one trigger per table. Idempotent."""
+    with conn.cursor() as cur:
+        cur.execute(_FUNCTION_SQL)
+        for model in models:
+            table = sql.Identifier(model.__tablename__)
+            cur.execute(sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(sql.Identifier(TRIGGER_NAME), table))
+            cur.execute(
+                sql.SQL(
+                    "CREATE TRIGGER {} AFTER INSERT OR UPDATE OR DELETE ON {} "
+                    "FOR EACH ROW EXECUTE FUNCTION qdrant_notify_change({}, {})"
+                ).format(
+                    sql.Identifier(TRIGGER_NAME),
+                    table,
+                    sql.Literal(inspect(model).primary_key[0].name),
+                    sql.Literal(channel),
+                )
+            )
+    conn.commit()
+
+
+def uninstall_triggers(conn: Any, models: Iterable[Type[Any]]) -> None:
+    """Drop the triggers and the notify function."""
+    with conn.cursor() as cur:
+        for model in models:
+            cur.execute(
+                sql.SQL("DROP TRIGGER IF EXISTS {} ON {}").format(
+                    sql.Identifier(TRIGGER_NAME), sql.Identifier(model.__tablename__)
+                )
+            )
+        cur.execute("DROP FUNCTION IF EXISTS qdrant_notify_change()")
+    conn.commit()
+
+
+class CDCWorker:
+    """
+    LISTEN loop feeding a WriteThroughIndexer. `connect` returns a new psycopg2 connection;
+    run() blocks until stop() is called (e.g. from a signal handler).
+    """
+
+    def __init__(
+        self,
+        models: Iterable[Type[Any]],
+        session_factory: Callable[[], Session],
+        connect: Callable[[], Any],
+        service_factory: Optional[Callable[[], Any]] = None,
+        channel: str = CDC_CHANNEL,
+        delay: float = INDEX_DELAY_SECONDS,
+        ping_seconds: float = CDC_PING_SECONDS,
+        reconnect_max_seconds: float = CDC_RECONNECT_MAX_SECONDS,
+    ):
+        self.models = {m.__tablename__: m for m in models}
+        self._pk_types = {name: inspect(m).primary_key[0].type.python_type for name, m in self.models.items()}
+        self._session_factory = session_factory
+        self._connect = connect
+        self._service_factory = service_factory
+        self._service = None
+        self.channel = channel
+        self.ping_seconds = ping_seconds
+        self.reconnect_max_seconds = reconnect_max_seconds
+        self.indexer = WriteThroughIndexer(self.models.values(), session_factory, self._get_service, delay)
+        self._stop = threading.Event()
+        self.stats = {"connects": 0, "notifications": 0, "ignored": 0, "catch_ups": 0}
+
+    def _get_service(self):
+        if self._service is None:
+            if self._service_factory is None:
+                from services.qdrant_service import QdrantService
+
+                self._service_factory = QdrantService
+            self._service = self._service_factory()
+        return self._service
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run(self) -> None:
+        """Listen, catch up, index notifications; reconnect with backoff on any failure."""
+        self.indexer.start(listen=False)
+        backoff = 1.0
+        try:
+            while not self._stop.is_set():
+                conn = None
+                try:
+                    conn = self._connect()
+                    conn.autocommit = True
+                    with conn.cursor() as cur:
+                        cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+                    self.stats["connects"] += 1
+                    print(f"Listening on channel {self.channel}")
+                    # LISTEN is active first, so nothing committed during the scan is missed
+                    self.catch_up()
+                    backoff = 1.0
+                    self._listen(conn)
+                except Exception as e:
+                    print(f"CDC connection failed ({type(e).__name__}: {e}); reconnecting in {backoff:g}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, self.reconnect_max_seconds)
+                finally:
+                    if conn is not None:
+                        try:
+                            conn.close()
+                        except Exception:
+                            pass
+        finally:
+            self.indexer.stop()
+            print(f"CDC worker stopped: {self.stats} indexer {self.indexer.stats}")
+
+    def catch_up(self) -> None:
+        """Incremental sync of every table (first sync or schema change: full rebuild)."""
+        service = self._get_service()
+        db = self._session_factory()
+        try:
+            for model in self.models.values():
+                text_fields = service.synced_text_fields(model)
+                if text_fields is None:
+                    text_fields = text_columns(model)
+                service.sync_table(db, model, text_fields=text_fields or None)
+        finally:
+            db.close()
+        self.stats["catch_ups"] += 1
+
+    def _listen(self, conn: Any) -> None:
+        last_seen = time.monotonic()
+        while not self._stop.is_set():
+            # Short timeout so stop() is noticed quickly
+            if select.select([conn], [], [], 1.0) == ([], [], []):
+                if time.monotonic() - last_seen >= self.ping_seconds:
+                    with conn.cursor() as cur:
+                        cur.execute("SELECT 1")
+                    last_seen = time.monotonic()
+                continue
+            last_seen = time.monotonic()
+            conn.poll()
+            keys = []
+            while conn.notifies:
+                key = self._parse(conn.notifies.pop(0).payload)
+                if key is not None:
+                    keys.append(key)
+            if keys:
+                self.indexer.enqueue(keys)
+
+    def _parse(self, payload: str) -> Optional[Tuple[str, Any]]:
+        """(table, primary key) from a trigger payload; None for anything unexpected."""
+        self.stats["notifications"] += 1
+        try:
+            data = json.loads(payload)
+            table, pk = data["table"], data["pk"]
+            if pk is None:  # key column missing from the row: str(None) would be a bogus key
+                raise ValueError("notification without a primary key")
+            return table, self._pk_types[table](pk)
+        except (ValueError, KeyError, TypeError):
+            self.stats["ignored"] += 1
+            return None
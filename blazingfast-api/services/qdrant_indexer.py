@@ -0,0 +1,224 @@
+"""
+Write-through Qdrant indexing for catalog writes (routes/product.py, routes/shop.py).
+
+SQLAlchemy session events record the primary keys of the rows a session inserts, updates or
+deletes in the indexed tables (after_flush) and hand them over once the transaction commits
+(after_commit; a rollback drops them). A background thread waits QDRANT_INDEX_DELAY_SECONDS
+after the first pending key, then takes every pending key at once, so rapid edits to the same
+row collapse into one entry. Each key is resolved against the database at that point: a row
+that still exists is re-embedded and upserted (QdrantService.upsert_rows), a missing one has
+its point deleted (delete_rows). The last committed state wins, whatever order commits
+arrived in.
+
+Only collections whose last sync used the same schema, text fields and embedding are written
+(QdrantService.synced_text_fields); others wait for the next sync. Failed batches are logged
+and dropped: the next incremental sync re-reads changed rows by updated_at and removes points
+of deleted rows, including rows deleted by database-side cascades that the ORM never sees.
+
+Configuration (environment):
+- QDRANT_INDEX_ON_WRITE: "0" turns write-through indexing off (default on when QDRANT_API_URL is set)
+- QDRANT_INDEX_DELAY_SECONDS: coalescing window before pending rows are indexed (default 1.0)
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+INDEX_ON_WRITE = os.getenv("QDRANT_INDEX_ON_WRITE", "1") != "0"
+INDEX_DELAY_SECONDS = float(os.getenv("QDRANT_INDEX_DELAY_SECONDS", "1.0"))
+
+_SESSION_KEY = "qdrant_index_keys"
+_QUERY_CHUNK = 500
+
+
+class WriteThroughIndexer:
+    """
+    Collects committed writes to `models` from sessions made by `session_factory` and indexes
+    them on a background thread. start() / stop() attach and detach the session events.
+    """
+
+    def __init__(
+        self,
+        models: Iterable[Type[Any]],
+        session_factory: Callable[[], Session],
+        service_factory: Optional[Callable[[], Any]] = None,
+        delay: float = INDEX_DELAY_SECONDS,
+    ):
+        self.models = {m.__tablename__: m for m in models}
+        self._pk_names = {name: inspect(m).primary_key[0].name for name, m in self.models.items()}
+        self._session_factory = session_factory
+        self._service_factory = service_factory
+        self._service = None
+        self.delay = max(0.0, float(delay))
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Set[Any]] = {}
+        self._first_at: Optional[float] = None
+        self._stopping = False
+        self._thread: Optional[threading.Thread] = None
+        self._listening = False
+        self.stats = {"enqueued": 0, "coalesced": 0, "batches": 0, "upserted": 0, "deleted": 0, "skipped": 0, "errors": 0}
+
+    # ------------------------------------------------------------------
+    # Session events (run in the thread that flushes / commits)
+    # ------------------------------------------------------------------
+
+    def _after_flush(self, session: Session, flush_context: Any) -> None:
+        keys: Set[Tuple[str, Any]] = session.info.setdefault(_SESSION_KEY, set())
+        dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+        for obj in (*session.new, *dirty, *session.deleted):
+            table = getattr(obj, "__tablename__", None)
+            if table in self.models:
+                pk = getattr(obj, self._pk_names[table], None)
+                if pk is not None:
+                    keys.add((table, pk))
+
+    def _after_commit(self, session: Session) -> None:
+        keys = session.info.pop(_SESSION_KEY, None)
+        if keys:
+            self.enqueue(keys)
+
+    def _after_rollback(self, session: Session) -> None:
+        session.info.pop(_SESSION_KEY, None)
+
+    def _listeners(self) -> List[Tuple[str, Callable[..., None]]]:
+        return [
+            ("after_flush", self._after_flush),
+            ("after_commit", self._after_commit),
+            ("after_rollback", self._after_rollback),
+        ]
+
+    # ------------------------------------------------------------------
+    # Queue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, keys: Iterable[Tuple[str, Any]]) -> None:
+        """Mark (table, primary key) pairs for indexing; keys already pending are coalesced."""
+        with self._cond:
+            for table, pk in keys:
+                bucket = self._pending.setdefault(table, set())
+                if pk in bucket:
+                    self.stats["coalesced"] += 1
+                bucket.add(pk)
+                self.stats["enqueued"] += 1
+            if self._pending and self._first_at is None:
+                self._first_at = time.monotonic()
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return sum(len(pks) for pks in self._pending.values())
+
+    def start(self, listen: bool = True) -> None:
+        """Start the indexing thread; listen=False skips the session events (keys come from enqueue)."""
+        if self._thread is not None:
+            return
+        self._listening = listen
+        for name, fn in self._listeners() if listen else []:
+            event.listen(self._session_factory, name, fn)
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="qdrant-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        """Detach from sessions, index what is pending right away and stop the thread."""
+        if self._thread is None:
+            return
+        for name, fn in self._listeners() if self._listening else []:
+            event.remove(self._session_factory, name, fn)
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending and not self._stopping:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                # Let edits arriving within the window join this batch
+                while not self._stopping:
+                    remaining = self._first_at + self.delay - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch, self._pending, self._first_at = self._pending, {}, None
+            self.index(batch)
+
+    # ------------------------------------------------------------------
+    # Indexing (background thread)
+    # ------------------------------------------------------------------
+
+    def _get_service(self):
+        if self._service is None:
+            if self._service_factory is None:
+                from services.qdrant_service import QdrantService
+
+                self._service_factory = QdrantService
+            self._service = self._service_factory()
+        return self._service
+
+    def index(self, batch: Dict[str, Set[Any]]) -> None:
+        """Upsert rows that exist and delete points of rows that do not, table by table."""
+        self.stats["batches"] += 1
+        db = self._session_factory()
+        try:
+            for table, pks in batch.items():
+                try:
+                    self._index_table(db, self.models[table], list(pks))
+                except Exception as e:
+                    self.stats["errors"] += 1
+                    print(f"Write-through indexing of {len(pks)} {table} rows failed: {e}")
+        finally:
+            db.close()
+
+    def _index_table(self, db: Session, model: Type[Any], pks: List[Any]) -> None:
+        service = self._get_service()
+        text_fields = service.synced_text_fields(model)
+        if text_fields is None:
+            self.stats["skipped"] += len(pks)
+            return
+        pk_name = self._pk_names[model.__tablename__]
+        rows = []
+        for i in range(0, len(pks), _QUERY_CHUNK):
+            rows.extend(db.query(model).filter(getattr(model, pk_name).in_(pks[i : i + _QUERY_CHUNK])).all())
+        found = {getattr(r, pk_name) for r in rows}
+        gone = [pk for pk in pks if pk not in found]
+        self.stats["upserted"] += service.upsert_rows(model, rows, text_fields=text_fields)
+        self.stats["deleted"] += service.delete_rows(model, gone)
+
+
+_indexer: Optional[WriteThroughIndexer] = None
+_indexer_lock = threading.Lock()
+
+
+def start_qdrant_indexer() -> Optional[WriteThroughIndexer]:
+    """Start write-through indexing of products and shops (FastAPI startup hook), if configured."""
+    global _indexer
+    if not INDEX_ON_WRITE or not os.getenv("QDRANT_API_URL"):
+        return None
+    from models import Product, Shop
+    from models.database import SessionLocal
+
+    with _indexer_lock:
+        if _indexer is None:
+            _indexer = WriteThroughIndexer([Product, Shop], SessionLocal)
+            _indexer.start()
+        return _indexer
+
+
+def stop_qdrant_indexer() -> None:
+    """Index pending rows and stop the indexer (FastAPI shutdown hook)."""
+    global _indexer
+    with _indexer_lock:
+        indexer, _indexer = _indexer, None
+    if indexer is not None:
+        indexer.stop()
@@ -1,18 +1,99 @@
+"""
+Qdrant sync and search for database tables.
+
+Sync modes (see sync_table):
+- full: embed every row into a new versioned collection and switch the alias to it (see
+  below). Used on the first sync, when the table schema / text fields / embedding changed, or
+  when forced.
+- incremental: only rows whose `updated_at` passed the stored high-water mark are embedded
+  and upserted; points of deleted rows are removed by an anti-join of point ids against the
+  table's primary keys. Tables without `updated_at` re-embed every row but keep the collection.
+
+Point ids are derived from the rows' primary keys (point_id), so upserts replace points in
+place and single rows can be upserted or deleted by key (upsert_rows / delete_rows). The per-table
+watermark (updated_at + primary key of the last synced row) and schema fingerprint are stored
+as points in a small state collection next to the data, so they cannot drift from the index.
+
+The state also records which embedding built the collection. The Lambda sync
+(external-services/) embeds differently (md5, 384 floats) and shares the collection names and
+state points, so a sync that finds another embedding there raises SyncConflictError instead
+of rebuilding over it; only an explicit full sync takes such a collection over.
+
+Zero-downtime rebuilds: the name searches use (`products`, `shops`) is a Qdrant alias. A full
+sync fills `{name}_v{n+1}`, checks that its point count matches the rows read, and only then
+moves the alias in one atomic request, so search_similar keeps answering from the previous
+version during the rebuild. A failed or short build is dropped and the alias is left alone.
+Old versions beyond QDRANT_KEEP_OLD_VERSIONS are deleted after the switch. A plain collection
+left by older syncs is replaced by the alias on the first full sync. Incremental syncs and
+upsert_rows / delete_rows write through the alias to the live version.
+
+Configuration (environment):
+- QDRANT_API_URL, QDRANT_API_KEY: Qdrant endpoint
+- QDRANT_SYNC_STATE_COLLECTION: collection holding the sync state (default "_sync_state")
+- QDRANT_SYNC_LAG_SECONDS: incremental syncs re-read rows updated this long before the
+  watermark, for transactions that committed after a newer row was synced (default 60)
+- QDRANT_KEEP_OLD_VERSIONS: previous versions kept after an alias switch, for rollback (default 1)
+"""
+
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
 import os
+import uuid
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 from sqlalchemy.orm import Session
-from sqlalchemy import inspect
+from sqlalchemy import inspect, tuple_
 import json
 import hashlib
+import re
 import numpy as np
-from typing import List, Dict, Any, Optional, Type
+from typing import List, Dict, Any, Callable, Optional, Sequence, Type
 from sqlalchemy.ext.declarative import DeclarativeMeta
 
+from services.sync_pipeline import ParallelUploader, PipelineStats, run_pipeline, stream_records
+from services.text_embedding import EMBEDDING_DIM, HashEmbedder
+
 # Load environment variables
 load_dotenv()
 
+SYNC_STATE_COLLECTION = os.getenv("QDRANT_SYNC_STATE_COLLECTION", "_sync_state")
+SYNC_LAG_SECONDS = float(os.getenv("QDRANT_SYNC_LAG_SECONDS", "60"))
+KEEP_OLD_VERSIONS = int(os.getenv("QDRANT_KEEP_OLD_VERSIONS", "1"))
+# Identifies the embedding in schema fingerprints; bump when _simple_text_embedding changes.
+EMBEDDING_KIND = "sha256-normal"
+
+
+class SyncConflictError(RuntimeError):
+    """The collection was built with another embedding (e.g. by the Lambda sync)."""
+
+
+def point_id(table_name: str, pk: Any) -> str:
+    """
+    Qdrant point id of a row: its UUID primary key as is, otherwise (int / text keys) a
+    uuid5 of table + key, so ids stay stable across syncs and never collide between tables.
+    """
+    if isinstance(pk, uuid.UUID):
+        return str(pk)
+    try:
+        return str(uuid.UUID(str(pk)))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant-row/{table_name}/{pk}"))
+
+
+# Never stored: deleting it with wait=true is the write barrier after wait=false upserts.
+_BARRIER_POINT_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "qdrant-sync/write-barrier"))
+
+
+def sync_state_point_id(collection_name: str) -> str:
+    """Id of a collection's point in the sync-state collection (shared with the Lambda sync)."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant-sync-state/{collection_name}"))
+
+
+def collection_version(alias: str, collection_name: str) -> Optional[int]:
+    """n for a versioned collection `{alias}_v{n}`, None for any other name."""
+    match = re.fullmatch(rf"{re.escape(alias)}_v(\d+)", collection_name)
+    return int(match.group(1)) if match else None
+
 class QdrantService:
     def __init__(self):
         """Initialize the Qdrant service with environment variables."""
@@ -29,7 +110,8 @@ class QdrantService:
         )
         
         # Vector dimension for our simple embedding approach
-        self.vector_size = 768  # Standard size compatible with many models
+        self.vector_size = EMBEDDING_DIM  # Standard size compatible with many models
+        self.embedder = HashEmbedder(self.vector_size)
         
     def _get_table_schema(self, model: Type[DeclarativeMeta]) -> Dict[str, str]:
         """Get the schema of a SQLAlchemy model."""
@@ -53,20 +135,11 @@ class QdrantService:
         This is a placeholder for sentence-transformers and should be replaced with
         a proper embedding model in production.
         """
-        # Create a deterministic hash-based embedding
-        hash_obj = hashlib.sha256(text.encode())
-        hash_bytes = hash_obj.digest()
-        
-        # Convert hash to a list of floats
-        np.random.seed(int.from_bytes(hash_bytes[:4], byteorder='big'))
-        embedding = np.random.normal(0, 1, self.vector_size).tolist()
-        
-        # Normalize the embedding
-        norm = np.linalg.norm(embedding)
-        if norm > 0:
-            embedding = [x / norm for x in embedding]
-            
-        return embedding
+        return self.embedder.embed(text).tolist()
+
+    def embed_texts(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed many texts at once: (len(texts), vector_size) float32 matrix, see services/text_embedding.py."""
+        return self.embedder.embed_batch(texts)
         
     def _prepare_payload(self, record: Dict[str, Any]) -> Dict[str, Any]:
         """Prepare the payload for Qdrant by handling non-serializable types."""
@@ -142,6 +215,141 @@ class QdrantService:
             )
             print(f"Created collection {collection_name}")
             
+    def _primary_key(self, model: Type[DeclarativeMeta]):
+        """The single primary-key column of a model (point ids are its values)."""
+        pk_columns = inspect(model).primary_key
+        if len(pk_columns) != 1:
+            raise ValueError(f"Table {model.__tablename__} needs a single-column primary key to sync")
+        return pk_columns[0]
+
+    def _upsert_dicts(
+        self,
+        collection_name: str,
+        table_name: str,
+        pk_name: str,
+        record_dicts: List[Dict[str, Any]],
+        batch_size: int = 100,
+        text_fields: Optional[List[str]] = None,
+        uploader: Optional[ParallelUploader] = None,
+    ) -> int:
+        """
+        Embed row dicts in batches and upsert them; point id from the primary key. With an
+        uploader the points are queued for parallel wait=false upserts, otherwise each batch
+        is written (and waited for) here. Returns rows processed.
+        """
+        for i in range(0, len(record_dicts), batch_size):
+            batch = record_dicts[i:i+batch_size]
+            
+            texts = []
+            for record_dict in batch:
+                # Filter fields for text embedding if specified
+                if text_fields:
+                    text_data = {k: v for k, v in record_dict.items() if k in text_fields and v is not None}
+                else:
+                    text_data = record_dict
+                texts.append(self._convert_to_text(text_data))
+            
+            # Embed the whole batch at once (one float32 matrix)
+            vectors = self.embed_texts(texts)
+            
+            points = [
+                models.PointStruct(
+                    id=point_id(table_name, record_dict[pk_name]),
+                    vector=vectors[idx].tolist(),
+                    payload=self._prepare_payload(record_dict)
+                )
+                for idx, record_dict in enumerate(batch)
+            ]
+            
+            # Upsert points to Qdrant
+            if uploader is not None:
+                uploader.add(points, [self._point_bytes(p.payload) for p in points])
+            else:
+                self.client.upsert(
+                    collection_name=collection_name,
+                    points=points
+                )
+        return len(record_dicts)
+
+    def _point_bytes(self, payload: Dict[str, Any]) -> int:
+        """Rough JSON size of a point: payload + ~20 characters per vector float + envelope."""
+        return len(json.dumps(payload)) + 20 * self.vector_size + 64
+
+    def _write_barrier(self, collection_name: str) -> None:
+        """
+        Wait until every earlier write to the collection is applied: Qdrant applies updates in
+        order, so a waited no-op after the wait=false upserts returns only once they are visible.
+        A filter selector reaches every shard.
+        """
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.FilterSelector(
+                filter=models.Filter(must=[models.HasIdCondition(has_id=[_BARRIER_POINT_ID])])
+            ),
+            wait=True,
+        )
+
+    def _upsert_records(
+        self,
+        collection_name: str,
+        model: Type[DeclarativeMeta],
+        records: List[Any],
+        batch_size: int = 100,
+        text_fields: Optional[List[str]] = None,
+    ) -> int:
+        """_upsert_dicts for ORM rows."""
+        columns = list(inspect(model).columns)
+        record_dicts = [{c.name: getattr(record, c.name) for c in columns} for record in records]
+        return self._upsert_dicts(
+            collection_name, model.__tablename__, self._primary_key(model).name, record_dicts, batch_size, text_fields
+        )
+
+    def _stream_to_collection(
+        self,
+        query: Any,
+        model: Type[DeclarativeMeta],
+        collection_name: str,
+        batch_size: int = 100,
+        text_fields: Optional[List[str]] = None,
+        on_chunk: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+    ) -> PipelineStats:
+        """
+        Stream a query's rows through a server-side cursor into the collection: chunks are read
+        in this thread, embedded on a consumer thread and upserted by a ParallelUploader
+        (services/sync_pipeline.py). Returns after the write barrier, so the collection shows
+        every row. on_chunk runs on the consumer after each chunk is queued for upload.
+        """
+        columns = list(inspect(model).columns)
+        pk_name = self._primary_key(model).name
+        uploader = ParallelUploader(
+            lambda points: self.client.upsert(collection_name=collection_name, points=points, wait=False)
+        )
+        processed = 0
+
+        def consume(chunk: List[Dict[str, Any]]) -> None:
+            nonlocal processed
+            processed += self._upsert_dicts(
+                collection_name, model.__tablename__, pk_name, chunk, batch_size, text_fields, uploader
+            )
+            if on_chunk is not None:
+                on_chunk(chunk)
+            print(f"Processed {processed} records")
+
+        try:
+            stats = run_pipeline(stream_records(query, columns), consume)
+        except BaseException:
+            # Keep the pipeline error (the root cause the caller cleans up after): an upload
+            # failure reported by close() here is at most a consequence of it.
+            try:
+                uploader.close()
+            except Exception as e:
+                print(f"Upload to {collection_name} failed as well: {e}")
+            raise
+        uploader.close()
+        self._write_barrier(collection_name)
+        stats.extra["upload"] = uploader.summary()
+        return stats
+
     def push_table_to_qdrant(
         self, 
         db: Session, 
@@ -160,66 +368,368 @@ class QdrantService:
             collection_name: Name of the Qdrant collection (defaults to model's __tablename__)
             batch_size: Number of records to process in each batch
             text_fields: List of fields to use for generating embeddings (defaults to all fields)
+            recreate: Rebuild into a new version and switch the alias (see rebuild_collection)
         """
         # Get collection name from model if not provided
         if not collection_name:
             collection_name = model.__tablename__
             
-        # Create collection if it doesn't exist, or recreate if specified
-        self.create_collection(collection_name, recreate=recreate)
-        
-        # Get table schema
-        schema = self._get_table_schema(model)
-        
-        # Query all records from the table
-        records = db.query(model).all()
+        # Stream the table in chunks (flat memory); upserts overlap with the next read
+        def fill(target: str) -> PipelineStats:
+            return self._stream_to_collection(db.query(model), model, target, batch_size, text_fields)
+
+        if recreate:
+            stats = self.rebuild_collection(collection_name, fill)
+        else:
+            # Create collection if it doesn't exist
+            self.create_collection(collection_name)
+            stats = fill(collection_name)
         
-        if not records:
+        if not stats.rows:
             print(f"No records found in table {model.__tablename__}")
             return
             
-        # Process records in batches
-        total_records = len(records)
-        for i in range(0, total_records, batch_size):
-            batch = records[i:i+batch_size]
-            
-            points = []
-            for idx, record in enumerate(batch):
-                # Convert SQLAlchemy model to dictionary
-                record_dict = {c.name: getattr(record, c.name) for c in inspect(model).columns}
-                
-                # Filter fields for text embedding if specified
-                if text_fields:
-                    text_data = {k: v for k, v in record_dict.items() if k in text_fields and v is not None}
+        print(f"Successfully pushed {stats.rows} records to collection {collection_name} {stats.summary()}")
+
+    def upsert_rows(
+        self,
+        model: Type[DeclarativeMeta],
+        rows: List[Any],
+        collection_name: Optional[str] = None,
+        text_fields: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Embed and upsert a few ORM rows in place (e.g. right after a write); each replaces the
+        point with its primary key. Does nothing if the collection was never synced.
+        """
+        collection_name = collection_name or model.__tablename__
+        if not rows or not self._collection_exists(collection_name):
+            return 0
+        return self._upsert_records(collection_name, model, rows, len(rows), text_fields)
+
+    def delete_rows(
+        self,
+        model: Type[DeclarativeMeta],
+        pks: Sequence[Any],
+        collection_name: Optional[str] = None,
+    ) -> int:
+        """Delete the points of rows by primary key; missing points are ignored."""
+        collection_name = collection_name or model.__tablename__
+        if not pks or not self._collection_exists(collection_name):
+            return 0
+        self.client.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=[point_id(model.__tablename__, pk) for pk in pks]),
+        )
+        return len(pks)
+
+    # ------------------------------------------------------------------
+    # Versioned collections behind an alias
+    # ------------------------------------------------------------------
+
+    def get_alias_target(self, alias: str) -> Optional[str]:
+        """Collection an alias points to, or None if there is no such alias."""
+        for a in self.client.get_aliases().aliases:
+            if a.alias_name == alias:
+                return a.collection_name
+        return None
+
+    def list_versions(self, alias: str) -> Dict[int, str]:
+        """Versioned collections of an alias: {n: "{alias}_v{n}"}."""
+        versions = {}
+        for c in self.client.get_collections().collections:
+            n = collection_version(alias, c.name)
+            if n is not None:
+                versions[n] = c.name
+        return versions
+
+    def publish_version(self, alias: str, collection_name: str, expected_points: int) -> Optional[str]:
+        """
+        Point `alias` at a freshly built collection once it holds exactly expected_points, in
+        one atomic alias update. Raises RuntimeError on a count mismatch (the alias is not
+        touched). Returns the collection the alias pointed to before, if any.
+        """
+        count = self.client.count(collection_name=collection_name, exact=True).count
+        if count != expected_points:
+            raise RuntimeError(
+                f"Collection {collection_name} has {count} points, expected {expected_points}; alias {alias} not switched"
+            )
+        previous = self.get_alias_target(alias)
+        if previous is None and self._collection_exists(alias):
+            # A plain collection from before versioning holds the name; it has to go first.
+            # Not atomic: searches on `alias` fail until the alias below exists (one-off migration).
+            print(f"Replacing unversioned collection {alias} with an alias")
+            self.client.delete_collection(collection_name=alias)
+        actions: List[Any] = []
+        if previous is not None:
+            actions.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+        actions.append(
+            models.CreateAliasOperation(
+                create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)
+            )
+        )
+        self.client.update_collection_aliases(change_aliases_operations=actions)
+        print(f"Alias {alias} -> {collection_name} ({count} points)")
+        return previous
+
+    def drop_old_versions(self, alias: str, keep: int = KEEP_OLD_VERSIONS) -> List[str]:
+        """
+        Delete versions older than the alias target except the newest `keep` of them (failed
+        builds included). Newer versions are left alone: another rebuild may be filling them.
+        """
+        live = self.get_alias_target(alias)
+        live_version = collection_version(alias, live) if live else None
+        if live_version is None:
+            return []
+        older = sorted((n for n in self.list_versions(alias) if n < live_version), reverse=True)
+        dropped = []
+        for n in older[max(0, keep):]:
+            name = f"{alias}_v{n}"
+            self.client.delete_collection(collection_name=name)
+            dropped.append(name)
+        if dropped:
+            print(f"Dropped old versions of {alias}: {', '.join(dropped)}")
+        return dropped
+
+    def rebuild_collection(self, alias: str, fill: Callable[[str], PipelineStats]) -> PipelineStats:
+        """
+        Build `{alias}_v{n+1}` with fill(collection_name), publish it under the alias and drop
+        old versions. Searches keep using the current version until the switch; if fill or the
+        count check fails, the new collection is deleted and the error re-raised.
+        """
+        target = f"{alias}_v{max(self.list_versions(alias), default=0) + 1}"
+        self.create_collection(target)
+        try:
+            stats = fill(target)
+            previous = self.publish_version(alias, target, stats.rows)
+        except BaseException:
+            self.client.delete_collection(collection_name=target)
+            raise
+        dropped = self.drop_old_versions(alias)
+        stats.extra["version"] = {"collection": target, "previous": previous, "dropped": dropped}
+        return stats
+
+    # ------------------------------------------------------------------
+    # Incremental sync
+    # ------------------------------------------------------------------
+
+    def _schema_fingerprint(self, model: Type[DeclarativeMeta], text_fields: Optional[List[str]]) -> str:
+        """Changes whenever existing points would embed or look differently: forces a full sync."""
+        raw = json.dumps(
+            {
+                "schema": self._get_table_schema(model),
+                "text_fields": sorted(text_fields or []),
+                "embedding": self._embedding_id(),
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+    def _embedding_id(self) -> str:
+        return f"{EMBEDDING_KIND}/{self.vector_size}"
+
+    def _foreign_embedding(self, collection_name: str, state: Optional[Dict[str, Any]]) -> Optional[str]:
+        """
+        Embedding of the existing index when it is not this service's, else None. Taken from the
+        sync state; states written before it was recorded fall back to the vector size.
+        """
+        if state and state.get("embedding"):
+            return None if state["embedding"] == self._embedding_id() else state["embedding"]
+        if not self._collection_exists(collection_name):
+            return None
+        size = getattr(self.client.get_collection(collection_name=collection_name).config.params.vectors, "size", None)
+        return None if size in (None, self.vector_size) else f"unknown/{size}"
+
+    def _collection_exists(self, collection_name: str) -> bool:
+        try:
+            self.client.get_collection(collection_name=collection_name)
+            return True
+        except Exception:
+            return False
+
+    def get_sync_state(self, collection_name: str) -> Optional[Dict[str, Any]]:
+        """Stored sync state of a collection, or None if it was never synced incrementally."""
+        if not self._collection_exists(SYNC_STATE_COLLECTION):
+            return None
+        found = self.client.retrieve(
+            collection_name=SYNC_STATE_COLLECTION,
+            ids=[sync_state_point_id(collection_name)],
+            with_payload=True,
+        )
+        return dict(found[0].payload) if found else None
+
+    def save_sync_state(self, collection_name: str, state: Dict[str, Any]) -> None:
+        if not self._collection_exists(SYNC_STATE_COLLECTION):
+            self.client.create_collection(
+                collection_name=SYNC_STATE_COLLECTION,
+                vectors_config=models.VectorParams(size=1, distance=models.Distance.DOT),
+            )
+        self.client.upsert(
+            collection_name=SYNC_STATE_COLLECTION,
+            points=[models.PointStruct(id=sync_state_point_id(collection_name), vector=[1.0], payload=state)],
+        )
+
+    def synced_text_fields(self, model: Type[DeclarativeMeta], collection_name: Optional[str] = None) -> Optional[List[str]]:
+        """
+        Text fields the collection was last synced with ([] = every field), or None when points
+        embedded now would not match it (never synced, other schema / embedding, or synced by
+        a version that did not record its fields). Write-through indexing only runs when set.
+        """
+        state = self.get_sync_state(collection_name or model.__tablename__)
+        if state is None or "text_fields" not in state or state.get("embedding", self._embedding_id()) != self._embedding_id():
+            return None
+        text_fields = list(state["text_fields"])
+        if state.get("schema") != self._schema_fingerprint(model, text_fields):
+            return None
+        return text_fields
+
+    def delete_missing_rows(
+        self, db: Session, model: Type[DeclarativeMeta], collection_name: str, page_size: int = 1000
+    ) -> int:
+        """
+        Anti-join, one page at a time: scroll the points (id + primary-key payload only), look
+        the page's keys up in the table with one IN query and delete the points whose row is
+        gone. Memory holds one page, not every key of the table or collection.
+        Returns points removed.
+        """
+        pk = self._primary_key(model)
+        table_name = model.__tablename__
+        removed = 0
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection_name,
+                limit=page_size,
+                offset=offset,
+                with_payload=[pk.name],
+                with_vectors=False,
+            )
+            stale: List[Any] = []
+            by_key: Dict[Any, Any] = {}
+            for p in points:
+                raw = (p.payload or {}).get(pk.name)
+                try:
+                    key = pk.type.python_type(raw) if raw is not None else None
+                except (TypeError, ValueError):
+                    key = None
+                # Points without a usable key, or ids from the old positional sync, go as well.
+                if key is None or str(p.id) != point_id(table_name, key):
+                    stale.append(p.id)
                 else:
-                    text_data = record_dict
-                
-                # Generate text for embedding
-                text = self._convert_to_text(text_data)
-                
-                # Generate simple embedding
-                embedding = self._simple_text_embedding(text)
-                
-                # Prepare payload
-                payload = self._prepare_payload(record_dict)
-                
-                # Create point
-                point = models.PointStruct(
-                    id=i + idx,
-                    vector=embedding,  # embedding is already a list
-                    payload=payload
+                    by_key[key] = p.id
+            if by_key:
+                found = {v for (v,) in db.query(pk).filter(pk.in_(list(by_key))).all()}
+                stale.extend(pid for key, pid in by_key.items() if key not in found)
+            if stale:
+                self.client.delete(
+                    collection_name=collection_name,
+                    points_selector=models.PointIdsList(points=stale),
                 )
-                points.append(point)
-            
-            # Upsert points to Qdrant
-            self.client.upsert(
-                collection_name=collection_name,
-                points=points
+                removed += len(stale)
+            if offset is None:
+                return removed
+
+    def sync_table(
+        self,
+        db: Session,
+        model: Type[DeclarativeMeta],
+        collection_name: Optional[str] = None,
+        batch_size: int = 100,
+        text_fields: Optional[List[str]] = None,
+        full: bool = False,
+        lag_seconds: float = SYNC_LAG_SECONDS,
+    ) -> Dict[str, Any]:
+        """
+        Sync a table incrementally when possible (see module docstring), full otherwise.
+        
+        Args:
+            full: Force a full rebuild even if the stored state is usable, or was written by
+                another embedding (raises SyncConflictError otherwise)
+            lag_seconds: How far before the watermark an incremental sync starts reading
+        
+        Returns:
+            Summary: {"collection", "mode", "reason", "upserted", "deleted", "watermark", "pipeline"};
+            after a full sync "pipeline" has a "version" entry (new collection, previous, dropped)
+        """
+        collection_name = collection_name or model.__tablename__
+        pk = self._primary_key(model)
+        ts_col = model.__table__.c.get("updated_at")
+        fingerprint = self._schema_fingerprint(model, text_fields)
+        state = None if full else self.get_sync_state(collection_name)
+        foreign = None if full else self._foreign_embedding(collection_name, state)
+        if foreign:
+            raise SyncConflictError(
+                f"Collection {collection_name} was built with embedding {foreign}, this sync uses "
+                f"{self._embedding_id()}; refusing to rebuild over it (run a full sync to take it over)"
             )
-            
-            print(f"Processed {min(i+batch_size, total_records)}/{total_records} records")
-            
-        print(f"Successfully pushed {total_records} records to collection {collection_name}")
+
+        if full:
+            mode, reason = "full", "forced"
+        elif state is None or not self._collection_exists(collection_name):
+            mode, reason = "full", "no previous sync"
+        elif state.get("schema") != fingerprint:
+            mode, reason = "full", "schema changed"
+        elif ts_col is None:
+            mode, reason = "rescan", "no updated_at column"
+        else:
+            mode, reason = "incremental", None
+
+        query = db.query(model)
+        if mode == "incremental" and state.get("updated_at"):
+            mark = datetime.fromisoformat(state["updated_at"])
+            if lag_seconds > 0:
+                query = query.filter(ts_col > mark - timedelta(seconds=lag_seconds))
+            else:
+                mark_pk = pk.type.python_type(state["pk"]) if state.get("pk") else None
+                query = query.filter(tuple_(ts_col, pk) > tuple_(mark, mark_pk))
+        if ts_col is not None:
+            query = query.order_by(ts_col, pk)
+
+        watermark = {"updated_at": state.get("updated_at"), "pk": state.get("pk")} if state and mode != "full" else {}
+
+        def advance_watermark(chunk: List[Dict[str, Any]]) -> None:
+            # Rows arrive ordered by (updated_at, pk): the chunk's last row is the newest.
+            nonlocal watermark
+            last_ts = chunk[-1][ts_col.name]
+            if not watermark.get("updated_at") or last_ts >= datetime.fromisoformat(watermark["updated_at"]):
+                watermark = {"updated_at": last_ts.isoformat(), "pk": str(chunk[-1][pk.name])}
+
+        def fill(target: str) -> PipelineStats:
+            return self._stream_to_collection(
+                query, model, target, batch_size, text_fields, advance_watermark if ts_col is not None else None
+            )
+
+        # Full syncs build a new version behind the alias; the others write through it
+        stats = self.rebuild_collection(collection_name, fill) if mode == "full" else fill(collection_name)
+        upserted = stats.rows
+        deleted = 0 if mode == "full" else self.delete_missing_rows(db, model, collection_name)
+        self.save_sync_state(
+            collection_name,
+            {
+                "table": model.__tablename__,
+                "schema": fingerprint,
+                "text_fields": sorted(text_fields or []),
+                "embedding": self._embedding_id(),
+                "updated_at": watermark.get("updated_at"),
+                "pk": watermark.get("pk"),
+                "synced_at": datetime.now(timezone.utc).isoformat(),
+                "mode": mode,
+                "collection": self.get_alias_target(collection_name) or collection_name,
+            },
+        )
+        print(
+            f"Synced {collection_name} ({mode}{f': {reason}' if reason else ''}): "
+            f"{upserted} upserted, {deleted} deleted"
+        )
+        return {
+            "collection": collection_name,
+            "mode": mode,
+            "reason": reason,
+            "upserted": upserted,
+            "deleted": deleted,
+            "watermark": watermark or None,
+            "pipeline": stats.summary(),
+        }
         
     def search_similar(
         self, 
@@ -231,7 +741,8 @@ class QdrantService:
         Search for similar records in Qdrant.
         
         Args:
-            collection_name: Name of the Qdrant collection
+            collection_name: Name of the Qdrant collection; for synced tables this is the alias
+                of the live version, so results stay complete while a rebuild runs
             query_text: Text to search for
             limit: Maximum number of results to return
             
@@ -0,0 +1,133 @@
+"""
+Content-addressed cache of finished try-on results (encoded image + response meta).
+
+Key: digest of the uploaded photo + overlay identity (preset id and PNG mtime, or digest of
+the uploaded overlay) + every compose parameter + detector settings. A hit is answered by
+the API process directly: no worker pool round-trip, no decode, no OpenCV.
+
+Memory tier: LRU bounded by AR_RESULT_CACHE_MB (0 disables). Optional disk tier shared by
+all API processes on the host: set AR_RESULT_CACHE_DIR (capped by AR_RESULT_CACHE_DISK_MB).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from services.ar_jewelry import detector_fingerprint
+from services.lru_cache import ByteBudgetLRU, DiskCacheTier
+
+AR_RESULT_CACHE_MB = float(os.getenv("AR_RESULT_CACHE_MB", "64"))
+AR_RESULT_CACHE_DIR = os.getenv("AR_RESULT_CACHE_DIR", "")
+AR_RESULT_CACHE_DISK_MB = float(os.getenv("AR_RESULT_CACHE_DISK_MB", "1024"))
+
+
+@dataclass
+class CachedResult:
+    body: bytes
+    media_type: str
+    meta: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + 512
+
+
+def result_key(image_digest: str, overlay_token: str, params: dict[str, Any]) -> str:
+    """Cache key for one compose request; params are the resolved placement + output options."""
+    raw = json.dumps(
+        {"image": image_digest, "overlay": overlay_token, "params": params, "detector": detector_fingerprint()},
+        sort_keys=True,
+    )
+    return hashlib.blake2b(raw.encode("utf-8"), digest_size=20).hexdigest()
+
+
+def _pack(r: CachedResult) -> bytes:
+    header = json.dumps({"media_type": r.media_type, "meta": r.meta}).encode("utf-8")
+    return struct.pack("<I", len(header)) + header + r.body
+
+
+def _unpack(data: bytes) -> CachedResult:
+    (hlen,) = struct.unpack_from("<I", data)
+    header = json.loads(data[4 : 4 + hlen])
+    return CachedResult(data[4 + hlen :], header["media_type"], header.get("meta") or {})
+
+
+class ResultCache:
+    def __init__(
+        self,
+        max_bytes: int = int(AR_RESULT_CACHE_MB * 1024 * 1024),
+        directory: str = AR_RESULT_CACHE_DIR,
+        disk_max_bytes: int = int(AR_RESULT_CACHE_DISK_MB * 1024 * 1024),
+    ):
+        self.memory: ByteBudgetLRU[CachedResult] = ByteBudgetLRU(max_bytes, lambda r: r.nbytes)
+        self.disk: Optional[DiskCacheTier] = (
+            DiskCacheTier(directory, disk_max_bytes, suffix=".result") if directory else None
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.memory.max_bytes > 0 or self.disk is not None
+
+    def _count(self, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[CachedResult]:
+        hit = self.memory.get(key)
+        if hit is None and self.disk is not None:
+            data = self.disk.get(key)
+            if data is not None:
+                try:
+                    hit = _unpack(data)
+                except (ValueError, KeyError, struct.error):
+                    hit = None
+                if hit is not None:
+                    self.memory.put(key, hit)
+        self._count(hit is not None)
+        return hit
+
+    def put(self, key: str, result: CachedResult) -> None:
+        self.memory.put(key, result)
+        if self.disk is not None:
+            try:
+                self.disk.put(key, _pack(result))
+            except OSError:
+                pass  # disk tier is best effort
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            out: dict[str, Any] = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+                "memory": self.memory.stats(),
+            }
+        if self.disk is not None:
+            out["disk"] = self.disk.stats()
+        return out
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Per-process cache singleton (disk tier, if configured, is shared between processes)."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
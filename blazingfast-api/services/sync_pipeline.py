@@ -0,0 +1,224 @@
+"""
+Streaming extraction + producer/consumer pipeline for table syncs (services/qdrant_service.py).
+
+Rows are read from Postgres in fixed-size chunks through a server-side cursor (SQLAlchemy
+yield_per → psycopg2 named cursor), so memory holds a few chunks no matter how large the
+table is. The reading thread (the one owning the DB session) hands chunks to one consumer
+thread over a bounded queue; the consumer embeds and upserts them to Qdrant while the next
+chunk is being read. A full queue blocks the reader, which keeps memory flat when Qdrant is
+the slower side.
+
+The consumer hands points to a ParallelUploader: points are grouped into requests of about
+QDRANT_UPSERT_TARGET_BYTES (so rows with big payloads make smaller batches) and up to
+QDRANT_UPSERT_IN_FLIGHT requests run at once over the client's pooled connections, as
+wait=false upserts. The caller ends with one waited write (the consistency barrier) before
+reading the collection back.
+
+Configuration (environment):
+- QDRANT_SYNC_CHUNK_ROWS: rows per chunk read from the cursor (default 500)
+- QDRANT_SYNC_QUEUE_DEPTH: chunks allowed to wait for the consumer (default 2)
+- QDRANT_UPSERT_IN_FLIGHT: upsert requests in flight at once (default 4)
+- QDRANT_UPSERT_TARGET_BYTES: approximate JSON size of one upsert request (default 4 MiB)
+- QDRANT_UPSERT_MAX_POINTS: upper bound on points per request (default 1000)
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+from sqlalchemy.orm import Query
+
+SYNC_CHUNK_ROWS = int(os.getenv("QDRANT_SYNC_CHUNK_ROWS", "500"))
+SYNC_QUEUE_DEPTH = int(os.getenv("QDRANT_SYNC_QUEUE_DEPTH", "2"))
+UPSERT_IN_FLIGHT = int(os.getenv("QDRANT_UPSERT_IN_FLIGHT", "4"))
+UPSERT_TARGET_BYTES = int(os.getenv("QDRANT_UPSERT_TARGET_BYTES", str(4 * 1024 * 1024)))
+UPSERT_MAX_POINTS = int(os.getenv("QDRANT_UPSERT_MAX_POINTS", "1000"))
+
+_DONE = object()
+
+
+def stream_records(query: Query, columns: Sequence[Any], chunk_rows: int = SYNC_CHUNK_ROWS) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield lists of up to chunk_rows column dicts from an ORM query, read with yield_per.
+    ORM objects are turned into plain dicts here, in the session's thread, and dropped.
+    """
+    chunk: List[Dict[str, Any]] = []
+    for row in query.yield_per(chunk_rows):
+        chunk.append({c.name: getattr(row, c.name) for c in columns})
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+@dataclass
+class PipelineStats:
+    chunks: int = 0
+    rows: int = 0
+    read_seconds: float = 0.0  # producer time spent reading (not waiting on the queue)
+    consume_seconds: float = 0.0
+    wall_seconds: float = 0.0
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def summary(self) -> Dict[str, Any]:
+        overlap = self.read_seconds + self.consume_seconds - self.wall_seconds
+        return {
+            "chunks": self.chunks,
+            "rows": self.rows,
+            "read_s": round(self.read_seconds, 3),
+            "consume_s": round(self.consume_seconds, 3),
+            "wall_s": round(self.wall_seconds, 3),
+            "overlap_s": round(max(0.0, overlap), 3),
+            "rows_per_s": round(self.rows / self.wall_seconds, 1) if self.wall_seconds else None,
+            **self.extra,
+        }
+
+
+def run_pipeline(
+    chunks: Iterable[List[Any]],
+    consume: Callable[[List[Any]], None],
+    depth: int = SYNC_QUEUE_DEPTH,
+) -> PipelineStats:
+    """
+    Iterate `chunks` in the calling thread and run `consume(chunk)` on a worker thread, with
+    at most `depth` chunks queued between them. The first exception on either side stops the
+    pipeline and is re-raised here.
+    """
+    stats = PipelineStats()
+    q: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, depth))
+    failure: List[BaseException] = []
+
+    def worker() -> None:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if failure:
+                continue  # drain so the producer never blocks on a dead consumer
+            t0 = time.perf_counter()
+            try:
+                consume(item)
+            except BaseException as e:  # noqa: B902 - re-raised in the producer thread
+                failure.append(e)
+            stats.consume_seconds += time.perf_counter() - t0
+
+    t_start = time.perf_counter()
+    thread = threading.Thread(target=worker, name="sync-consumer", daemon=True)
+    thread.start()
+    try:
+        it = iter(chunks)
+        while not failure:
+            t0 = time.perf_counter()
+            try:
+                chunk = next(it)
+            except StopIteration:
+                break
+            finally:
+                stats.read_seconds += time.perf_counter() - t0
+            stats.chunks += 1
+            stats.rows += len(chunk)
+            q.put(chunk)
+    finally:
+        q.put(_DONE)
+        thread.join()
+        stats.wall_seconds = time.perf_counter() - t_start
+    if failure:
+        raise failure[0]
+    return stats
+
+
+class ParallelUploader:
+    """
+    Groups points into size-bounded requests and sends them with `send(points)` on a small
+    thread pool, at most `in_flight` at a time (add() blocks when all slots are busy).
+    close() waits for every request and re-raises the first failure.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[List[Any]], None],
+        in_flight: int = UPSERT_IN_FLIGHT,
+        target_bytes: int = UPSERT_TARGET_BYTES,
+        max_points: int = UPSERT_MAX_POINTS,
+    ):
+        self._send = send
+        self.in_flight = max(1, int(in_flight))
+        self.target_bytes = max(1, int(target_bytes))
+        self.max_points = max(1, int(max_points))
+        self._pool = ThreadPoolExecutor(max_workers=self.in_flight, thread_name_prefix="qdrant-upsert")
+        self._slots = threading.BoundedSemaphore(self.in_flight)
+        self._lock = threading.Lock()
+        self._futures: List[Future] = []
+        self._errors: List[BaseException] = []
+        self._buffer: List[Any] = []
+        self._buffer_bytes = 0
+        self.points = 0
+        self.requests = 0
+        self.bytes = 0
+        self.max_batch = 0
+        self.min_batch = 0
+        self._started = time.perf_counter()
+        self.seconds = 0.0
+
+    def add(self, points: Sequence[Any], sizes: Sequence[int]) -> None:
+        """Queue points with their estimated serialized sizes; full batches are sent at once."""
+        if self._errors:
+            raise self._errors[0]
+        for point, size in zip(points, sizes):
+            self._buffer.append(point)
+            self._buffer_bytes += size
+            if self._buffer_bytes >= self.target_bytes or len(self._buffer) >= self.max_points:
+                self.flush()
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        batch, size = self._buffer, self._buffer_bytes
+        self._buffer, self._buffer_bytes = [], 0
+        self._slots.acquire()
+        self.requests += 1
+        self.points += len(batch)
+        self.bytes += size
+        self.max_batch = max(self.max_batch, len(batch))
+        self.min_batch = min(self.min_batch, len(batch)) if self.min_batch else len(batch)
+        future = self._pool.submit(self._send, batch)
+        future.add_done_callback(self._done)
+        with self._lock:
+            self._futures.append(future)
+
+    def _done(self, future: Future) -> None:
+        self._slots.release()
+        if future.exception() is not None:
+            self._errors.append(future.exception())
+
+    def close(self) -> None:
+        """Send what is buffered, wait for every request, then raise the first error if any."""
+        try:
+            if not self._errors:
+                self.flush()
+        finally:
+            with self._lock:
+                futures = list(self._futures)
+            for f in futures:
+                f.exception()  # wait; errors were recorded by _done
+            self._pool.shutdown(wait=True)
+            self.seconds = time.perf_counter() - self._started
+        if self._errors:
+            raise self._errors[0]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "points": self.points,
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "batch_points": [self.min_batch, self.max_batch],
+            "upload_mb": round(self.bytes / 1e6, 2),
+            "points_per_s": round(self.points / self.seconds, 1) if self.seconds else None,
+        }
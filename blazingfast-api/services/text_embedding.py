@@ -0,0 +1,48 @@
+"""
+Deterministic hash embeddings for the Qdrant sync and search (services/qdrant_service.py).
+
+A stand-in for a real sentence-embedding model: each text seeds a Mersenne Twister with the
+first 4 bytes of its SHA-256 and draws a standard-normal vector, which is then L2-normalised.
+The vectors are the ones the original per-record code produced (np.random.seed +
+np.random.normal), rounded to float32 like Qdrant stores them. The generator is private to
+each call, so nothing touches NumPy's global RNG (safe from threads, and no surprise for other
+code relying on np.random). A batch of texts comes back as one contiguous float32 matrix,
+normalised in a single vectorised step.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Sequence
+
+import numpy as np
+
+EMBEDDING_DIM = 768
+
+
+def text_seed(text: str) -> int:
+    """MT19937 seed of a text: big-endian first 4 bytes of its SHA-256."""
+    return int.from_bytes(hashlib.sha256(text.encode()).digest()[:4], byteorder="big")
+
+
+class HashEmbedder:
+    """Embeds texts into unit vectors of `dim` floats, one row per text."""
+
+    def __init__(self, dim: int = EMBEDDING_DIM):
+        self.dim = int(dim)
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) C-contiguous float32 matrix; all-zero rows are left as they are."""
+        out = np.empty((len(texts), self.dim), dtype=np.float64)
+        # Reseeding one RandomState is ~10x cheaper than building one per text.
+        rng = np.random.RandomState()
+        for i, text in enumerate(texts):
+            rng.seed(text_seed(text))
+            out[i] = rng.standard_normal(self.dim)
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out.astype(np.float32)
+
+    def embed(self, text: str) -> np.ndarray:
+        """Single text as a (dim,) float32 vector."""
+        return self.embed_batch([text])[0]
@@ -2,8 +2,14 @@
 """
 Script to sync all PostgreSQL tables to Qdrant vector database.
 This script automatically detects all tables in the database and syncs them to Qdrant.
+
+By default only rows changed since the last run are re-embedded and rows deleted since are
+removed (see services/qdrant_service.py). A table is rebuilt from scratch on its first sync
+or after a schema change; pass --full to rebuild every collection.
 """
 
+import argparse
+
 import os
 import sys
 import importlib
@@ -45,12 +51,14 @@ def get_all_models():
     
     return models
 
-def sync_all_tables(recreate=True):
+def sync_all_tables(full=False):
     """
     Sync all tables to Qdrant.
     
     Args:
-        recreate: If True, will delete existing collections before recreating them
+        full: If True, rebuild every collection instead of syncing changes: a new
+            {table}_v{n} is filled behind the table's alias, which is switched atomically
+            once the point count matches (searches keep using the old version meanwhile)
     """
     # Initialize Qdrant service
     qdrant_service = QdrantService()
@@ -93,13 +101,13 @@ def sync_all_tables(recreate=True):
                 
                 print(f"Using text fields for embedding: {', '.join(text_fields) if text_fields else 'None found, using all fields'}")
                 
-                # Push table to Qdrant
-                qdrant_service.push_table_to_qdrant(
+                # Sync table to Qdrant (incremental unless full or the schema changed)
+                qdrant_service.sync_table(
                     db=db,
                     model=model,
                     text_fields=text_fields if text_fields else None,
                     batch_size=100,
-                    recreate=recreate
+                    full=full
                 )
                 
                 print(f"Successfully synced table {table_name} to Qdrant")
@@ -114,7 +122,11 @@ def main():
     """
     Main function to run the script.
     """
-    print("Starting sync of all PostgreSQL tables to Qdrant...")
+    parser = argparse.ArgumentParser(description="Sync all PostgreSQL tables to Qdrant")
+    parser.add_argument("--full", action="store_true", help="Rebuild every collection (new version behind its alias) and re-embed all rows")
+    args = parser.parse_args()
+
+    print(f"Starting {'full' if args.full else 'incremental'} sync of all PostgreSQL tables to Qdrant...")
     
     # Check environment variables
     qdrant_url = os.getenv("QDRANT_API_URL")
@@ -123,7 +135,7 @@ def main():
         sys.exit(1)
     
     try:
-        sync_all_tables()
+        sync_all_tables(full=args.full)
         print("\nAll tables successfully synced to Qdrant!")
     except Exception as e:
         print(f"Error during sync: {e}", file=sys.stderr)
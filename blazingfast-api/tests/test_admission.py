@@ -0,0 +1,149 @@
+"""Unit tests for services/admission.py: lanes, queue limits, timeouts and cancellation."""
+
+import asyncio
+
+import pytest
+
+from services.admission import BATCH, INTERACTIVE, AdmissionClass, AdmissionRejected
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_admits_up_to_concurrency_without_waiting():
+    async def main():
+        cls = AdmissionClass("t", concurrency=2, max_queue=0, max_wait=1)
+        await cls.acquire()
+        await cls.acquire()
+        assert cls.active == 2
+        with pytest.raises(AdmissionRejected):
+            await cls.acquire()
+        cls.release()
+        cls.release()
+        assert cls.active == 0 and cls.rejected == 1
+
+    run(main())
+
+
+def test_interactive_waiters_go_before_batch_waiters():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=4, max_wait=5)
+        await cls.acquire()
+        order = []
+
+        async def worker(name, priority):
+            async with cls.slot(priority):
+                order.append(name)
+
+        tasks = [
+            asyncio.create_task(worker("batch-1", BATCH)),
+            asyncio.create_task(worker("batch-2", BATCH)),
+        ]
+        await settle()
+        tasks.append(asyncio.create_task(worker("interactive", INTERACTIVE)))
+        await settle()
+        assert cls.stats()["queued_by_lane"] == {"interactive": 1, "batch": 2}
+        cls.release()
+        await asyncio.gather(*tasks)
+        assert order == ["interactive", "batch-1", "batch-2"]
+        assert cls.active == 0
+
+    run(main())
+
+
+def test_full_queue_rejects_and_interactive_bounces_newest_batch_waiter():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=2, max_wait=5)
+        await cls.acquire()
+        old = asyncio.create_task(cls.acquire(BATCH))
+        new = asyncio.create_task(cls.acquire(BATCH))
+        await settle()
+        with pytest.raises(AdmissionRejected):
+            await cls.acquire(BATCH)
+        interactive = asyncio.create_task(cls.acquire(INTERACTIVE))
+        await settle()
+        with pytest.raises(AdmissionRejected, match="interactive"):
+            await new
+        assert cls.bounced == 1
+        cls.release()
+        await interactive
+        cls.release()
+        await old
+        cls.release()
+        assert cls.active == 0
+
+    run(main())
+
+
+def test_interactive_wait_times_out():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=1, max_wait=0.05)
+        await cls.acquire()
+        with pytest.raises(AdmissionRejected, match="no slot"):
+            await cls.acquire()
+        assert cls.timed_out == 1 and cls.queued == 0
+        cls.release()
+        assert cls.active == 0
+
+    run(main())
+
+
+def test_cancelled_waiter_does_not_keep_a_slot():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=2, max_wait=5)
+        await cls.acquire()
+        waiter = asyncio.create_task(cls.acquire())
+        await settle()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        cls.release()
+        assert cls.active == 0 and cls.queued == 0
+
+    run(main())
+
+
+def test_slot_is_released_when_the_holder_is_cancelled():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=1, max_wait=5)
+        entered = asyncio.Event()
+
+        async def hold():
+            async with cls.slot():
+                entered.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(hold())
+        await entered.wait()
+        assert cls.active == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert cls.active == 0
+
+    run(main())
+
+
+def test_slot_granted_to_a_cancelled_waiter_is_passed_on():
+    async def main():
+        cls = AdmissionClass("t", concurrency=1, max_queue=2, max_wait=5)
+        await cls.acquire()
+        waiter = asyncio.create_task(cls.acquire())
+        await settle()
+        cls.release()  # hands the slot to the waiter...
+        waiter.cancel()  # ...which goes away before running
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        else:
+            cls.release()  # wait_for may deliver the grant instead of the cancel; then we own it
+        assert cls.active == 0 and cls.queued == 0
+
+    run(main())
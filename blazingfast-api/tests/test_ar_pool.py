@@ -0,0 +1,46 @@
+"""ARWorkerPool recovery from a crashed worker process (services/ar_pool.py)."""
+
+import asyncio
+import operator
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from services.ar_pool import ARWorkerPool
+
+
+class FakeExecutor:
+    def __init__(self):
+        self.shutdowns = []
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns.append((wait, cancel_futures))
+
+
+def test_crashed_worker_is_replaced_by_a_fresh_pool():
+    pool = ARWorkerPool(workers=1, max_pending=2, start_method="fork", shared_memory=False)
+
+    async def main():
+        with pytest.raises(RuntimeError, match="crashed") as exc:
+            await pool.run(os._exit, 1)
+        assert isinstance(exc.value.__cause__, BrokenProcessPool)
+        assert pool._executor is None
+        assert await pool.run(operator.add, 2, 3) == 5
+
+    try:
+        asyncio.run(main())
+        assert pool.stats()["pending"] == 0
+    finally:
+        pool.shutdown()
+
+
+def test_discarding_a_broken_executor_keeps_a_newer_one():
+    pool = ARWorkerPool(workers=1, shared_memory=False)
+    broken, fresh = FakeExecutor(), FakeExecutor()
+    pool._executor = fresh
+    pool._discard_executor(broken)
+    assert pool._executor is fresh
+    assert broken.shutdowns == [(False, True)]
+    pool._discard_executor(fresh)
+    assert pool._executor is None
@@ -0,0 +1,68 @@
+"""WebSocket /ar-tryon/stream: bad frames and failures must not leak stream slots."""
+
+import cv2
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routes.ar_tryon as ar_tryon
+from services.admission import AdmissionClass
+from services.ar_stream import StreamSession
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(ar_tryon.router)
+    with TestClient(app) as c:
+        yield c
+    assert ar_tryon._active_streams == 0
+
+
+def _configure(ws):
+    ws.send_json({"jewellery_id": "jewel1", "width": 160, "height": 120})
+    assert ws.receive_json()["type"] == "config"
+
+
+def test_bad_frames_report_errors_and_keep_the_stream(client, monkeypatch):
+    with client.websocket_connect("/ar-tryon/stream") as ws:
+        _configure(ws)
+        ws.send_bytes(b"not an image")
+        assert ws.receive_json()["type"] == "error"
+
+        def broken(self, data):
+            raise cv2.error("corrupt frame")
+
+        monkeypatch.setattr(StreamSession, "process", broken)
+        ws.send_bytes(b"frame")
+        msg = ws.receive_json()
+        assert msg["type"] == "error" and "corrupt frame" in msg["detail"]
+        assert ar_tryon._active_streams == 1
+
+
+def test_unexpected_failure_releases_the_stream_slot(client, monkeypatch):
+    async def crash(websocket):
+        raise KeyError("boom")
+
+    monkeypatch.setattr(ar_tryon, "_serve_stream", crash)
+    for _ in range(ar_tryon.AR_STREAM_MAX + 1):
+        with pytest.raises(KeyError):
+            with client.websocket_connect("/ar-tryon/stream"):
+                pass
+    assert ar_tryon._active_streams == 0
+
+
+def test_frames_take_a_tryon_admission_slot(client, monkeypatch):
+    tryon = AdmissionClass("tryon", concurrency=1, max_queue=0, max_wait=0)
+    monkeypatch.setattr(ar_tryon, "get_admission", lambda name: tryon)
+    monkeypatch.setattr(StreamSession, "process", lambda self, data: (b"jpeg", {}))
+    with client.websocket_connect("/ar-tryon/stream") as ws:
+        _configure(ws)
+        tryon.active = 1  # the only slot is busy
+        ws.send_bytes(b"frame")
+        msg = ws.receive_json()
+        assert msg["type"] == "error" and "tryon" in msg["detail"]
+        tryon.active = 0
+        ws.send_bytes(b"frame")
+        assert ws.receive_bytes() == b"jpeg"
+    assert tryon.active == 0 and tryon.admitted == 1
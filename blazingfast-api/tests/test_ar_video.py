@@ -0,0 +1,72 @@
+"""Unit tests for services/ar_video.py: pool retries and segment planning (no worker pool)."""
+
+import asyncio
+import time
+
+import cv2
+import numpy as np
+import pytest
+
+import services.ar_video as ar_video
+from services.admission import AdmissionClass
+from services.ar_jewelry import OverlayItem
+from services.ar_pool import PoolSaturatedError
+
+
+class SaturatedPool:
+    workers = 1
+
+    def __init__(self):
+        self.calls = 0
+
+    async def run(self, fn, *args, **kwargs):
+        self.calls += 1
+        raise PoolSaturatedError("pool full")
+
+
+def test_run_on_pool_gives_up_after_the_job_retry_deadline(monkeypatch):
+    pool = SaturatedPool()
+    tryon = AdmissionClass("tryon", concurrency=1, max_queue=1, max_wait=1)
+    monkeypatch.setattr(ar_video, "get_ar_pool", lambda: pool)
+    monkeypatch.setattr(ar_video, "get_admission", lambda name: tryon)
+    monkeypatch.setattr(ar_video, "AR_JOB_RETRY_SECONDS", 0.3)
+    t0 = time.monotonic()
+    with pytest.raises(PoolSaturatedError):
+        asyncio.run(ar_video._run_on_pool(print))
+    assert 0.3 <= time.monotonic() - t0 < 2
+    assert pool.calls > 1
+    assert tryon.active == 0
+
+
+def write_clip(path, frames, size=(64, 48)):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10.0, size)
+    for i in range(frames):
+        writer.write(np.full((size[1], size[0], 3), i * 8 % 256, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def render(src, dst, start=0, end=None, max_frames=None):
+    item = OverlayItem(np.zeros((8, 8, 4), dtype=np.uint8))
+    return ar_video.render_segment_task(
+        src, str(dst), item, start, end, width=64, height=48, fps=10.0, fourcc="MJPG", max_frames=max_frames
+    )
+
+
+def test_plan_segments():
+    assert ar_video.plan_segments(0, 4) == [(0, None)]
+    assert ar_video.plan_segments(100, 4, min_frames=150) == [(0, None)]
+    assert ar_video.plan_segments(600, 4, min_frames=150) == [(0, 150), (150, 300), (300, 450), (450, None)]
+    assert ar_video.plan_segments(400, 8, min_frames=150) == [(0, 200), (200, None)]
+
+
+def test_segment_renders_its_range(tmp_path):
+    src = write_clip(tmp_path / "clip.avi", 12)
+    assert render(src, tmp_path / "a.avi", 0, 5)["frames"] == 5
+    assert render(src, tmp_path / "b.avi", 0, None, max_frames=12)["frames"] == 12
+
+
+def test_segment_enforces_max_frames_past_the_header_count(tmp_path):
+    src = write_clip(tmp_path / "clip.avi", 12)
+    with pytest.raises(ValueError, match="more than 10 frames"):
+        render(src, tmp_path / "out.avi", 0, None, max_frames=10)
@@ -0,0 +1,53 @@
+"""run_warmup task count and failure reporting (services/ar_warmup.py), with a fake pool."""
+
+import asyncio
+import itertools
+
+import pytest
+
+import services.ar_warmup as ar_warmup
+from services.ar_pool import PoolSaturatedError
+
+
+class FakePool:
+    def __init__(self, workers, max_pending, fail=False):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.fail = fail
+        self.pending = 0
+        self.peak = 0
+        self._pids = itertools.count(100)
+
+    async def run(self, fn):
+        if self.pending >= self.max_pending:
+            raise PoolSaturatedError("full")
+        self.pending += 1
+        self.peak = max(self.peak, self.pending)
+        try:
+            await asyncio.sleep(0.01)
+            if self.fail:
+                raise RuntimeError("worker failed to start")
+            return {"pid": next(self._pids)}
+        finally:
+            self.pending -= 1
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(ar_warmup, "_state", ar_warmup.WarmupState())
+    monkeypatch.setattr(ar_warmup, "warm_process", lambda: {"pid": 1})
+
+
+def test_warmup_submits_no_more_tasks_than_max_pending():
+    pool = FakePool(workers=4, max_pending=2)
+    state = asyncio.run(ar_warmup.run_warmup(pool, enabled=True))
+    assert state.status == "ready" and state.ready
+    assert len(state.workers) == 2 and pool.peak == 2
+
+
+def test_failed_warmup_is_reported_and_warned():
+    pool = FakePool(workers=2, max_pending=4, fail=True)
+    with pytest.warns(UserWarning, match="warm-up failed"):
+        state = asyncio.run(ar_warmup.run_warmup(pool, enabled=True))
+    assert state.status == "failed" and state.ready
+    assert state.public()["error"] == "worker failed to start"
@@ -0,0 +1,56 @@
+"""detect_face_adaptive early exit and multi-face merging, with a scripted cascade."""
+
+import numpy as np
+
+from services.face_detection import DetectionConfig, DetectPass, detect_face_adaptive
+
+
+class ScriptedCascade:
+    """detectMultiScale3 answers per scaleFactor: {scale_factor: [((x, y, w, h), weight), ...]}."""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = []
+
+    def detectMultiScale3(self, img, scaleFactor, minNeighbors, minSize, outputRejectLevels):
+        self.calls.append(scaleFactor)
+        found = self.script.get(scaleFactor, [])
+        rects = np.array([r for r, _ in found], dtype=np.int32).reshape(-1, 4)
+        weights = np.array([w for _, w in found], dtype=np.float64)
+        return rects, np.zeros(len(found), dtype=np.int32), weights
+
+
+PASSES = (DetectPass("coarse", 1.3, 3, 30), DetectPass("fine", 1.05, 3, 30), DetectPass("finest", 1.02, 3, 30))
+CONFIG = DetectionConfig(level_width=0, min_face_frac=0.1, min_confidence=1.5, refine=False, passes=PASSES)
+GRAY = np.zeros((400, 600), dtype=np.uint8)
+
+SCRIPT = {
+    1.3: [((300, 100, 120, 120), 4.0)],  # the big face: confident, settles the primary
+    1.05: [((302, 98, 118, 122), 3.0), ((40, 120, 70, 70), 2.0)],  # same face + a weaker one
+    1.02: [((480, 130, 60, 60), 1.8), ((470, 300, 40, 40), 0.5)],  # another face + noise
+}
+
+
+def test_single_face_stops_at_the_first_confident_pass():
+    cascade = ScriptedCascade(SCRIPT)
+    face, report = detect_face_adaptive(GRAY, cascade, CONFIG)
+    assert face == (300, 100, 120, 120)
+    assert cascade.calls == [1.3]
+    assert report["faces"] == [[300, 100, 120, 120]] and report["primary_index"] == 0
+
+
+def test_multi_face_runs_every_pass_and_merges_faces():
+    cascade = ScriptedCascade(SCRIPT)
+    face, report = detect_face_adaptive(GRAY, cascade, CONFIG, multi_face=True)
+    assert face == (300, 100, 120, 120)  # same primary as the early-exit path
+    assert cascade.calls == [1.3, 1.05, 1.02]
+    assert report["winning_pass"] == "coarse"
+    assert report["faces"] == [[40, 120, 70, 70], [300, 100, 120, 120], [480, 130, 60, 60]]
+    assert report["primary_index"] == 1
+
+
+def test_multi_face_without_any_confident_face():
+    cascade = ScriptedCascade({1.02: [((10, 10, 30, 30), 0.2)]})
+    face, report = detect_face_adaptive(GRAY, cascade, CONFIG, multi_face=True)
+    assert face == (10, 10, 30, 30)
+    assert report["faces"] == [[10, 10, 30, 30]]
@@ -0,0 +1,67 @@
+"""Unit tests for the byte-budget LRU shared by the AR caches (services/lru_cache.py)."""
+
+import numpy as np
+
+from services.lru_cache import ByteBudgetLRU
+from services.overlay_cache import OverlayCache
+
+
+def make(max_bytes):
+    return ByteBudgetLRU(max_bytes, len)
+
+
+def test_evicts_least_recently_used_past_the_budget():
+    lru = make(10)
+    lru.put("a", b"xxxx")
+    lru.put("b", b"xxxx")
+    assert lru.get("a") == b"xxxx"  # "b" is now the oldest
+    lru.put("c", b"xxxx")
+    assert lru.get("b") is None
+    assert lru.get("a") is not None and lru.get("c") is not None
+    stats = lru.stats()
+    assert (stats["entries"], stats["bytes"], stats["evictions"]) == (2, 8, 1)
+
+
+def test_replacing_a_key_updates_its_size():
+    lru = make(10)
+    lru.put("a", b"xxxxxxxx")
+    lru.put("a", b"xx")
+    lru.put("b", b"xxxxxxxx")
+    assert len(lru) == 2 and lru.stats()["bytes"] == 10
+
+
+def test_values_larger_than_the_budget_are_not_stored():
+    lru = make(4)
+    lru.put("a", b"xx")
+    lru.put("big", b"xxxxx")
+    assert lru.get("big") is None
+    assert lru.get("a") == b"xx"
+    zero = make(0)
+    zero.put("a", b"x")
+    assert len(zero) == 0
+
+
+def test_hit_ratio_and_clear():
+    lru = make(10)
+    lru.put("a", b"x")
+    lru.get("a")
+    lru.get("missing")
+    assert lru.stats()["hit_ratio"] == 0.5
+    lru.clear()
+    assert len(lru) == 0 and lru.stats()["bytes"] == 0
+
+
+def test_overlay_cache_uses_the_shared_eviction_policy():
+    cache = OverlayCache(max_bytes=0)
+    base = cache.get_base("jewel1")
+    assert base.ndim == 3 and base.shape[2] == 4
+    assert not base.flags.writeable
+    assert cache.stats()["entries"] == 0  # a zero budget keeps nothing
+
+    cache = OverlayCache(max_bytes=64 * 1024 * 1024, size_step=8)
+    a = cache.get_premultiplied("jewel1", 97, 49)
+    b = cache.get_premultiplied("jewel1", 99, 49)
+    assert a is b and a.shape[1:3] == (48, 96)
+    assert isinstance(cache.get_scaled("jewel1", 100, 50), np.ndarray)
+    stats = cache.stats()
+    assert stats["hits"] >= 1 and stats["size_step"] == 8
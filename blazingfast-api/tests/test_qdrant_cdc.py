@@ -0,0 +1,194 @@
+"""Unit tests for services/qdrant_cdc.py with fake psycopg2 connections and a fake service."""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from models import Product, Shop
+from services.qdrant_cdc import CDCWorker, install_triggers, uninstall_triggers
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class Notify:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.conn.executed.append(repr(query))
+
+
+class FakeConn:
+    """Readable (select) once per batch of payloads; poll() moves them to .notifies."""
+
+    def __init__(self, batches=()):
+        self._r, self._w = os.pipe()
+        self._batches = list(batches)
+        self.notifies = []
+        self.executed = []
+        self.autocommit = False
+        self.commits = 0
+        self.closed = False
+        for _ in self._batches:
+            os.write(self._w, b"x")
+
+    def fileno(self):
+        return self._r
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def poll(self):
+        os.read(self._r, 1)
+        self.notifies.extend(Notify(p) for p in self._batches.pop(0))
+
+    def commit(self):
+        self.commits += 1
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            os.close(self._r)
+            os.close(self._w)
+
+
+class FakeService:
+    def __init__(self):
+        self.synced = []
+        self.upserts = []
+        self.deletes = []
+
+    def synced_text_fields(self, model):
+        return ["name"]
+
+    def sync_table(self, db, model, text_fields=None):
+        self.synced.append((model.__tablename__, text_fields))
+
+    def upsert_rows(self, model, rows, text_fields=None):
+        self.upserts.append(sorted(r.id for r in rows))
+        return len(rows)
+
+    def delete_rows(self, model, pks):
+        if pks:
+            self.deletes.append(sorted(pks))
+        return len(pks)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        db.add_all([Item(id=1, name="a"), Item(id=2, name="b")])
+        db.commit()
+    yield factory
+    engine.dispose()
+
+
+def payload(table, pk, op="UPDATE"):
+    return json.dumps({"table": table, "pk": pk, "op": op})
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_parse_payloads():
+    worker = CDCWorker([Product, Shop, Item], session_factory=lambda: None, connect=lambda: None)
+    pid = uuid.uuid4()
+    assert worker._parse(payload("products", str(pid))) == ("products", pid)
+    assert worker._parse(payload("items", "7")) == ("items", 7)
+    assert worker._parse(payload("orders", "1")) is None  # not indexed
+    assert worker._parse("{not json") is None
+    assert worker._parse(json.dumps(["products", "1"])) is None
+    assert worker._parse(payload("products", "not-a-uuid")) is None
+    assert worker._parse(payload("products", None)) is None  # pk column missing from to_jsonb
+    assert worker._parse(json.dumps({"table": "items"})) is None
+    assert worker.stats == {"connects": 0, "notifications": 8, "ignored": 6, "catch_ups": 0}
+
+
+def test_install_and_uninstall_triggers():
+    conn = FakeConn()
+    install_triggers(conn, [Product, Shop], channel="chan")
+    assert "CREATE OR REPLACE FUNCTION qdrant_notify_change()" in conn.executed[0]
+    creates = [q for q in conn.executed if "CREATE TRIGGER" in q]
+    assert len(creates) == 2
+    assert "Identifier('products')" in creates[0] and "Literal('id')" in creates[0] and "Literal('chan')" in creates[0]
+    assert sum("DROP TRIGGER IF EXISTS" in q for q in conn.executed) == 2
+    uninstall_triggers(conn, [Product, Shop])
+    assert conn.executed[-1] == repr("DROP FUNCTION IF EXISTS qdrant_notify_change()")
+    assert conn.commits == 2
+    conn.close()
+
+
+def test_worker_catches_up_then_indexes_notifications(session_factory):
+    service = FakeService()
+    conn = FakeConn([[payload("items", "1"), payload("items", "2")], [payload("items", "9", "DELETE"), "garbage"]])
+    worker = CDCWorker([Item], session_factory, lambda: conn, service_factory=lambda: service, delay=0.05)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        assert wait_for(lambda: service.deletes and service.upserts)
+    finally:
+        worker.stop()
+        thread.join(5)
+    assert not thread.is_alive()
+    assert service.synced == [("items", ["name"])]
+    assert sorted(pk for batch in service.upserts for pk in batch) == [1, 2]
+    assert service.deletes == [[9]]
+    assert any("LISTEN" in q for q in conn.executed)
+    assert conn.autocommit and conn.closed
+    assert worker.stats["connects"] == 1 and worker.stats["ignored"] == 1
+
+
+def test_worker_reconnects_after_a_failed_connection(session_factory):
+    service = FakeService()
+    conns = []
+
+    def connect():
+        if not conns:
+            conns.append(None)
+            raise OSError("connection refused")
+        conn = FakeConn([[payload("items", "1")]])
+        conns.append(conn)
+        return conn
+
+    worker = CDCWorker([Item], session_factory, connect, service_factory=lambda: service, delay=0.0)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        assert wait_for(lambda: service.upserts)
+    finally:
+        worker.stop()
+        thread.join(5)
+    assert worker.stats["connects"] == 1 and worker.stats["catch_ups"] == 1
+    assert len(conns) == 2
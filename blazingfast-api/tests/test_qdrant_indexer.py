@@ -0,0 +1,150 @@
+"""Unit tests for services/qdrant_indexer.py on SQLite with a fake QdrantService."""
+
+import time
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from services.qdrant_indexer import WriteThroughIndexer
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+class FakeService:
+    """Records upsert_rows / delete_rows calls instead of embedding and writing to Qdrant."""
+
+    def __init__(self, text_fields=()):
+        self.text_fields = None if text_fields is None else list(text_fields)
+        self.upserts = []
+        self.deletes = []
+
+    def synced_text_fields(self, model):
+        return self.text_fields
+
+    def upsert_rows(self, model, rows, text_fields=None):
+        self.upserts.append(sorted((r.id, r.name) for r in rows))
+        return len(rows)
+
+    def delete_rows(self, model, pks):
+        if pks:
+            self.deletes.append(sorted(pks))
+        return len(pks)
+
+
+@pytest.fixture
+def session_factory():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    yield sessionmaker(bind=engine)
+    engine.dispose()
+
+
+@pytest.fixture
+def make_indexer(session_factory):
+    started = []
+
+    def make(service, delay=0.2, listen=True):
+        indexer = WriteThroughIndexer([Item], session_factory, lambda: service, delay=delay)
+        indexer.start(listen=listen)
+        started.append(indexer)
+        return indexer
+
+    yield make
+    for indexer in started:
+        indexer.stop()
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+def test_commits_within_the_window_coalesce_into_one_upsert(session_factory, make_indexer):
+    service = FakeService()
+    indexer = make_indexer(service, delay=0.3)
+    with session_factory() as db:
+        item = Item(id=1, name="a")
+        db.add(item)
+        db.commit()
+        for name in ("b", "c"):
+            item.name = name
+            db.commit()
+    assert wait_for(lambda: indexer.stats["upserted"] == 1)
+    assert indexer.stats["batches"] == 1
+    assert service.upserts == [[(1, "c")]]
+    assert indexer.stats["coalesced"] == 2
+    assert indexer.pending() == 0
+
+
+def test_rollback_drops_pending_keys(session_factory, make_indexer):
+    service = FakeService()
+    indexer = make_indexer(service, delay=0.0)
+    with session_factory() as db:
+        db.add(Item(id=1, name="a"))
+        db.flush()
+        db.rollback()
+    time.sleep(0.1)
+    assert indexer.stats["enqueued"] == 0
+    assert service.upserts == []
+
+
+def test_deleted_row_deletes_its_point(session_factory, make_indexer):
+    service = FakeService()
+    with session_factory() as db:
+        db.add(Item(id=1, name="a"))
+        db.commit()
+    indexer = make_indexer(service, delay=0.0)
+    with session_factory() as db:
+        db.delete(db.get(Item, 1))
+        db.commit()
+    assert wait_for(lambda: indexer.stats["deleted"] == 1)
+    assert service.deletes == [[1]]
+    assert service.upserts == [[]]
+
+
+def test_collections_without_a_matching_sync_are_skipped(session_factory, make_indexer):
+    service = FakeService(text_fields=None)
+    indexer = make_indexer(service, delay=0.0)
+    with session_factory() as db:
+        db.add(Item(id=1, name="a"))
+        db.commit()
+    assert wait_for(lambda: indexer.stats["skipped"] == 1)
+    assert service.upserts == [] and service.deletes == []
+
+
+def test_stop_indexes_pending_keys_without_waiting_for_the_window(session_factory, make_indexer):
+    service = FakeService()
+    indexer = make_indexer(service, delay=60.0)
+    with session_factory() as db:
+        db.add(Item(id=1, name="a"))
+        db.commit()
+    assert indexer.pending() == 1
+    t0 = time.monotonic()
+    indexer.stop()
+    assert time.monotonic() - t0 < 5
+    assert service.upserts == [[(1, "a")]]
+
+
+def test_enqueue_without_session_events(session_factory, make_indexer):
+    service = FakeService()
+    indexer = make_indexer(service, delay=0.0, listen=False)
+    with session_factory() as db:
+        db.add_all([Item(id=1, name="a"), Item(id=2, name="b")])
+        db.commit()
+    time.sleep(0.05)
+    assert indexer.stats["enqueued"] == 0
+    indexer.enqueue([("items", 1), ("items", 2), ("items", 3)])
+    assert wait_for(lambda: indexer.stats["deleted"] == 1)
+    assert service.upserts == [[(1, "a"), (2, "b")]]
+    assert service.deletes == [[3]]
@@ -0,0 +1,54 @@
+"""QdrantService table streaming against an in-memory Qdrant and SQLite."""
+
+import pytest
+from qdrant_client import QdrantClient
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.orm import declarative_base, sessionmaker
+
+from services.qdrant_service import QdrantService
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with sessionmaker(bind=engine)() as session:
+        session.add_all([Item(id=i, name=f"item {i}") for i in range(1, 6)])
+        session.commit()
+        yield session
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setenv("QDRANT_API_URL", "http://localhost:6333")
+    svc = QdrantService()
+    svc.client = QdrantClient(":memory:")
+    svc.create_collection("items")
+    return svc
+
+
+def test_stream_to_collection_upserts_every_row(db, service):
+    stats = service._stream_to_collection(db.query(Item), Item, "items")
+    assert stats.rows == 5
+    assert service.client.count("items", exact=True).count == 5
+
+
+def test_pipeline_error_is_not_masked_by_a_failing_upload(db, service, monkeypatch):
+    def upsert(**kwargs):
+        raise ConnectionError("qdrant unreachable")
+
+    def on_chunk(chunk):
+        raise KeyError("row conversion failed")
+
+    monkeypatch.setattr(service.client, "upsert", upsert)
+    with pytest.raises(KeyError, match="row conversion failed"):
+        service._stream_to_collection(db.query(Item), Item, "items", on_chunk=on_chunk)
@@ -0,0 +1,117 @@
+"""Unit tests for services/sync_pipeline.py with a fake `send` (no Qdrant needed)."""
+
+import threading
+import time
+
+import pytest
+
+from services.sync_pipeline import ParallelUploader, run_pipeline
+
+
+class FakeSend:
+    """Records batches; optionally fails on the n-th call or sleeps to keep requests in flight."""
+
+    def __init__(self, fail_on=None, delay=0.0):
+        self.fail_on = fail_on
+        self.delay = delay
+        self.batches = []
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, batch):
+        with self._lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if call == self.fail_on:
+                raise RuntimeError(f"upload {call} failed")
+            with self._lock:
+                self.batches.append(list(batch))
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def test_pipeline_consumes_every_chunk_in_order():
+    seen = []
+    stats = run_pipeline(([i, i] for i in range(5)), seen.append, depth=2)
+    assert seen == [[i, i] for i in range(5)]
+    assert (stats.chunks, stats.rows) == (5, 10)
+
+
+def test_pipeline_reraises_consumer_error_and_stops_reading():
+    read = []
+
+    def chunks():
+        for i in range(100):
+            read.append(i)
+            yield [i]
+
+    def consume(chunk):
+        if chunk == [2]:
+            raise ValueError("bad chunk")
+
+    with pytest.raises(ValueError, match="bad chunk"):
+        run_pipeline(chunks(), consume, depth=1)
+    assert len(read) < 100
+
+
+def test_pipeline_reraises_producer_error():
+    seen = []
+
+    def chunks():
+        yield [1]
+        raise KeyError("read failed")
+
+    with pytest.raises(KeyError):
+        run_pipeline(chunks(), seen.append)
+    assert seen == [[1]]
+
+
+def test_uploader_batches_by_bytes_and_max_points():
+    send = FakeSend()
+    uploader = ParallelUploader(send, in_flight=1, target_bytes=100, max_points=3)
+    uploader.add(range(4), [50] * 4)  # two points reach 100 bytes
+    uploader.add(range(4, 11), [1] * 7)  # small points cap at max_points
+    uploader.close()
+    assert sorted(len(b) for b in send.batches) == [1, 2, 2, 3, 3]
+    assert sorted(p for b in send.batches for p in b) == list(range(11))
+    assert uploader.summary()["points"] == 11
+    assert uploader.requests == 5
+
+
+def test_uploader_bounds_requests_in_flight():
+    send = FakeSend(delay=0.02)
+    uploader = ParallelUploader(send, in_flight=2, target_bytes=1, max_points=1)
+    uploader.add(range(8), [1] * 8)
+    uploader.close()
+    assert send.calls == 8
+    assert send.max_active <= 2
+
+
+def test_uploader_close_raises_first_upload_error():
+    send = FakeSend(fail_on=2)
+    uploader = ParallelUploader(send, in_flight=1, target_bytes=1, max_points=1)
+    uploader.add(range(3), [1] * 3)
+    with pytest.raises(RuntimeError, match="upload 2 failed"):
+        uploader.close()
+    assert len(send.batches) == 2
+
+
+def test_uploader_add_raises_after_a_failed_upload():
+    send = FakeSend(fail_on=1)
+    uploader = ParallelUploader(send, in_flight=1, target_bytes=1, max_points=1)
+    uploader.add([0], [1])
+    deadline = time.monotonic() + 5
+    while not uploader._errors and time.monotonic() < deadline:
+        time.sleep(0.01)
+    with pytest.raises(RuntimeError, match="upload 1 failed"):
+        uploader.add([1], [1])
+    with pytest.raises(RuntimeError):
+        uploader.close()
+    assert send.calls == 1
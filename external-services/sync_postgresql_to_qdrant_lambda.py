@@ -1,11 +1,19 @@
 import os
 import sys
 import json
+import queue
+import re
+import threading
+import time
+import uuid
 import boto3
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 import logging
 import psycopg2
+from psycopg2 import sql as pg_sql
 from psycopg2.extras import RealDictCursor
 import numpy as np
 import hashlib
@@ -27,9 +35,140 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 QDRANT_API_URL = os.getenv("QDRANT_API_URL")
 QDRANT_API_KEY = os.getenv("QDRANT_API_KEY")
 
+# Retired: blazingfast-api/qdrant_cdc_worker.py indexes products and shops continuously, with a
+# different embedding. Scheduled invocations are no-ops unless this is set to "1"; the two
+# must not run against the same Qdrant (each refuses the other's collections, see below).
+LAMBDA_SYNC_ENABLED = os.getenv("QDRANT_LAMBDA_SYNC_ENABLED", "0") == "1"
+
 # Tables to sync
 TABLES_TO_SYNC = ["products", "shops"]
 
+# Fields used for the embedding text per table (other tables: every scalar field)
+TEXT_FIELDS = {
+    "products": ["name", "description", "category", "subcategory", "material"],
+    "shops": ["name", "description", "category", "address"],
+}
+
+# Incremental sync: per-table watermark (updated_at + id of the last synced row) and schema
+# fingerprint live in this collection, in the same points as the API's sync script uses.
+SYNC_STATE_COLLECTION = os.getenv("QDRANT_SYNC_STATE_COLLECTION", "_sync_state")
+# Re-read rows updated this long before the watermark (transactions that committed late)
+SYNC_LAG_SECONDS = float(os.getenv("QDRANT_SYNC_LAG_SECONDS", "60"))
+EMBEDDING_KIND = "md5-uniform"
+# The API sync (blazingfast-api/services/qdrant_service.py) embeds differently into the same
+# collections; a collection built by another embedding is never rebuilt unless forced.
+
+# Streaming: rows per server-side cursor fetch, and chunks allowed to wait between the
+# Postgres reader and the embed + upload thread (memory stays at a few chunks)
+STREAM_CHUNK_ROWS = int(os.getenv("QDRANT_SYNC_CHUNK_ROWS", "500"))
+STREAM_QUEUE_DEPTH = int(os.getenv("QDRANT_SYNC_QUEUE_DEPTH", "2"))
+
+# Uploads: requests in flight over one pooled session, sent as wait=false upserts and sized
+# by encoded bytes (rows with large payloads make smaller batches)
+UPSERT_IN_FLIGHT = int(os.getenv("QDRANT_UPSERT_IN_FLIGHT", "4"))
+UPSERT_TARGET_BYTES = int(os.getenv("QDRANT_UPSERT_TARGET_BYTES", str(4 * 1024 * 1024)))
+UPSERT_MAX_POINTS = int(os.getenv("QDRANT_UPSERT_MAX_POINTS", "1000"))
+# Full syncs build {table}_v{n} and switch the {table} alias to it; older versions kept for rollback
+KEEP_OLD_VERSIONS = int(os.getenv("QDRANT_KEEP_OLD_VERSIONS", "1"))
+# Never stored: deleting it with wait=true is the write barrier after wait=false upserts
+BARRIER_POINT_ID = str(uuid.uuid5(uuid.NAMESPACE_URL, "qdrant-sync/write-barrier"))
+
+# Dimension of the embedding vector, and the per-dimension suffixes hashed after the text
+VECTOR_SIZE = 384
+_DIM_SUFFIXES = [str(i).encode('utf-8') for i in range(VECTOR_SIZE)]
+
+def point_id(table_name, pk):
+    """
+    Qdrant point id of a row: its UUID primary key as is, otherwise a uuid5 of table + key
+    (same derivation as services/qdrant_service.py in the API).
+    """
+    try:
+        return str(uuid.UUID(str(pk)))
+    except ValueError:
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant-row/{table_name}/{pk}"))
+
+def collection_version(alias, collection_name):
+    """n for a versioned collection "{alias}_v{n}", None for any other name."""
+    match = re.fullmatch(rf"{re.escape(alias)}_v(\d+)", collection_name)
+    return int(match.group(1)) if match else None
+
+def embedding_id():
+    return f"{EMBEDDING_KIND}/{VECTOR_SIZE}"
+
+def sync_state_point_id(collection_name):
+    """Id of a collection's point in the sync-state collection."""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"qdrant-sync-state/{collection_name}"))
+
+def close_quietly(uploader, collection_name):
+    """
+    Wait for an uploader's requests after another error; its own failure is only logged so
+    the original error (the root cause) is the one that propagates.
+    """
+    try:
+        uploader.close()
+    except Exception as e:
+        logger.warning(f"Upload to collection '{collection_name}' failed as well: {str(e)}")
+
+class BatchUploader:
+    """
+    Collects JSON-encoded points into requests of about UPSERT_TARGET_BYTES and PUTs them with
+    wait=false, at most UPSERT_IN_FLIGHT at once. close() waits for all and raises the first
+    error; the caller then issues a write barrier before reading the collection back.
+    """
+    
+    def __init__(self, session, url, in_flight=UPSERT_IN_FLIGHT, target_bytes=UPSERT_TARGET_BYTES, max_points=UPSERT_MAX_POINTS):
+        self.session = session
+        self.url = f"{url}?wait=false"
+        self.target_bytes = target_bytes
+        self.max_points = max_points
+        self.pool = ThreadPoolExecutor(max_workers=max(1, in_flight))
+        self.slots = threading.BoundedSemaphore(max(1, in_flight))
+        self.futures = []
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.points = 0
+        self.requests = 0
+        self.bytes = 0
+        self.started = time.perf_counter()
+    
+    def add(self, encoded_points):
+        for point in encoded_points:
+            self.buffer.append(point)
+            self.buffer_bytes += len(point) + 1
+            if self.buffer_bytes >= self.target_bytes or len(self.buffer) >= self.max_points:
+                self.flush()
+    
+    def _send(self, body):
+        try:
+            response = self.session.put(self.url, data=body)
+            response.raise_for_status()
+        finally:
+            self.slots.release()
+    
+    def flush(self):
+        if not self.buffer:
+            return
+        body = b'{"points":[' + b",".join(self.buffer) + b"]}"
+        self.points += len(self.buffer)
+        self.requests += 1
+        self.bytes += len(body)
+        self.buffer, self.buffer_bytes = [], 0
+        self.slots.acquire()
+        self.futures.append(self.pool.submit(self._send, body))
+    
+    def close(self):
+        """Send what is buffered and wait for every request; returns points per second."""
+        try:
+            self.flush()
+        finally:
+            errors = [f.exception() for f in self.futures]
+            self.pool.shutdown(wait=True)
+        for error in errors:
+            if error is not None:
+                raise error
+        seconds = time.perf_counter() - self.started
+        return round(self.points / seconds, 1) if seconds else None
+
 class QdrantSyncService:
     def __init__(self):
         self.qdrant_api_url = QDRANT_API_URL
@@ -38,42 +177,50 @@ class QdrantSyncService:
             "Content-Type": "application/json",
             "api-key": self.qdrant_api_key
         }
+        # One keep-alive session for every call; enough pooled connections for parallel uploads
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_maxsize=UPSERT_IN_FLIGHT + 2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
     
-    def _simple_text_embedding(self, text):
+    def _embed_batch(self, texts):
         """
-        Generate a simple deterministic embedding for text using hash function.
+        Generate simple deterministic embeddings for many texts using a hash function.
         This is a simplified approach that doesn't require ML models.
-        """
-        if not text or not isinstance(text, str):
-            text = ""
-        
-        # Use a hash function to generate a deterministic vector
-        # Convert text to bytes for hashing
-        text_bytes = text.encode('utf-8')
         
-        # Generate a fixed number of "random" but deterministic values
-        vector_size = 384  # Dimension of the embedding vector
-        vector = []
-        
-        for i in range(vector_size):
-            # Create a unique seed for each dimension
-            seed = hashlib.md5(text_bytes + str(i).encode('utf-8')).digest()
-            # Convert to a float between -1 and 1
-            value = (int.from_bytes(seed[:4], byteorder='big') / (2**32 - 1)) * 2 - 1
-            vector.append(value)
+        Dimension i of a text is md5(text + str(i)); the text is hashed once and the MD5
+        state copied per dimension. Returns a (len(texts), VECTOR_SIZE) float32 matrix
+        with unit-length rows.
+        """
+        raw = bytearray()
+        for text in texts:
+            if not text or not isinstance(text, str):
+                text = ""
+            base = hashlib.md5(text.encode('utf-8'))
+            for suffix in _DIM_SUFFIXES:
+                h = base.copy()
+                h.update(suffix)
+                raw += h.digest()[:4]
         
-        # Normalize the vector to unit length
-        norm = np.linalg.norm(vector)
-        if norm > 0:
-            vector = [v / norm for v in vector]
+        # Big-endian uint32 → float between -1 and 1
+        values = np.frombuffer(bytes(raw), dtype='>u4').reshape(len(texts), VECTOR_SIZE)
+        vectors = values / (2**32 - 1) * 2 - 1
         
-        return vector
+        # Normalize every vector to unit length
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors.astype(np.float32)
+    
+    def _simple_text_embedding(self, text):
+        """Embedding of a single text (see _embed_batch)."""
+        return self._embed_batch([text])[0].tolist()
     
     def delete_collection(self, collection_name):
         """Delete a collection in Qdrant if it exists."""
         try:
             url = f"{self.qdrant_api_url}/collections/{collection_name}"
-            response = requests.delete(url, headers=self.headers)
+            response = self.session.delete(url, headers=self.headers)
             
             if response.status_code == 200:
                 logger.info(f"Collection '{collection_name}' deleted successfully")
@@ -98,12 +245,12 @@ class QdrantSyncService:
             url = f"{self.qdrant_api_url}/collections/{collection_name}"
             payload = {
                 "vectors": {
-                    "size": 384,
+                    "size": VECTOR_SIZE,
                     "distance": "Cosine"
                 }
             }
             
-            response = requests.put(url, headers=self.headers, json=payload)
+            response = self.session.put(url, headers=self.headers, json=payload)
             
             if response.status_code == 200:
                 logger.info(f"Collection '{collection_name}' created successfully")
@@ -115,55 +262,216 @@ class QdrantSyncService:
             logger.error(f"Error creating collection '{collection_name}': {str(e)}")
             return False
     
-    def push_data_to_qdrant(self, collection_name, records, text_fields=None):
-        """Push data to Qdrant collection."""
+    def vector_size(self, collection_name):
+        """Vector size of a collection (or alias), None if it does not exist."""
+        response = self.session.get(f"{self.qdrant_api_url}/collections/{collection_name}", headers=self.headers)
+        if response.status_code != 200:
+            return None
+        return response.json()["result"]["config"]["params"]["vectors"].get("size")
+    
+    def foreign_embedding(self, collection_name, state):
+        """
+        Embedding of the existing index when it is not this sync's, else None: from the sync
+        state, or from the vector size for states written before the embedding was recorded.
+        """
+        if state and state.get("embedding"):
+            return None if state["embedding"] == embedding_id() else state["embedding"]
+        size = self.vector_size(collection_name)
+        return None if size in (None, VECTOR_SIZE) else f"unknown/{size}"
+    
+    def collection_exists(self, collection_name):
+        response = self.session.get(f"{self.qdrant_api_url}/collections/{collection_name}", headers=self.headers)
+        return response.status_code == 200
+    
+    def get_alias_target(self, alias):
+        """Collection an alias points to, or None."""
+        response = self.session.get(f"{self.qdrant_api_url}/aliases", headers=self.headers)
+        response.raise_for_status()
+        for a in response.json()["result"]["aliases"]:
+            if a["alias_name"] == alias:
+                return a["collection_name"]
+        return None
+    
+    def list_versions(self, alias):
+        """Versioned collections of an alias: {n: "{alias}_v{n}"}."""
+        response = self.session.get(f"{self.qdrant_api_url}/collections", headers=self.headers)
+        response.raise_for_status()
+        versions = {}
+        for c in response.json()["result"]["collections"]:
+            n = collection_version(alias, c["name"])
+            if n is not None:
+                versions[n] = c["name"]
+        return versions
+    
+    def create_version(self, alias):
+        """Create the next versioned collection of an alias; returns its name, or None on failure."""
+        target = f"{alias}_v{max(self.list_versions(alias), default=0) + 1}"
+        return target if self.create_collection(target) else None
+    
+    def publish_version(self, alias, collection_name, expected_points):
+        """
+        Switch the alias to a freshly built collection in one atomic request, once the
+        collection holds exactly expected_points. Returns False (alias untouched) otherwise.
+        """
+        try:
+            response = self.session.post(
+                f"{self.qdrant_api_url}/collections/{collection_name}/points/count",
+                headers=self.headers,
+                json={"exact": True},
+            )
+            response.raise_for_status()
+            count = response.json()["result"]["count"]
+            if count != expected_points:
+                logger.error(f"Collection '{collection_name}' has {count} points, expected {expected_points}; alias '{alias}' not switched")
+                return False
+            
+            actions = []
+            if self.get_alias_target(alias) is not None:
+                actions.append({"delete_alias": {"alias_name": alias}})
+            elif self.collection_exists(alias):
+                # A plain collection from before versioning holds the name; it has to go first.
+                # Not atomic: searches on the name fail until the alias exists (one-off migration)
+                logger.info(f"Replacing unversioned collection '{alias}' with an alias")
+                if not self.delete_collection(alias):
+                    return False
+            actions.append({"create_alias": {"collection_name": collection_name, "alias_name": alias}})
+            self.session.post(
+                f"{self.qdrant_api_url}/collections/aliases",
+                headers=self.headers,
+                json={"actions": actions},
+            ).raise_for_status()
+            logger.info(f"Alias '{alias}' -> '{collection_name}' ({count} points)")
+            return True
+        except requests.RequestException as e:
+            logger.error(f"Error switching alias '{alias}' to '{collection_name}': {str(e)}")
+            return False
+    
+    def drop_old_versions(self, alias, keep=KEEP_OLD_VERSIONS):
+        """Delete versions older than the alias target except the newest `keep` (failed builds included)."""
+        live = self.get_alias_target(alias)
+        live_version = collection_version(alias, live) if live else None
+        if live_version is None:
+            return []
+        older = sorted((n for n in self.list_versions(alias) if n < live_version), reverse=True)
+        dropped = [f"{alias}_v{n}" for n in older[max(0, keep):]]
+        for name in dropped:
+            self.delete_collection(name)
+        return dropped
+    
+    def get_sync_state(self, collection_name):
+        """Stored sync state of a collection, or None if it was never synced incrementally."""
+        url = f"{self.qdrant_api_url}/collections/{SYNC_STATE_COLLECTION}/points/{sync_state_point_id(collection_name)}"
+        response = self.session.get(url, headers=self.headers)
+        if response.status_code != 200:
+            return None
+        return response.json()["result"]["payload"]
+    
+    def save_sync_state(self, collection_name, state):
+        if not self.collection_exists(SYNC_STATE_COLLECTION):
+            self.session.put(
+                f"{self.qdrant_api_url}/collections/{SYNC_STATE_COLLECTION}",
+                headers=self.headers,
+                json={"vectors": {"size": 1, "distance": "Dot"}},
+            ).raise_for_status()
+        point = {"id": sync_state_point_id(collection_name), "vector": [1.0], "payload": state}
+        self.session.put(
+            f"{self.qdrant_api_url}/collections/{SYNC_STATE_COLLECTION}/points?wait=true",
+            headers=self.headers,
+            json={"points": [point]},
+        ).raise_for_status()
+    
+    def scroll_keys(self, collection_name, page_size=1000):
+        """Yield pages of (point id, row id from the payload or None); one page in memory at a time."""
+        url = f"{self.qdrant_api_url}/collections/{collection_name}/points/scroll"
+        offset = None
+        while True:
+            body = {"limit": page_size, "with_payload": {"include": ["id"]}, "with_vector": False}
+            if offset is not None:
+                body["offset"] = offset
+            response = self.session.post(url, headers=self.headers, json=body)
+            response.raise_for_status()
+            result = response.json()["result"]
+            yield [(p["id"], (p.get("payload") or {}).get("id")) for p in result["points"]]
+            offset = result.get("next_page_offset")
+            if offset is None:
+                return
+    
+    def upsert_rows(self, table_name, records):
+        """Upsert a few rows in place by primary key (no-op if the table was never synced)."""
+        if not records or not self.collection_exists(table_name):
+            return False
+        return self.push_data_to_qdrant(table_name, records, TEXT_FIELDS.get(table_name))
+    
+    def delete_rows(self, table_name, pks):
+        """Delete the points of rows by primary key."""
+        self.delete_points(table_name, [point_id(table_name, pk) for pk in pks])
+    
+    def delete_points(self, collection_name, ids):
+        url = f"{self.qdrant_api_url}/collections/{collection_name}/points/delete"
+        for i in range(0, len(ids), 1000):
+            self.session.post(url, headers=self.headers, json={"points": ids[i:i+1000]}).raise_for_status()
+    
+    def uploader(self, collection_name):
+        return BatchUploader(self.session, f"{self.qdrant_api_url}/collections/{collection_name}/points")
+    
+    def write_barrier(self, collection_name):
+        """Waited no-op delete: returns once every earlier write to the collection is applied."""
+        url = f"{self.qdrant_api_url}/collections/{collection_name}/points/delete?wait=true"
+        self.session.post(url, json={"filter": {"must": [{"has_id": [BARRIER_POINT_ID]}]}}).raise_for_status()
+    
+    def encode_points(self, table_name, records, text_fields=None):
+        """Embed records and return each point as compact JSON bytes."""
+        texts = []
+        for record in records:
+            # Generate text for embedding
+            if text_fields:
+                text_values = [str(record.get(field, "")) for field in text_fields if field in record]
+            else:
+                # Use all string fields
+                text_values = [str(value) for key, value in record.items() 
+                              if isinstance(value, (str, int, float)) and value]
+            texts.append(" ".join(text_values))
+        
+        # 8 decimals is below float32 resolution for these unit vectors and halves the JSON size
+        vectors = np.round(self._embed_batch(texts).astype(np.float64), 8).tolist()
+        
+        # Point id from the row's primary key, so re-syncing a row replaces its point
+        return [
+            json.dumps(
+                {"id": point_id(table_name, record["id"]), "vector": vector, "payload": record},
+                default=str,
+                separators=(",", ":"),
+            ).encode("utf-8")
+            for record, vector in zip(records, vectors)
+        ]
+    
+    def push_data_to_qdrant(self, collection_name, records, text_fields=None, uploader=None):
+        """
+        Push data to Qdrant collection. With an uploader (see sync_table_to_qdrant) the points
+        are only queued for the uploader's collection (a new version during rebuilds) and errors
+        raise; otherwise the upload is finished and checked here. Point ids derive from
+        collection_name, which is the table name.
+        """
+        if uploader is not None:
+            for i in range(0, len(records), 100):
+                uploader.add(self.encode_points(collection_name, records[i:i+100], text_fields))
+            return True
+        
         if not records:
             logger.info(f"No records to push to collection '{collection_name}'")
             return True
         
         try:
-            # Process records in batches
-            batch_size = 100
-            total_records = len(records)
-            
-            for i in range(0, total_records, batch_size):
-                batch = records[i:i+batch_size]
-                points = []
-                
-                for idx, record in enumerate(batch):
-                    # Generate text for embedding
-                    if text_fields:
-                        text_values = [str(record.get(field, "")) for field in text_fields if field in record]
-                    else:
-                        # Use all string fields
-                        text_values = [str(value) for key, value in record.items() 
-                                      if isinstance(value, (str, int, float)) and value]
-                    
-                    text_for_embedding = " ".join(text_values)
-                    
-                    # Generate embedding
-                    vector = self._simple_text_embedding(text_for_embedding)
-                    
-                    # Create point
-                    point = {
-                        "id": idx + i,
-                        "vector": vector,
-                        "payload": record
-                    }
-                    points.append(point)
-                
-                # Push batch to Qdrant
-                url = f"{self.qdrant_api_url}/collections/{collection_name}/points"
-                payload = {"points": points}
-                
-                response = requests.put(url, headers=self.headers, json=payload)
-                
-                if response.status_code != 200:
-                    logger.error(f"Failed to push batch to collection '{collection_name}': {response.status_code} - {response.text}")
-                    return False
-                
-                logger.info(f"Pushed batch {i//batch_size + 1}/{(total_records-1)//batch_size + 1} to collection '{collection_name}'")
-            
+            uploader = self.uploader(collection_name)
+            try:
+                for i in range(0, len(records), 100):
+                    uploader.add(self.encode_points(collection_name, records[i:i+100], text_fields))
+            except BaseException:
+                close_quietly(uploader, collection_name)
+                raise
+            points_per_s = uploader.close()
+            self.write_barrier(collection_name)
+            logger.info(f"Pushed {len(records)} points to collection '{collection_name}' ({points_per_s} points/s)")
             return True
         except Exception as e:
             logger.error(f"Error pushing data to collection '{collection_name}': {str(e)}")
@@ -184,36 +492,239 @@ def get_db_connection():
         logger.error(f"Error connecting to database: {str(e)}")
         return None
 
-def fetch_table_data(conn, table_name):
-    """Fetch all data from a table."""
+def fetch_table_schema(conn, table_name):
+    """Column name → data type, for the schema fingerprint."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_name = %s ORDER BY ordinal_position",
+            (table_name,),
+        )
+        return dict(cursor.fetchall())
+
+def schema_fingerprint(schema, text_fields):
+    """Changes whenever existing points would embed or look differently: forces a full sync."""
+    raw = json.dumps(
+        {"schema": schema, "text_fields": sorted(text_fields or []), "embedding": embedding_id()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+def stream_rows(conn, sql, params=(), chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield lists of row dicts from a server-side (named) cursor, chunk_rows at a time."""
+    with conn.cursor(name=f"qdrant_sync_{uuid.uuid4().hex[:12]}", cursor_factory=RealDictCursor) as cursor:
+        cursor.itersize = chunk_rows
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                return
+            yield [dict(record) for record in rows]
+
+def stream_changed_rows(conn, table_name, since, since_id, lag_seconds=SYNC_LAG_SECONDS):
+    """Rows past the (updated_at, id) watermark, oldest first, in chunks."""
+    if lag_seconds > 0:
+        return stream_rows(
+            conn,
+            f"SELECT * FROM {table_name} WHERE updated_at > %s ORDER BY updated_at, id",
+            (since - timedelta(seconds=lag_seconds),),
+        )
+    return stream_rows(
+        conn,
+        f"SELECT * FROM {table_name} WHERE (updated_at, id) > (%s, %s::uuid) ORDER BY updated_at, id",
+        (since, since_id),
+    )
+
+def stream_table_data(conn, table_name):
+    """All rows of a table, in chunks."""
+    return stream_rows(conn, f"SELECT * FROM {table_name}")
+
+def fetch_existing_ids(conn, table_name, id_type, ids):
+    """The subset of ids (as text) still present in the table."""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            pg_sql.SQL("SELECT id::text FROM {} WHERE id = ANY(%s::{}[])").format(
+                pg_sql.Identifier(table_name), pg_sql.SQL(id_type)
+            ),
+            (list(ids),),
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+def delete_missing_rows(qdrant_service, conn, table_name, id_type):
+    """
+    Anti-join one scroll page at a time: each page's row ids are looked up with one query and
+    points whose row is gone are deleted. Returns points removed.
+    """
+    removed = 0
+    for page in qdrant_service.scroll_keys(table_name):
+        by_id = {}
+        stale = []
+        for pid, row_id in page:
+            # Points without a row id, or ids from the old positional sync, go as well
+            if row_id is None or str(pid) != point_id(table_name, row_id):
+                stale.append(pid)
+            else:
+                by_id[str(row_id)] = pid
+        if by_id:
+            existing = fetch_existing_ids(conn, table_name, id_type, by_id)
+            stale.extend(pid for row_id, pid in by_id.items() if row_id not in existing)
+        qdrant_service.delete_points(table_name, stale)
+        removed += len(stale)
+    return removed
+
+def run_pipeline(chunks, consume, depth=STREAM_QUEUE_DEPTH):
+    """
+    Read chunks in this thread and run consume(chunk) on a worker thread, with at most
+    `depth` chunks queued in between, so uploads overlap with the next read. Re-raises the
+    first error from either side. Returns (rows, seconds).
+    """
+    q = queue.Queue(maxsize=max(1, depth))
+    done = object()
+    failure = []
+    
+    def worker():
+        while True:
+            item = q.get()
+            if item is done:
+                return
+            if failure:
+                continue  # keep draining so the reader never blocks
+            try:
+                consume(item)
+            except Exception as e:
+                failure.append(e)
+    
+    started = time.perf_counter()
+    rows = 0
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute(f"SELECT * FROM {table_name}")
-            records = cursor.fetchall()
-            # Convert RealDictRow objects to regular dictionaries
-            return [dict(record) for record in records]
-    except Exception as e:
-        logger.error(f"Error fetching data from table '{table_name}': {str(e)}")
-        return []
+        for chunk in chunks:
+            if failure:
+                break
+            rows += len(chunk)
+            q.put(chunk)
+    finally:
+        q.put(done)
+        thread.join()
+    if failure:
+        raise failure[0]
+    return rows, time.perf_counter() - started
 
-def sync_table_to_qdrant(qdrant_service, table_name, records, recreate=False):
-    """Sync a table to Qdrant."""
-    # Create or recreate collection
-    if not qdrant_service.create_collection(table_name, recreate=recreate):
-        return False
-    
-    # Define text fields based on table name
-    text_fields = None
-    if table_name == "products":
-        text_fields = ["name", "description", "category", "subcategory", "material"]
-    elif table_name == "shops":
-        text_fields = ["name", "description", "category", "address"]
-    
-    # Push data to Qdrant
-    return qdrant_service.push_data_to_qdrant(table_name, records, text_fields)
+def sync_table_to_qdrant(qdrant_service, conn, table_name, full=False):
+    """
+    Sync a table to Qdrant: only rows changed since the stored watermark, plus deletes, or a
+    full rebuild on the first run, after a schema change or when forced. Rebuilds fill a new
+    {table}_v{n} collection and switch the {table} alias to it once the point count matches,
+    so searches keep using the previous version until then.
+    Returns a summary dict (mode, upserted, deleted) or None on failure.
+    """
+    text_fields = TEXT_FIELDS.get(table_name)
+    schema = fetch_table_schema(conn, table_name)
+    fingerprint = schema_fingerprint(schema, text_fields)
+    state = None if full else qdrant_service.get_sync_state(table_name)
+    foreign = None if full else qdrant_service.foreign_embedding(table_name, state)
+    if foreign:
+        # Another sync (the API's) owns this collection: fail loudly instead of rebuilding over it
+        raise RuntimeError(
+            f"Collection '{table_name}' was built with embedding {foreign}, this sync uses {embedding_id()}; "
+            f"refusing to rebuild over it (invoke with {{\"full\": true}} to take it over)"
+        )
+    
+    if full or state is None or state.get("schema") != fingerprint or not qdrant_service.collection_exists(table_name):
+        mode = "full"
+    elif "updated_at" not in schema:
+        mode = "rescan"
+    else:
+        mode = "incremental"
+    
+    # Full syncs fill a new version; the others write through the alias to the live one
+    target = qdrant_service.create_version(table_name) if mode == "full" else table_name
+    if target is None:
+        return None
+    
+    if mode == "incremental" and state.get("updated_at"):
+        chunks = stream_changed_rows(conn, table_name, datetime.fromisoformat(state["updated_at"]), state["pk"])
+    else:
+        chunks = stream_table_data(conn, table_name)
+    
+    watermark = {"updated_at": state.get("updated_at"), "pk": state.get("pk")} if state and mode != "full" else {}
+    
+    uploader = qdrant_service.uploader(target)
+    
+    def upload(records):
+        # Queue the chunk for upload, then move the watermark past it
+        nonlocal watermark
+        qdrant_service.push_data_to_qdrant(table_name, records, text_fields, uploader)
+        if "updated_at" in schema:
+            last = max(records, key=lambda r: (r["updated_at"], str(r["id"])))
+            if not watermark.get("updated_at") or last["updated_at"] >= datetime.fromisoformat(watermark["updated_at"]):
+                watermark = {"updated_at": last["updated_at"].isoformat(), "pk": str(last["id"])}
+    
+    try:
+        try:
+            upserted, seconds = run_pipeline(chunks, upload)
+        except BaseException:
+            close_quietly(uploader, target)
+            raise
+        points_per_s = uploader.close()
+        qdrant_service.write_barrier(target)
+        published = mode != "full" or qdrant_service.publish_version(table_name, target, upserted)
+    except requests.RequestException as e:
+        logger.error(f"Failed to push rows to collection '{target}': {e}")
+        published = False
+    except BaseException:
+        # Anything else (e.g. a psycopg2 error from the cursor) must not leave the new version behind
+        if mode == "full":
+            qdrant_service.delete_collection(target)
+        raise
+    if not published:
+        if mode == "full":
+            qdrant_service.delete_collection(target)
+        return None
+    dropped = qdrant_service.drop_old_versions(table_name) if mode == "full" else []
+    
+    # Anti-join: drop points whose row is gone
+    deleted = 0
+    if mode != "full":
+        deleted = delete_missing_rows(qdrant_service, conn, table_name, schema["id"])
+    
+    qdrant_service.save_sync_state(table_name, {
+        "table": table_name,
+        "schema": fingerprint,
+        "embedding": embedding_id(),
+        "text_fields": sorted(text_fields or []),
+        "updated_at": watermark.get("updated_at"),
+        "pk": watermark.get("pk"),
+        "synced_at": datetime.now().astimezone().isoformat(),
+        "mode": mode,
+        "collection": qdrant_service.get_alias_target(table_name) or table_name,
+    })
+    return {
+        "mode": mode,
+        "collection": target,
+        "dropped_versions": dropped,
+        "upserted": upserted,
+        "deleted": deleted,
+        "rows_per_s": round(upserted / seconds, 1) if seconds else None,
+        "upload_points_per_s": points_per_s,
+        "upload_requests": uploader.requests,
+    }
 
 def lambda_handler(event, context):
-    """AWS Lambda handler function."""
+    """
+    AWS Lambda handler function.
+    
+    Syncs incrementally by default; invoke with {"full": true} to rebuild every collection.
+    Does nothing unless QDRANT_LAMBDA_SYNC_ENABLED=1 (replaced by the CDC worker).
+    """
+    if not LAMBDA_SYNC_ENABLED:
+        logger.warning("Lambda sync is disabled (QDRANT_LAMBDA_SYNC_ENABLED != 1): Qdrant is kept current by qdrant_cdc_worker.py")
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'message': 'Lambda sync disabled; replaced by blazingfast-api/qdrant_cdc_worker.py'})
+        }
+    full = bool((event or {}).get("full"))
     try:
         # Initialize Qdrant service
         qdrant_service = QdrantSyncService()
@@ -233,20 +744,14 @@ def lambda_handler(event, context):
             try:
                 logger.info(f"Syncing table '{table_name}' to Qdrant")
                 
-                # Fetch data from table
-                records = fetch_table_data(conn, table_name)
-                
-                if not records:
-                    logger.warning(f"No records found in table '{table_name}'")
-                    results[table_name] = "No records found"
-                    continue
-                
                 # Sync to Qdrant
-                success = sync_table_to_qdrant(qdrant_service, table_name, records, recreate=True)
+                summary = sync_table_to_qdrant(qdrant_service, conn, table_name, full=full)
                 
-                if success:
-                    logger.info(f"Successfully synced table '{table_name}' to Qdrant")
-                    results[table_name] = f"Synced {len(records)} records"
+                if summary:
+                    logger.info(f"Successfully synced table '{table_name}' to Qdrant: {summary}")
+                    results[table_name] = (
+                        f"Synced {summary['upserted']} records, deleted {summary['deleted']} ({summary['mode']})"
+                    )
                 else:
                     logger.error(f"Failed to sync table '{table_name}' to Qdrant")
                     results[table_name] = "Failed to sync"